@@ -1,27 +1,63 @@
+import os
 import sys
 import inject
 import logging
+import argparse
 
 import uvicorn
 from fastapi import FastAPI
 
-from app.utils.config import Config
+from app.utils.config import Config, SERVER_DEFAULTS
+from app.utils.metrics import METRICS_DIR_ENV, MultiProcessMetrics
 
 logger = logging.getLogger()
 
+ASGI_APP = "app.asgi:app"
+
+
+def parse_args(args: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="app")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes, overrides `server.workers` config."
+    )
+    return parser.parse_args(args)
+
 
 def main(args):
     from app import ioc
     inject.configure(ioc.production)
 
     logger.info(f"Started app with arguments: {', '.join(args)}")
-    server = inject.instance(FastAPI)
+    options = parse_args(args)
     config = inject.instance(Config)
-    uvicorn.run(
-        app=server.app,
+    workers = options.workers or config.get("server.workers", 1)
+    server_options = dict(
         host=config.get("server.host"),
-        port=config.get("server.port")
+        port=config.get("server.port"),
+        **{
+            option: config.get(f"server.{option}", default)
+            for option, default in SERVER_DEFAULTS.items()
+        }
     )
+    if workers > 1:
+        # Each worker process imports ASGI module on its own, so engine and
+        # its pool, sized from config, are created per worker. On SIGTERM
+        # supervisor terminates all workers and each one drains its requests.
+        logger.info(f"Starting {workers} worker processes.")
+        # workers share their metrics through directory, so whichever of
+        # them is scraped reports metrics of all of them
+        metrics_dir = config.get(
+            "metrics.multiprocess_dir", "/tmp/app-metrics"
+        )
+        MultiProcessMetrics.prepare(metrics_dir)
+        os.environ[METRICS_DIR_ENV] = metrics_dir
+        uvicorn.run(app=ASGI_APP, workers=workers, **server_options)
+    else:
+        server = inject.instance(FastAPI)
+        uvicorn.run(app=server.app, **server_options)
 
 
 if __name__ == "__main__":
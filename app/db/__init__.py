@@ -3,3 +3,5 @@ from app.db.user import User
 from app.db.post import Post, PostStatusType
 from app.db.comment import Comment
 from app.db.tag import Tag
+# triggers maintaining aggregates are registered on import
+from app.db import aggregate  # noqa: F401
@@ -0,0 +1,73 @@
+"""
+Aggregates of post relationships denormalized into `posts` table, so list
+views can show them without loading the relationships. They are maintained
+by triggers, which keep them current no matter whether rows are written
+through ORM, bulk statements or by hand. Migration creating them holds its
+own copy of these statements, since it has to stay as it was written.
+"""
+from sqlalchemy import DDL, event
+
+from app.db.comment import Comment
+from app.db.tag import post_tags
+
+# keeps `posts.comment_count` equal to number of comments of each post, and
+# moves comments between counts if their post is changed
+COMMENT_COUNT_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION posts_comment_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE posts SET comment_count = comment_count + 1
+        WHERE id = NEW.post_id;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE posts SET comment_count = comment_count - 1
+        WHERE id = OLD.post_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+COMMENT_COUNT_TRIGGER = DDL("""
+CREATE TRIGGER comments_post_comment_count
+AFTER INSERT OR DELETE OR UPDATE OF post_id ON comments
+FOR EACH ROW EXECUTE PROCEDURE posts_comment_count()
+""")
+
+# keeps `posts.tag_slugs` equal to sorted slugs of tags of each post, which
+# are recomputed from association table on every change of it
+TAG_SLUGS_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION posts_tag_slugs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE posts SET tag_slugs = ARRAY(
+            SELECT tag_slug FROM post_tags
+            WHERE post_id = NEW.post_id ORDER BY tag_slug
+        )
+        WHERE id = NEW.post_id;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE posts SET tag_slugs = ARRAY(
+            SELECT tag_slug FROM post_tags
+            WHERE post_id = OLD.post_id ORDER BY tag_slug
+        )
+        WHERE id = OLD.post_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+TAG_SLUGS_TRIGGER = DDL("""
+CREATE TRIGGER post_tags_post_tag_slugs
+AFTER INSERT OR DELETE OR UPDATE ON post_tags
+FOR EACH ROW EXECUTE PROCEDURE posts_tag_slugs()
+""")
+
+# triggers are created along with their tables by `create_all` as well
+for table, statements in (
+    (Comment.__table__, (COMMENT_COUNT_FUNCTION, COMMENT_COUNT_TRIGGER)),
+    (post_tags, (TAG_SLUGS_FUNCTION, TAG_SLUGS_TRIGGER)),
+):
+    for statement in statements:
+        event.listen(
+            table, "after_create", statement.execute_if(dialect="postgresql")
+        )
@@ -1,15 +1,29 @@
 from uuid import uuid4
 from datetime import datetime
 
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import RelationshipProperty, aliased, relationship
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, DateTime, ForeignKey, Text
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Text, Index, asc, desc, func, select
+)
 
 from app.db import Base
+from app.db.post import Post
+from app.db.user import User
 
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        # Composite indexes backing ranked comments, so the newest or the
+        # oldest comments of post or user are read from single index range.
+        Index(
+            "ix_comments_post_id_created_at_id", "post_id", "created_at", "id"
+        ),
+        Index(
+            "ix_comments_user_id_created_at_id", "user_id", "created_at", "id"
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), default=uuid4, primary_key=True)
     post_id = Column(
@@ -26,6 +40,48 @@ class Comment(Base):
     )
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    modified_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow)
 
     post = relationship("Post", back_populates="comments")
     user = relationship("User", back_populates="comments")
+
+
+def ranked_comments(
+    parent: type, foreign_key: str, newest: bool
+) -> RelationshipProperty:
+    """
+    Creates view-only relationship of `parent` model, loading its comments
+    ordered by their rank, which is computed by window function over
+    comments of each parent, from the newest comment if `newest` is true or
+    from the oldest one otherwise. Loader of the relationship can be limited
+    to single page of comments of each parent with criteria on the rank,
+    available as `rank` in `info` of the relationship, e.g.
+    `selectinload(Post.newest_comments.and_(rank <= 10))`.
+    """
+    order = desc if newest else asc
+    ranked = select(
+        Comment,
+        func.row_number().over(
+            partition_by=getattr(Comment, foreign_key),
+            order_by=(order(Comment.created_at), order(Comment.id))
+        ).label("rank")
+    ).subquery()
+    ranked_comment = aliased(Comment, ranked)
+    return relationship(
+        ranked_comment,
+        primaryjoin=getattr(ranked_comment, foreign_key) == parent.id,
+        order_by=ranked.c.rank,
+        viewonly=True,
+        lazy="raise",
+        info={"rank": ranked.c.rank},
+    )
+
+
+# names of ranked comments relationships of each order, by order name
+RANKED_COMMENTS = {"NEWEST": "newest_comments", "OLDEST": "oldest_comments"}
+
+# ranked comments are assigned to their parents once all models exist
+Post.newest_comments = ranked_comments(Post, "post_id", newest=True)
+Post.oldest_comments = ranked_comments(Post, "post_id", newest=False)
+User.newest_comments = ranked_comments(User, "user_id", newest=True)
+User.oldest_comments = ranked_comments(User, "user_id", newest=False)
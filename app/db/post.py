@@ -1,15 +1,23 @@
 import enum
 from uuid import uuid4
 from datetime import datetime
+from collections.abc import AsyncIterator, Iterable
 from typing import Optional, TYPE_CHECKING
 
-from sqlalchemy.orm import relationship, Session
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, DateTime, String, ForeignKey, Text, Enum
+from sqlalchemy.orm import relationship, load_only
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy import (
+    Column, DateTime, String, ForeignKey, Text, Enum, Index, Integer,
+    any_, bindparam, select, tuple_
+)
 
 from app.db import Base
 from app.db.tag import post_tags
+from app.utils.db import DBSession, StatementCache, execute, stream
 if TYPE_CHECKING:
+    from app.filter import Cursor
     from app.service.includer.query import PostQueryIncluderFactory
 
 
@@ -25,6 +33,12 @@ class PostStatusType(enum.Enum):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Composite indexes backing keyset pagination, so each page is a
+        # single index range scan no matter how deep client reads.
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_status_created_at_id", "status", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), default=uuid4, primary_key=True)
     user_id = Column(
@@ -43,6 +57,9 @@ class Post(Base):
         default=PostStatusType.DRAFT,
         index=True
     )
+    # aggregates of relationships kept by triggers, see `app.db.aggregate`
+    comment_count = Column(Integer, nullable=False, server_default="0")
+    tag_slugs = Column(ARRAY(String), nullable=False, server_default="{}")
 
     user = relationship("User", back_populates="posts")
     comments = relationship("Comment", back_populates="post", lazy="raise")
@@ -50,34 +67,263 @@ class Post(Base):
         "Tag", secondary=post_tags, back_populates="posts", lazy="raise"
     )
 
+    # statements of each shape of query, see `StatementCache`
+    _statements = StatementCache("posts")
+
     @classmethod
-    def get(
+    async def get(
         cls,
-        db: Session,
+        db: DBSession,
         post_id: str,
         query_includer_factory: "PostQueryIncluderFactory"
-    ) -> "Post":
+    ) -> Optional["Post"]:
         """Fetches the post with provided ID."""
-        query = db.query(cls).filter_by(
-            id=post_id
+        statement = cls._statements.get(
+            ("get", query_includer_factory.key),
+            lambda: cls._select(query_includer_factory).where(
+                cls.id == bindparam("post_id")
+            )
+        )
+        return await execute(
+            db,
+            statement,
+            lambda result: result.scalars().one_or_none(),
+            params={"post_id": post_id}
         )
-        for query_includer in query_includer_factory:
-            query = query_includer.apply(query=query)
 
-        return query.one_or_none()
+    @classmethod
+    async def get_many(
+        cls,
+        db: DBSession,
+        post_ids: list[str],
+        query_includer_factory: "PostQueryIncluderFactory"
+    ) -> "list[Post]":
+        """
+        Fetches posts with provided IDs in single query, in no particular
+        order. IDs of posts which do not exist are skipped. IDs are bound as
+        single array, so the same SQL is executed for any number of them.
+        """
+        statement = cls._statements.get(
+            ("get_many", query_includer_factory.key),
+            lambda: cls._select(query_includer_factory).where(
+                cls.id == any_(
+                    bindparam("post_ids", type_=ARRAY(cls.id.type))
+                )
+            )
+        )
+        return await execute(
+            db,
+            statement,
+            lambda result: result.scalars().all(),
+            params={"post_ids": post_ids}
+        )
 
     @classmethod
-    def list(
+    async def version(
         cls,
-        db: Session,
+        db: DBSession,
+        post_id: str,
+        query_includer_factory: "PostQueryIncluderFactory"
+    ) -> Optional[Row]:
+        """
+        Fetches version of the post with provided ID and of its relations
+        requested through includers, without loading any of them.
+        """
+        statement = cls._statements.get(
+            ("version", query_includer_factory.key),
+            lambda: select(
+                cls.created_at,
+                cls.modified_at,
+                *query_includer_factory.versions()
+            ).where(cls.id == bindparam("post_id"))
+        )
+        return await execute(
+            db,
+            statement,
+            lambda result: result.one_or_none(),
+            params={"post_id": post_id}
+        )
+
+    @classmethod
+    async def list(
+        cls,
+        db: DBSession,
         query_includer_factory: "PostQueryIncluderFactory",
-        status: Optional[PostStatusType] = None
-    ) -> list["Post"]:
-        """Fetches all posts form DB."""
-        query = db.query(cls)
-        if status:
-            query = query.filter_by(status=status)
+        limit: int,
+        status: Optional[PostStatusType] = None,
+        cursor: Optional["Cursor"] = None,
+        fields: Optional[Iterable[str]] = None
+    ) -> "list[Post | Row]":
+        """
+        Fetches page of posts from DB ordered by `(created_at, id)`. Page
+        starts right after provided `cursor`, or from the first post if
+        cursor is not provided. If `fields` are provided, only those columns
+        are loaded, see `_select`.
+        """
+        fields = None if fields is None else tuple(fields)
+        statement = cls._statements.get(
+            (
+                "list",
+                query_includer_factory.key,
+                fields,
+                status is not None,
+                cursor is not None
+            ),
+            lambda: cls._list_statement(
+                cls._select(query_includer_factory, fields),
+                status=status is not None,
+                cursor=cursor is not None
+            ).limit(bindparam("limit"))
+        )
+        scalars = cls._selects_entity(query_includer_factory, fields)
+        return await execute(
+            db,
+            statement,
+            lambda result: (result.scalars() if scalars else result).all(),
+            params=cls._list_params(status, cursor, limit=limit)
+        )
+
+    @classmethod
+    async def list_version(
+        cls,
+        db: DBSession,
+        query_includer_factory: "PostQueryIncluderFactory",
+        limit: int,
+        status: Optional[PostStatusType] = None,
+        cursor: Optional["Cursor"] = None
+    ) -> "list[Row]":
+        """
+        Fetches versions of posts, and of their relations requested through
+        includers, of the same page which would be fetched by `list`.
+        """
+        statement = cls._statements.get(
+            (
+                "list_version",
+                query_includer_factory.key,
+                status is not None,
+                cursor is not None
+            ),
+            lambda: cls._list_statement(
+                select(
+                    cls.id,
+                    cls.created_at,
+                    cls.modified_at,
+                    *query_includer_factory.versions()
+                ),
+                status=status is not None,
+                cursor=cursor is not None
+            ).limit(bindparam("limit"))
+        )
+        return await execute(
+            db,
+            statement,
+            lambda result: result.all(),
+            params=cls._list_params(status, cursor, limit=limit)
+        )
+
+    @classmethod
+    def stream(
+        cls,
+        db: DBSession,
+        query_includer_factory: "PostQueryIncluderFactory",
+        chunk_size: int,
+        status: Optional[PostStatusType] = None,
+        cursor: Optional["Cursor"] = None,
+        fields: Optional[Iterable[str]] = None
+    ) -> "AsyncIterator[list[Post | Row]]":
+        """
+        Lazily fetches all posts after provided `cursor` in the same order as
+        `list`, using server side cursor that loads `chunk_size` rows at once,
+        so only single chunk of posts is held in memory.
+        """
+        fields = None if fields is None else tuple(fields)
+        statement = cls._statements.get(
+            (
+                "stream",
+                query_includer_factory.key,
+                fields,
+                status is not None,
+                cursor is not None
+            ),
+            lambda: cls._list_statement(
+                cls._select(query_includer_factory, fields),
+                status=status is not None,
+                cursor=cursor is not None
+            )
+        )
+        return stream(
+            db,
+            statement,
+            chunk_size=chunk_size,
+            scalars=cls._selects_entity(query_includer_factory, fields),
+            params=cls._list_params(status, cursor)
+        )
+
+    @classmethod
+    def _select(
+        cls,
+        query_includer_factory: "PostQueryIncluderFactory",
+        fields: Optional[Iterable[str]] = None
+    ) -> Select:
+        """
+        Builds select of posts loading only provided `fields` columns, along
+        with `id` and `created_at` needed for paging. Without includes plain
+        rows are selected, which skips ORM instrumentation and identity map
+        entirely. Otherwise partially loaded entities are selected, so
+        relationships can be loaded for them. If no `fields` are provided,
+        whole entities are selected.
+        """
+        if fields is None:
+            statement = select(cls)
+        else:
+            columns = [cls.id, cls.created_at]
+            columns.extend(getattr(cls, field) for field in fields)
+            if not cls._selects_entity(query_includer_factory, fields):
+                return select(*columns)
+            statement = select(cls).options(load_only(*columns))
+
         for query_includer in query_includer_factory:
-            query = query_includer.apply(query=query)
+            statement = query_includer.apply(query=statement)
+        return statement
+
+    @staticmethod
+    def _selects_entity(
+        query_includer_factory: "PostQueryIncluderFactory",
+        fields: Optional[Iterable[str]] = None
+    ) -> bool:
+        """Tells whether `_select` selects entities or plain rows."""
+        return fields is None or bool(query_includer_factory.include)
+
+    @classmethod
+    def _list_statement(
+        cls, statement: Select, status: bool = False, cursor: bool = False
+    ) -> Select:
+        """
+        Filters and orders provided select of posts the same way for `list`,
+        `stream` and `list_version`. Status and cursor filters are added if
+        requested, with bound parameters provided by `_list_params`.
+        """
+        if status:
+            statement = statement.where(cls.status == bindparam("status"))
+        if cursor:
+            statement = statement.where(
+                tuple_(cls.created_at, cls.id) > tuple_(
+                    bindparam("cursor_created_at", type_=cls.created_at.type),
+                    bindparam("cursor_id", type_=cls.id.type)
+                )
+            )
+        return statement.order_by(cls.created_at, cls.id)
 
-        return query.all()
+    @staticmethod
+    def _list_params(
+        status: Optional[PostStatusType] = None,
+        cursor: Optional["Cursor"] = None,
+        **params
+    ) -> dict:
+        """Binds values of filters added by `_list_statement`."""
+        if status is not None:
+            params["status"] = status
+        if cursor is not None:
+            params["cursor_created_at"] = cursor.created_at
+            params["cursor_id"] = cursor.id
+        return params
@@ -33,5 +33,6 @@ class Tag(Base):
     id = Column(UUID(as_uuid=True), default=uuid4, primary_key=True)
     slug = Column(String(100), index=True, unique=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    modified_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow)
 
     posts = relationship("Post", secondary=post_tags, back_populates="tags")
@@ -1,12 +1,16 @@
 from uuid import uuid4
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import Optional, TYPE_CHECKING
+from collections.abc import Iterable
 
-from sqlalchemy.orm import relationship, Session
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, DateTime, String
+from sqlalchemy.orm import relationship, load_only
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy import Column, DateTime, String, any_, bindparam, select
 
 from app.db import Base
+from app.utils.db import DBSession, StatementCache, execute
 if TYPE_CHECKING:
     from app.service.includer.query import UserQueryIncluderFactory
 
@@ -22,21 +26,128 @@ class User(Base):
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, nullable=False)
+    modified_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow)
 
     posts = relationship("Post", back_populates="user", lazy="raise")
     comments = relationship("Comment", back_populates="user", lazy="raise")
 
+    # statements of each shape of query, see `StatementCache`
+    _statements = StatementCache("users")
+
     @classmethod
-    def get(
+    async def get(
         cls,
-        db: Session,
+        db: DBSession,
+        user_id: str,
+        query_includer_factory: "UserQueryIncluderFactory",
+        fields: Optional[Iterable[str]] = None
+    ) -> Optional["User | Row"]:
+        """
+        Fetches the user with provided ID. If `fields` are provided, only
+        those columns are loaded, see `_select`.
+        """
+        fields = None if fields is None else tuple(fields)
+        statement = cls._statements.get(
+            ("get", query_includer_factory.key, fields),
+            lambda: cls._select(query_includer_factory, fields).where(
+                cls.id == bindparam("user_id")
+            )
+        )
+        scalars = cls._selects_entity(query_includer_factory, fields)
+        return await execute(
+            db,
+            statement,
+            lambda result: (
+                result.scalars() if scalars else result
+            ).one_or_none(),
+            params={"user_id": user_id}
+        )
+
+    @classmethod
+    async def get_many(
+        cls,
+        db: DBSession,
+        user_ids: list[str],
+        query_includer_factory: "UserQueryIncluderFactory",
+        fields: Optional[Iterable[str]] = None
+    ) -> "list[User | Row]":
+        """
+        Fetches users with provided IDs in single query, in no particular
+        order, loaded the same way as by `get`. IDs of users which do not
+        exist are skipped. IDs are bound as single array, so the same SQL is
+        executed for any number of them.
+        """
+        fields = None if fields is None else tuple(fields)
+        statement = cls._statements.get(
+            ("get_many", query_includer_factory.key, fields),
+            lambda: cls._select(query_includer_factory, fields).where(
+                cls.id == any_(
+                    bindparam("user_ids", type_=ARRAY(cls.id.type))
+                )
+            )
+        )
+        scalars = cls._selects_entity(query_includer_factory, fields)
+        return await execute(
+            db,
+            statement,
+            lambda result: (result.scalars() if scalars else result).all(),
+            params={"user_ids": user_ids}
+        )
+
+    @classmethod
+    async def version(
+        cls,
+        db: DBSession,
         user_id: str,
         query_includer_factory: "UserQueryIncluderFactory"
-    ) -> "User":
-        query = db.query(cls).filter_by(
-            id=user_id
+    ) -> Optional[Row]:
+        """
+        Fetches version of the user with provided ID and of its relations
+        requested through includers, without loading any of them.
+        """
+        statement = cls._statements.get(
+            ("version", query_includer_factory.key),
+            lambda: select(
+                cls.created_at,
+                cls.modified_at,
+                *query_includer_factory.versions()
+            ).where(cls.id == bindparam("user_id"))
+        )
+        return await execute(
+            db,
+            statement,
+            lambda result: result.one_or_none(),
+            params={"user_id": user_id}
         )
+
+    @classmethod
+    def _select(
+        cls,
+        query_includer_factory: "UserQueryIncluderFactory",
+        fields: Optional[tuple[str, ...]] = None
+    ) -> Select:
+        """
+        Builds select of users loading only provided `fields` columns, along
+        with `id`, as plain rows if no relations are included, or as
+        partially loaded entities otherwise. If no `fields` are provided,
+        whole entities are selected.
+        """
+        if fields is None:
+            statement = select(cls)
+        else:
+            columns = [cls.id, *(getattr(cls, field) for field in fields)]
+            if not cls._selects_entity(query_includer_factory, fields):
+                return select(*columns)
+            statement = select(cls).options(load_only(*columns))
+
         for qb in query_includer_factory:
-            query = qb.apply(query)
+            statement = qb.apply(statement)
+        return statement
 
-        return query.one_or_none()
+    @staticmethod
+    def _selects_entity(
+        query_includer_factory: "UserQueryIncluderFactory",
+        fields: Optional[Iterable[str]] = None
+    ) -> bool:
+        """Tells whether `_select` selects entities or plain rows."""
+        return fields is None or bool(query_includer_factory.include)
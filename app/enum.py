@@ -10,3 +10,17 @@ class PostIncludeFilter(Enum):
     USER = "USER"
     TAGS = "TAGS"
     COMMENTS = "COMMENTS"
+    COMMENTS_USER = "COMMENTS.USER"
+    COMMENT_COUNT = "COMMENT_COUNT"
+    TAG_SLUGS = "TAG_SLUGS"
+
+
+class PostFieldsFilter(Enum):
+    TITLE = "TITLE"
+    CONTENT = "CONTENT"
+    STATUS = "STATUS"
+
+
+class IncludeOrderFilter(Enum):
+    NEWEST = "NEWEST"
+    OLDEST = "OLDEST"
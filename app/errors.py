@@ -66,3 +66,35 @@ class InvalidIncludeValue(HTTPException):
             status_code=422,
             detail="Provided include value is not valid"
         )
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=422,
+            detail="Provided pagination cursor is not valid"
+        )
+
+
+class InvalidFieldsValue(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=422,
+            detail="Provided fields value is not valid"
+        )
+
+
+class InvalidIdsValue(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=422,
+            detail="Provided ids value is not valid"
+        )
+
+
+class InvalidIncludeOrder(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=422,
+            detail="Provided include order is not valid"
+        )
@@ -1,4 +1,4 @@
-from fastapi import Response, Request
+from fastapi import Request
 
 
 class Event:
@@ -10,9 +10,9 @@ class Event:
         self.description = description
 
     @classmethod
-    def from_error(cls, response: Response, request: Request) -> "Event":
+    def from_error(cls, status_code: int, request: Request) -> "Event":
         return Event(
-            id=str(response.status_code),
+            id=str(status_code),
             description=f"Error occurred on route {str(request.url)}"
         )
 
@@ -20,9 +20,15 @@ class Event:
 GET_USER = Event(
     "GetUser", "Get user details"
 )
+GET_USERS = Event(
+    "GetUsers", "Get details of multiple users"
+)
 GET_POST = Event(
     "GetPost", "Get post details"
 )
+GET_POSTS = Event(
+    "GetPosts", "Get details of multiple posts"
+)
 LIST_POSTS = Event(
     "ListPosts", "List posts details"
 )
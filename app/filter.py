@@ -1,10 +1,18 @@
-from typing import Any
+import json
+import base64
+import binascii
+from typing import Any, NamedTuple, Optional
+from collections.abc import Iterable
 from enum import Enum
+from uuid import UUID
+from datetime import datetime
 
-from fastapi import Query, Depends
+from fastapi import Query, Header, Depends
 
 from app import errors
 from app.db import PostStatusType
+from app.enum import IncludeOrderFilter
+from app.utils.response import NDJSON_MEDIA_TYPE
 
 
 class PostStatusFilter:
@@ -18,15 +26,18 @@ class PostStatusFilter:
         examples=["draft", "active"],
     )
 
-    def __call__(self, status: str = STATUS_QUERY) -> "PostStatusFilter":
+    async def __call__(
+        self, status: str = STATUS_QUERY
+    ) -> "PostStatusFilter":
         # check if provided status filter is valid
+        status_filter = PostStatusFilter()
         if not status:
-            self.value = None
+            status_filter.value = None
         elif status.upper() not in PostStatusType.all():
             raise errors.InvalidPostStatus()
         else:
-            self.value = PostStatusType[status.upper()]
-        return self
+            status_filter.value = PostStatusType[status.upper()]
+        return status_filter
 
     @classmethod
     def inject(cls) -> Any:
@@ -50,19 +61,313 @@ class IncludeFilter:
     def __init__(self, entity: type[Enum]) -> None:
         self.entity = entity
 
-    def __call__(self, include: str = INCLUDE_QUERY) -> "IncludeFilter":
+    async def __call__(self, include: str = INCLUDE_QUERY) -> "IncludeFilter":
         """
         Parses the string of include values and validates if each of them is
         supported by checking its existence in provide enum through object
         initialization.
         """
         values = set(include.split(",")) if include is not None else set()
+        include_filter = IncludeFilter(entity=self.entity)
         try:
-            self.value = [self.entity(value.upper()) for value in values]
+            include_filter.value = [
+                self.entity(value.upper()) for value in values
+            ]
         except ValueError:
             raise errors.InvalidIncludeValue()
-        return self
+        return include_filter
 
     @classmethod
     def inject(cls, entity: type[Enum]) -> Any:
         return Depends(cls(entity=entity))
+
+
+class IncludePage(NamedTuple):
+    """
+    Page of each included collection of entities which is loaded, see
+    `IncludePageFilter`.
+    """
+    limit: int = 20
+    order: IncludeOrderFilter = IncludeOrderFilter.NEWEST
+
+
+class IncludePageFilter:
+    """
+    This filter will be used for bounding included collections, like
+    comments, by allowing clients to request how many of them are included
+    per entity and whether the newest or the oldest ones are included.
+    """
+    MAX_LIMIT = 100
+
+    LIMIT_QUERY = Query(
+        default=IncludePage().limit,
+        ge=1,
+        le=MAX_LIMIT,
+        description=(
+            "Maximum number of entities included in each included collection "
+            "of an entity, like comments of a post"
+        ),
+    )
+    ORDER_QUERY = Query(
+        default=None,
+        description=(
+            "Whether the newest or the oldest entities of included "
+            "collections are included, the newest if omitted"
+        ),
+        examples=["newest", "oldest"],
+    )
+
+    async def __call__(
+        self,
+        include_limit: int = LIMIT_QUERY,
+        include_order: str = ORDER_QUERY
+    ) -> "IncludePageFilter":
+        include_page_filter = IncludePageFilter()
+        order = IncludePage().order
+        if include_order is not None:
+            try:
+                order = IncludeOrderFilter(include_order.upper())
+            except ValueError:
+                raise errors.InvalidIncludeOrder()
+        include_page_filter.value = IncludePage(
+            limit=include_limit, order=order
+        )
+        return include_page_filter
+
+    @classmethod
+    def inject(cls) -> Any:
+        return Depends(cls())
+
+
+class FieldsFilter:
+    """
+    This filter will be used for sparse fieldsets, by allowing clients to
+    request only some of entity fields, e.g. to skip large content on list
+    views. Entity ID is always returned.
+    """
+    FIELDS_QUERY = Query(
+        default=None,
+        description=(
+            "Request only listed entity fields to be returned, all of them "
+            "are returned if omitted"
+        ),
+        examples=["title,status", "title"],
+    )
+
+    def __init__(self, entity: type[Enum]) -> None:
+        self.entity = entity
+
+    async def __call__(self, fields: str = FIELDS_QUERY) -> "FieldsFilter":
+        fields_filter = FieldsFilter(entity=self.entity)
+        if fields is None:
+            fields_filter.value = None
+            return fields_filter
+        try:
+            fields_filter.value = [
+                self.entity(value.upper()) for value in set(fields.split(","))
+            ]
+        except ValueError:
+            raise errors.InvalidFieldsValue()
+        return fields_filter
+
+    @classmethod
+    def inject(cls, entity: type[Enum]) -> Any:
+        return Depends(cls(entity=entity))
+
+
+class IdsFilter:
+    """
+    This filter will be used for fetching multiple entities at once, using
+    comma separated entity IDs from query parameter. IDs are kept in order
+    in which they are provided, without duplicates.
+    """
+    MAX_IDS = 100
+
+    IDS_QUERY = Query(
+        default=None,
+        description=(
+            f"Fetch entities with listed IDs, at most {MAX_IDS} of them, "
+            "instead of listing them"
+        ),
+        examples=["6c1f0f3e-8f4e-4f6e-9d7b-3c2a1b0e9f8d"],
+    )
+
+    def __init__(self, required: bool = False) -> None:
+        self.required = required
+
+    async def __call__(self, ids: str = IDS_QUERY) -> "IdsFilter":
+        ids_filter = IdsFilter(required=self.required)
+        if ids is None:
+            if self.required:
+                raise errors.InvalidIdsValue()
+            ids_filter.value = None
+        else:
+            ids_filter.value = self.parse(ids.split(","))
+        return ids_filter
+
+    @classmethod
+    def parse(cls, ids: Iterable[str]) -> list[str]:
+        """
+        Validates provided IDs and returns them in canonical form, in order
+        in which they are provided, without duplicates.
+        """
+        try:
+            values = list(dict.fromkeys(str(UUID(value)) for value in ids))
+        except ValueError:
+            raise errors.InvalidIdsValue()
+        if not values or len(values) > cls.MAX_IDS:
+            raise errors.InvalidIdsValue()
+        return values
+
+    @classmethod
+    def inject(cls, required: bool = False) -> Any:
+        return Depends(cls(required=required))
+
+
+class Cursor:
+    """
+    Opaque keyset pagination cursor. It holds the `(created_at, id)` pair of
+    the last entity on the page, so the next page can be fetched by seeking
+    past it instead of skipping over all previous rows.
+    """
+
+    def __init__(self, created_at: datetime, id: UUID) -> None:
+        self.created_at = created_at
+        self.id = id
+
+    @classmethod
+    def from_entity(cls, entity: Any) -> "Cursor":
+        return cls(created_at=entity.created_at, id=entity.id)
+
+    def encode(self) -> str:
+        """Encodes cursor into url safe token that is returned to clients."""
+        data = json.dumps([self.created_at.isoformat(), str(self.id)])
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        """Decodes token produced by `encode` back into cursor object."""
+        try:
+            padding = "=" * (-len(token) % 4)
+            created_at, id_ = json.loads(
+                base64.urlsafe_b64decode(token + padding)
+            )
+            return cls(
+                created_at=datetime.fromisoformat(created_at), id=UUID(id_)
+            )
+        except (ValueError, TypeError, binascii.Error):
+            raise errors.InvalidCursor()
+
+
+class PaginationFilter:
+    """
+    This filter will be used for keyset pagination of list endpoints, using
+    `limit` and `cursor` values from query parameters.
+    """
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+
+    LIMIT_QUERY = Query(
+        default=DEFAULT_LIMIT,
+        ge=1,
+        le=MAX_LIMIT,
+        description="Maximum number of entities returned in one page",
+    )
+    CURSOR_QUERY = Query(
+        default=None,
+        description=(
+            "Cursor of the page that should be returned, as provided in "
+            "`X-Next-Cursor` header of the previous page"
+        ),
+    )
+
+    async def __call__(
+        self, limit: int = LIMIT_QUERY, cursor: str = CURSOR_QUERY
+    ) -> "PaginationFilter":
+        pagination = PaginationFilter()
+        pagination.limit = limit
+        pagination.cursor = (
+            Cursor.decode(cursor) if cursor else None
+        )
+        return pagination
+
+    @classmethod
+    def inject(cls) -> Any:
+        return Depends(cls())
+
+
+class StreamFilter:
+    """
+    This filter will be used for switching list endpoints into streaming mode,
+    either by `stream` query parameter, which streams JSON array, or by
+    requesting NDJSON through `Accept` header.
+    """
+    NDJSON = NDJSON_MEDIA_TYPE
+    JSON = "application/json"
+    CHUNK_SIZE = 500
+
+    STREAM_QUERY = Query(
+        default=False,
+        description=(
+            "Stream all entities after provided cursor instead of returning "
+            "single page"
+        ),
+    )
+    ACCEPT_HEADER = Header(default=None, include_in_schema=False)
+
+    async def __call__(
+        self, stream: bool = STREAM_QUERY, accept: str = ACCEPT_HEADER
+    ) -> "StreamFilter":
+        stream_filter = StreamFilter()
+        if accept is not None and self.NDJSON in accept:
+            stream_filter.value = self.NDJSON
+        elif stream:
+            stream_filter.value = self.JSON
+        else:
+            stream_filter.value = None
+        return stream_filter
+
+    @classmethod
+    def inject(cls) -> Any:
+        return Depends(cls())
+
+
+class IfNoneMatchFilter:
+    """
+    This filter will be used for conditional requests, by allowing clients
+    to provide entity tags of representations they already hold, so the
+    response does not have to be sent again if it has not changed.
+    """
+    IF_NONE_MATCH_HEADER = Header(
+        default=None,
+        description=(
+            "Entity tags of already held representations, response is "
+            "`304 Not Modified` if any of them is still current"
+        ),
+    )
+
+    async def __call__(
+        self, if_none_match: Optional[str] = IF_NONE_MATCH_HEADER
+    ) -> "IfNoneMatchFilter":
+        if_none_match_filter = IfNoneMatchFilter()
+        if not if_none_match:
+            if_none_match_filter.value = None
+        else:
+            if_none_match_filter.value = [
+                tag.strip().removeprefix("W/")
+                for tag in if_none_match.split(",")
+            ]
+        return if_none_match_filter
+
+    def matches(self, etag: str) -> bool:
+        """
+        Checks if provided entity tag is held by client. Tags are compared
+        weakly, as required for `If-None-Match`.
+        """
+        if self.value is None:
+            return False
+        return "*" in self.value or etag in self.value
+
+    @classmethod
+    def inject(cls) -> Any:
+        return Depends(cls())
@@ -0,0 +1,32 @@
+import inject
+from fastapi import APIRouter, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.metrics import (
+    EXPOSITION_MEDIA_TYPE, REGISTRY, MultiProcessMetrics, render
+)
+
+router = APIRouter()
+
+# path of metrics, which is scraped often, so its requests are neither
+# audited nor given DB session
+METRICS_PATH = "/metrics"
+
+
+@router.get(
+    path=METRICS_PATH,
+    include_in_schema=False,
+    summary="Metrics",
+    description=(
+        "Provides metrics of the server in Prometheus text exposition "
+        "format, merged from all worker processes in multi-process mode."
+    )
+)
+async def metrics() -> Response:
+    multiprocess = inject.instance(MultiProcessMetrics)
+    if multiprocess is None:
+        snapshot = REGISTRY.collect()
+    else:
+        # snapshots of workers are read from files
+        snapshot = await run_in_threadpool(multiprocess.collect)
+    return Response(content=render(snapshot), media_type=EXPOSITION_MEDIA_TYPE)
@@ -1,11 +1,19 @@
+import inject
 from pydantic import UUID4
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import StreamingResponse
 
 from app import event
-from app.schema import PostResponse
+from app.schema import PostResponse, BatchGetRequest
 from app.service import PostService
-from app.filter import PostStatusFilter, IncludeFilter
-from app.enum import PostIncludeFilter
+from app.filter import (
+    PostStatusFilter, IncludeFilter, PaginationFilter, StreamFilter,
+    IfNoneMatchFilter, FieldsFilter, IdsFilter, IncludePageFilter,
+    IncludePage
+)
+from app.utils.cache import ResponseCache
+from app.enum import PostIncludeFilter, PostFieldsFilter
+from app.utils.response import TimedORJSONResponse, encode_stream
 
 router = APIRouter()
 
@@ -15,25 +23,122 @@ router = APIRouter()
     response_model=list[PostResponse],
     response_model_exclude_none=True,
     summary="List posts",
-    description="Provides list of posts with their details.",
+    description=(
+        "Provides single page of posts with their details. Cursor of the "
+        "next page is provided in `X-Next-Cursor` response header, which is "
+        "omitted on the last page. In streaming mode, requested with "
+        "`stream=true` or with `Accept: application/x-ndjson` header, all "
+        "posts after provided cursor are streamed instead. Single page is "
+        "provided with `ETag` header, and `304 Not Modified` is returned if "
+        "it matches `If-None-Match` request header. If `ids` are provided, "
+        "posts with those IDs are provided instead, as described for "
+        "`POST /api/posts:batchGet`, and other filters are ignored."
+    ),
     response_description="List of objects with post details."
 )
-def list_posts(
+async def list_posts(
     request: Request,
     status_filter: PostStatusFilter = PostStatusFilter.inject(),
     include_filter: IncludeFilter = IncludeFilter.inject(
         entity=PostIncludeFilter
-    )
+    ),
+    include_page_filter: IncludePageFilter = IncludePageFilter.inject(),
+    fields_filter: FieldsFilter = FieldsFilter.inject(
+        entity=PostFieldsFilter
+    ),
+    pagination: PaginationFilter = PaginationFilter.inject(),
+    stream_filter: StreamFilter = StreamFilter.inject(),
+    if_none_match: IfNoneMatchFilter = IfNoneMatchFilter.inject(),
+    ids_filter: IdsFilter = IdsFilter.inject()
 ) -> list[PostResponse]:
-    posts = PostService(
+    if ids_filter.value is not None:
+        return await _get_posts(
+            request=request,
+            post_ids=ids_filter.value,
+            include=include_filter.value,
+            include_page=include_page_filter.value
+        )
+
+    if stream_filter.value is not None:
+        chunks = PostService(
+            db=request.state.db,
+            loaders=request.state.loaders,
+        ).stream_posts(
+            status=status_filter.value,
+            include=include_filter.value,
+            include_page=include_page_filter.value,
+            cursor=pagination.cursor,
+            fields=fields_filter.value,
+            chunk_size=StreamFilter.CHUNK_SIZE
+        )
+
+        request.state.audit(event=event.LIST_POSTS)
+        return StreamingResponse(
+            content=encode_stream(
+                chunks=chunks, media_type=stream_filter.value
+            ),
+            media_type=stream_filter.value
+        )
+
+    service = PostService(
         db=request.state.db,
-    ).list_posts(
+        loaders=request.state.loaders,
+    )
+    etag = await service.list_posts_etag(
+        status=status_filter.value,
+        include=include_filter.value,
+        include_page=include_page_filter.value,
+        limit=pagination.limit,
+        cursor=pagination.cursor,
+        fields=fields_filter.value
+    )
+    if if_none_match.matches(etag):
+        request.state.audit(event=event.LIST_POSTS)
+        return Response(status_code=304, headers={"ETag": etag})
+
+    posts, next_cursor = await service.list_posts(
         status=status_filter.value,
-        include=include_filter.value
+        include=include_filter.value,
+        include_page=include_page_filter.value,
+        limit=pagination.limit,
+        cursor=pagination.cursor,
+        fields=fields_filter.value
     )
+    headers = {"ETag": etag}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor.encode()
 
     request.state.audit(event=event.LIST_POSTS)
-    return posts
+    return TimedORJSONResponse(content=posts, headers=headers)
+
+
+@router.post(
+    path=":batchGet",
+    response_model=list[PostResponse],
+    response_model_exclude_none=True,
+    summary="Get multiple posts",
+    description=(
+        "Get posts with provided IDs, with the same details as single post, "
+        "in order of provided IDs. IDs of posts which do not exist are "
+        "provided in `X-Missing-Ids` response header, which is omitted if "
+        f"all posts exist. At most {IdsFilter.MAX_IDS} IDs can be provided."
+    ),
+    response_description="List of objects with post details."
+)
+async def batch_get_posts(
+    request: Request,
+    body: BatchGetRequest,
+    include_filter: IncludeFilter = IncludeFilter.inject(
+        entity=PostIncludeFilter
+    ),
+    include_page_filter: IncludePageFilter = IncludePageFilter.inject()
+) -> list[PostResponse]:
+    return await _get_posts(
+        request=request,
+        post_ids=IdsFilter.parse(body.ids),
+        include=include_filter.value,
+        include_page=include_page_filter.value
+    )
 
 
 @router.get(
@@ -41,22 +146,66 @@ def list_posts(
     response_model=PostResponse,
     response_model_exclude_none=True,
     summary="Get single post",
-    description="Get single post with with its details.",
+    description=(
+        "Get single post with with its details. Post is provided with `ETag` "
+        "header, and `304 Not Modified` is returned if it matches "
+        "`If-None-Match` request header."
+    ),
     response_description="Single object containing post details."
 )
-def get_post(
+async def get_post(
     request: Request,
     post_id: UUID4,
     include_filter: IncludeFilter = IncludeFilter.inject(
         entity=PostIncludeFilter
-    )
+    ),
+    include_page_filter: IncludePageFilter = IncludePageFilter.inject(),
+    if_none_match: IfNoneMatchFilter = IfNoneMatchFilter.inject()
 ) -> PostResponse:
-    post = PostService(
+    service = PostService(
         db=request.state.db,
-    ).get_post(
+        cache=inject.instance(ResponseCache),
+        loaders=request.state.loaders,
+    )
+    # entity tag is checked before post is loaded, so unchanged post is
+    # neither loaded nor serialized
+    etag = await service.get_post_etag(
         post_id=str(post_id),
-        include=include_filter.value
+        include=include_filter.value,
+        include_page=include_page_filter.value
+    )
+    if if_none_match.matches(etag):
+        request.state.audit(event=event.GET_POST)
+        return Response(status_code=304, headers={"ETag": etag})
+
+    post = await service.get_post(
+        post_id=str(post_id),
+        include=include_filter.value,
+        include_page=include_page_filter.value,
+        etag=etag
     )
 
     request.state.audit(event=event.GET_POST)
-    return post
+    return TimedORJSONResponse(content=post, headers={"ETag": etag})
+
+
+async def _get_posts(
+    request: Request,
+    post_ids: list[str],
+    include: list[PostIncludeFilter],
+    include_page: IncludePage
+) -> TimedORJSONResponse:
+    posts, missing = await PostService(
+        db=request.state.db,
+        loaders=request.state.loaders,
+    ).get_posts(
+        post_ids=post_ids,
+        include=include,
+        include_page=include_page
+    )
+    headers = {}
+    if missing:
+        headers["X-Missing-Ids"] = ",".join(missing)
+
+    request.state.audit(event=event.GET_POSTS)
+    return TimedORJSONResponse(content=posts, headers=headers)
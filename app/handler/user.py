@@ -1,36 +1,143 @@
+import inject
 from pydantic import UUID4
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
 
 from app import event
-from app.schema import UserResponse
+from app.schema import UserResponse, BatchGetRequest
 from app.service import UserService
-from app.filter import IncludeFilter
+from app.filter import (
+    IncludeFilter, IfNoneMatchFilter, IdsFilter, IncludePageFilter,
+    IncludePage
+)
+from app.utils.cache import ResponseCache
 from app.enum import UserIncludeFilter
+from app.utils.response import TimedORJSONResponse
 
 router = APIRouter()
 
 
+@router.get(
+    path="",
+    response_model=list[UserResponse],
+    response_model_exclude_none=True,
+    summary="Get multiple users",
+    description=(
+        "Retrieves details of users with provided `ids`, as described for "
+        "`POST /api/users:batchGet`."
+    ),
+    response_description="List of user details."
+)
+async def get_users(
+    request: Request,
+    include_filter: IncludeFilter = IncludeFilter.inject(
+        entity=UserIncludeFilter
+    ),
+    include_page_filter: IncludePageFilter = IncludePageFilter.inject(),
+    ids_filter: IdsFilter = IdsFilter.inject(required=True)
+) -> list[UserResponse]:
+    return await _get_users(
+        request=request,
+        user_ids=ids_filter.value,
+        include=include_filter.value,
+        include_page=include_page_filter.value
+    )
+
+
+@router.post(
+    path=":batchGet",
+    response_model=list[UserResponse],
+    response_model_exclude_none=True,
+    summary="Get multiple users",
+    description=(
+        "Retrieves details of users with provided IDs, the same as for "
+        "single user, in order of provided IDs. IDs of users which do not "
+        "exist are provided in `X-Missing-Ids` response header, which is "
+        f"omitted if all users exist. At most {IdsFilter.MAX_IDS} IDs can be "
+        "provided."
+    ),
+    response_description="List of user details."
+)
+async def batch_get_users(
+    request: Request,
+    body: BatchGetRequest,
+    include_filter: IncludeFilter = IncludeFilter.inject(
+        entity=UserIncludeFilter
+    ),
+    include_page_filter: IncludePageFilter = IncludePageFilter.inject()
+) -> list[UserResponse]:
+    return await _get_users(
+        request=request,
+        user_ids=IdsFilter.parse(body.ids),
+        include=include_filter.value,
+        include_page=include_page_filter.value
+    )
+
+
 @router.get(
     path="/{user_id:uuid}",
     response_model=UserResponse,
     response_model_exclude_none=True,
     summary="Get user details",
-    description="Retrieves details of a single user.",
+    description=(
+        "Retrieves details of a single user. User is provided with `ETag` "
+        "header, and `304 Not Modified` is returned if it matches "
+        "`If-None-Match` request header."
+    ),
     response_description="Details of a single user."
 )
-def get_user(
+async def get_user(
     request: Request,
     user_id: UUID4,
     include_filter: IncludeFilter = IncludeFilter.inject(
         entity=UserIncludeFilter
-    )
+    ),
+    include_page_filter: IncludePageFilter = IncludePageFilter.inject(),
+    if_none_match: IfNoneMatchFilter = IfNoneMatchFilter.inject()
 ) -> UserResponse:
-    user = UserService(
+    service = UserService(
         db=request.state.db,
-    ).get_user(
+        cache=inject.instance(ResponseCache),
+        loaders=request.state.loaders,
+    )
+    # entity tag is checked before user is loaded, so unchanged user is
+    # neither loaded nor serialized
+    etag = await service.get_user_etag(
+        user_id=str(user_id),
+        include=include_filter.value,
+        include_page=include_page_filter.value
+    )
+    if if_none_match.matches(etag):
+        request.state.audit(event=event.GET_USER)
+        return Response(status_code=304, headers={"ETag": etag})
+
+    user = await service.get_user(
         user_id=str(user_id),
-        include=include_filter.value
+        include=include_filter.value,
+        include_page=include_page_filter.value,
+        etag=etag
     )
 
     request.state.audit(event=event.GET_USER)
-    return user
+    return TimedORJSONResponse(content=user, headers={"ETag": etag})
+
+
+async def _get_users(
+    request: Request,
+    user_ids: list[str],
+    include: list[UserIncludeFilter],
+    include_page: IncludePage
+) -> TimedORJSONResponse:
+    users, missing = await UserService(
+        db=request.state.db,
+        loaders=request.state.loaders,
+    ).get_users(
+        user_ids=user_ids,
+        include=include,
+        include_page=include_page
+    )
+    headers = {}
+    if missing:
+        headers["X-Missing-Ids"] = ",".join(missing)
+
+    request.state.audit(event=event.GET_USERS)
+    return TimedORJSONResponse(content=users, headers=headers)
@@ -4,11 +4,21 @@ from asyncio import current_task
 
 from fastapi import FastAPI
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import (
+    AsyncSession, async_scoped_session, create_async_engine
+)
 
 from app.utils.config import Config
-from app.utils.db import make_connection_string
+from app.utils.db import (
+    make_connection_string, make_pool_options, dispose_after_fork,
+    prepare_statements, track_queries, register_pool_metrics,
+    StatementCache, TimedQueuePool, TimedAsyncAdaptedQueuePool
+)
+from app.utils.audit import AuditWriter, register_queue_metrics
+from app.utils.cache import ResponseCache, register_invalidation
+from app.utils.metrics import MultiProcessMetrics
 from app.utils.logging import (
     configure_develop_logging, configure_production_logging
 )
@@ -42,23 +52,73 @@ def production(binder):
     db_settings = config.get("database")
     connection = make_connection_string(config)
     connect_timeout = db_settings.get("connect_timeout", 5)
-    pool_recycle = config.get("database.pool_recycle", 300)
-    engine = create_engine(
-        connection,
-        encoding="utf-8",
-        isolation_level="READ COMMITTED",
-        poolclass=QueuePool,
-        pool_recycle=pool_recycle,
-        connect_args={"connect_timeout": connect_timeout},
+    pool_options = make_pool_options(config)
+    StatementCache.configure(
+        max_size=db_settings.get("statement_cache_size", 500)
     )
-    session_factory = sessionmaker(bind=engine)
-    session_class = scoped_session(
-        session_factory, scopefunc=current_task
+    statement_cache_size = db_settings.get(
+        "prepared_statement_cache_size", 100
     )
+    if db_settings.get("async", False):
+        # asyncpg prepares every statement and keeps prepared statements of
+        # each connection in its own cache
+        connection = make_url(connection).update_query_dict(
+            {"prepared_statement_cache_size": str(statement_cache_size)}
+        )
+        engine = create_async_engine(
+            connection,
+            isolation_level="READ COMMITTED",
+            poolclass=TimedAsyncAdaptedQueuePool,
+            connect_args={"timeout": connect_timeout},
+            **pool_options,
+        )
+        # objects must not be expired on commit, since async session can not
+        # lazily refresh them on attribute access
+        session_factory = sessionmaker(
+            bind=engine, class_=AsyncSession, expire_on_commit=False
+        )
+        session_class = async_scoped_session(
+            session_factory, scopefunc=current_task
+        )
+    else:
+        engine = create_engine(
+            connection,
+            encoding="utf-8",
+            isolation_level="READ COMMITTED",
+            poolclass=TimedQueuePool,
+            connect_args={"connect_timeout": connect_timeout},
+            **pool_options,
+        )
+        if db_settings.get("prepared_statements", False):
+            prepare_statements(engine, max_size=statement_cache_size)
+        session_factory = sessionmaker(bind=engine)
+        session_class = scoped_session(
+            session_factory, scopefunc=current_task
+        )
+
+    dispose_after_fork(engine)
+    # queries are attributed to requests, e.g. in their log records
+    track_queries(engine)
+    register_pool_metrics(engine)
 
     binder.bind("db_registry", session_class)
     binder.bind_to_provider("db", session_class)
     binder.bind("db_engine", engine)
 
+    # Bind response cache, which is None if caching is disabled
+    cache = ResponseCache.from_config(config)
+    if cache is not None:
+        register_invalidation(cache)
+    binder.bind(ResponseCache, cache)
+
+    # Bind audit writer, which is started along with the server
+    audit_writer = AuditWriter.from_config(config)
+    register_queue_metrics(audit_writer)
+    binder.bind(AuditWriter, audit_writer)
+
+    # Bind metrics shared between worker processes, which is None in single
+    # process mode
+    binder.bind(MultiProcessMetrics, MultiProcessMetrics.from_config(config))
+
     # Bind server
     binder.bind_to_constructor(FastAPI, Server)
@@ -2,3 +2,4 @@ from app.schema.user import UserResponse
 from app.schema.post import PostResponse
 from app.schema.comment import CommentResponse
 from app.schema.tag import TagResponse
+from app.schema.batch import BatchGetRequest
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class BatchGetRequest(BaseModel):
+    ids: list[str] = Field(
+        description="IDs of requested entities, in order of the response",
+        examples=[["6c1f0f3e-8f4e-4f6e-9d7b-3c2a1b0e9f8d"]],
+    )
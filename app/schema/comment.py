@@ -1,5 +1,9 @@
+from typing import TYPE_CHECKING, Optional
+
 from pydantic import BaseModel, UUID4
 
+if TYPE_CHECKING:
+    from app.schema.user import UserResponse
 from app.db import Comment
 
 
@@ -8,12 +12,13 @@ class CommentResponse(BaseModel):
     post_id: UUID4
     user_id: UUID4
     content: str
+    user: Optional["UserResponse"] = None
 
     @classmethod
-    def create(cls, comment: Comment) -> "CommentResponse":
-        return cls(
-            id=comment.id,
-            content=comment.content,
-            user_id=comment.user_id,
-            post_id=comment.post_id
-        )
+    def serialize(cls, comment: Comment) -> dict:
+        return {
+            "id": comment.id,
+            "post_id": comment.post_id,
+            "user_id": comment.user_id,
+            "content": comment.content,
+        }
@@ -1,4 +1,5 @@
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, ClassVar, Optional
+from collections.abc import Iterable
 
 from pydantic import BaseModel, UUID4
 
@@ -10,19 +11,32 @@ from app.schema.tag import TagResponse
 
 
 class PostResponse(BaseModel):
+    # fields which can be requested through sparse fieldsets, they are
+    # omitted from response if not requested
+    FIELDS: ClassVar[tuple[str, ...]] = ("title", "content", "status")
+
     id: UUID4
-    title: str
-    content: str
-    status: str
+    title: Optional[str] = None
+    content: Optional[str] = None
+    status: Optional[str] = None
     user: Optional["UserResponse"] = None
     comments: Optional[list[CommentResponse]] = None
+    # whether post has more comments than included
+    comments_has_more: Optional[bool] = None
     tags: Optional[list[TagResponse]] = None
+    comment_count: Optional[int] = None
+    tag_slugs: Optional[list[str]] = None
 
     @classmethod
-    def create(cls, post: Post) -> "PostResponse":
-        return cls(
-            id=post.id,
-            title=post.title,
-            content=post.content,
-            status=post.status
-        )
+    def serialize(cls, post: Post, fields: Iterable[str] = FIELDS) -> dict:
+        """
+        Serializes post entity or row, which has to provide at least
+        requested `fields`, into dict of this model shape which can be
+        encoded to JSON as is, without creating the model.
+        """
+        data = {"id": post.id}
+        for field in fields:
+            data[field] = getattr(post, field)
+        if "status" in data:
+            data["status"] = data["status"].value
+        return data
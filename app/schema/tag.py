@@ -8,8 +8,8 @@ class TagResponse(BaseModel):
     slug: str
 
     @classmethod
-    def create(cls, tag: Tag) -> "TagResponse":
-        return cls(
-            id=tag.id,
-            slug=tag.slug,
-        )
+    def serialize(cls, tag: Tag) -> dict:
+        return {
+            "id": tag.id,
+            "slug": tag.slug,
+        }
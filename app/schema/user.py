@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import ClassVar, Optional
 
 from pydantic import BaseModel, UUID4
 
@@ -8,18 +8,23 @@ from app.schema.comment import CommentResponse
 
 
 class UserResponse(BaseModel):
+    # columns needed to create response
+    FIELDS: ClassVar[tuple[str, ...]] = ("first_name", "last_name", "email")
+
     id: UUID4
     first_name: str
     last_name: str
     email: str
     posts: Optional[list["PostResponse"]] = None
     comments: Optional[list["CommentResponse"]] = None
+    # whether user has more comments than included
+    comments_has_more: Optional[bool] = None
 
     @classmethod
-    def create(cls, user: User) -> "UserResponse":
-        return cls(
-            id=user.id,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            email=user.email,
-        )
+    def serialize(cls, user: User) -> dict:
+        return {
+            "id": user.id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email": user.email,
+        }
@@ -1,12 +1,40 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator
+
+import inject
+from anyio import CapacityLimiter
+from anyio.to_thread import current_default_thread_limiter
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import ORJSONResponse
 from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from uvicorn.config import HTTP_PROTOCOLS
+from uvicorn.importer import import_from_string
 
-from app.utils.middleware import DBMiddleware, AuditMiddleware
+from app.utils.audit import AuditWriter
+from app.utils.config import Config, SERVER_DEFAULTS
+from app.utils.db import prewarm_pool
+from app.utils.metrics import REGISTRY, Gauge, MultiProcessMetrics
+from app.utils.middleware import (
+    DBMiddleware, AuditMiddleware, RequestContextMiddleware, TimedMiddleware
+)
+from app.utils.response import TimedORJSONResponse
 from app.errors import generic_error_handler, http_error_handler
 from app.version import __version__
-from app.handler import user, post
+from app.handler import user, post, metrics
+
+logger = logging.getLogger(__name__)
+
+THREAD_POOL_SIZE = Gauge(
+    "thread_pool_size",
+    "Number of threads which can run sync code, like sync DB calls, at once.",
+)
+THREAD_POOL_BUSY = Gauge(
+    "thread_pool_busy",
+    "Number of threads running sync code.",
+)
 
 
 class Server:
@@ -14,7 +42,8 @@ class Server:
         self.app = FastAPI(
             title="app",
             version=__version__,
-            default_response_class=ORJSONResponse
+            default_response_class=TimedORJSONResponse,
+            lifespan=lifespan
         )
         self.app.include_router(
             prefix="/api/posts",
@@ -26,15 +55,90 @@ class Server:
             tags=["users"],
             router=user.router
         )
+        self.app.include_router(router=metrics.router)
 
-        attach_middlewares(app=self.app)
+        attach_middlewares(app=self.app, config=inject.instance(Config))
         attach_error_handlers(app=self.app)
 
 
-def attach_middlewares(app: FastAPI):
-    app.add_middleware(DBMiddleware, only_success_commit=True)
-    app.add_middleware(AuditMiddleware, application='app')
-    app.add_middleware(GZipMiddleware)
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """
+    Prepares app resources before server starts accepting traffic, and
+    releases them once it stops.
+    """
+    config = inject.instance(Config)
+    log_runtime(config=config)
+    pool_size = config.get("database.pool_size", 5)
+    await prewarm_pool(
+        engine=inject.instance("db_engine"),
+        size=min(config.get("database.pool_prewarm", 0), pool_size)
+    )
+    audit_writer = inject.instance(AuditWriter)
+    audit_writer.start()
+    # limiter is bound to event loop, so it is looked up on it
+    register_thread_pool_metrics(limiter=current_default_thread_limiter())
+    multiprocess_metrics = inject.instance(MultiProcessMetrics)
+    if multiprocess_metrics is not None:
+        multiprocess_metrics.start()
+    yield
+    # records of the last requests are written before worker exits
+    await run_in_threadpool(audit_writer.stop)
+    if multiprocess_metrics is not None:
+        await run_in_threadpool(multiprocess_metrics.stop)
+
+
+def register_thread_pool_metrics(limiter: CapacityLimiter) -> None:
+    """Makes thread pool gauges report provided limiter of thread pool."""
+
+    def collect() -> None:
+        THREAD_POOL_SIZE.set(limiter.total_tokens)
+        THREAD_POOL_BUSY.set(limiter.borrowed_tokens)
+
+    REGISTRY.add_collector("thread_pool", collect)
+
+
+def log_runtime(config: Config) -> None:
+    """
+    Logs which event loop and HTTP protocol implementation are in use. HTTP
+    protocol is resolved the way uvicorn resolves it, so `auto` is reported
+    as the implementation it stands for.
+    """
+    loop = type(asyncio.get_running_loop())
+    http = config.get("server.http", SERVER_DEFAULTS["http"])
+    http = import_from_string(HTTP_PROTOCOLS.get(http, http))
+    logger.info(
+        f"Running on {loop.__module__}.{loop.__name__} event loop, "
+        f"using {http.__module__}.{http.__name__} HTTP protocol."
+    )
+
+
+def attach_middlewares(app: FastAPI, config: Config):
+    # each middleware is timed as separate phase of request, and everything
+    # within them as handler
+    app.add_middleware(TimedMiddleware, phase="handler")
+    app.add_middleware(
+        TimedMiddleware,
+        phase="db-middleware",
+        middleware=DBMiddleware,
+        only_success_commit=True,
+        excluded_paths=[metrics.METRICS_PATH]
+    )
+    app.add_middleware(
+        TimedMiddleware,
+        phase="audit-middleware",
+        middleware=AuditMiddleware,
+        application='app',
+        excluded_paths=[metrics.METRICS_PATH]
+    )
+    app.add_middleware(
+        TimedMiddleware, phase="gzip-middleware", middleware=GZipMiddleware
+    )
+    # outermost, so context covers the whole request
+    app.add_middleware(
+        RequestContextMiddleware,
+        server_timing=config.get("server.server_timing", False)
+    )
 
 
 def attach_error_handlers(app: FastAPI):
@@ -1,6 +1,13 @@
 from typing import Protocol
 
-from sqlalchemy.orm.query import Query
+from sqlalchemy import asc, desc, select
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.orm.strategy_options import Load
+from sqlalchemy.sql import ColumnElement, Select
+
+from app.db.comment import RANKED_COMMENTS, Comment
+from app.enum import IncludeOrderFilter
+from app.filter import IncludePage
 
 
 class QueryIncluderInterface(Protocol):
@@ -8,8 +15,60 @@ class QueryIncluderInterface(Protocol):
     Interface that defines which methods each QueryIncluder needs to define.
     """
 
-    def apply(self, query: Query) -> Query:
+    def apply(self, query: Select) -> Select:
         """
         Accepts query of some DB model, joins specific entities to it and
         returns decorated query.
         """
+
+    def version(self) -> ColumnElement:
+        """
+        Returns expression of version of joined entities, correlated to
+        model of the query, which changes whenever any of them changes.
+        """
+
+
+class PagedQueryIncluder:
+    """
+    Base of QueryIncluders of collections which are bounded, so only single
+    page of each collection is loaded, as requested by provided
+    `include_page`.
+    """
+
+    def __init__(self, include_page: IncludePage) -> None:
+        self.include_page = include_page
+
+    def load_comments(self, model: type) -> Load:
+        """
+        Returns option loading single page of ranked comments of `model`, see
+        `ranked_comments`. One comment more than requested is loaded, only to
+        find out if there are more of them.
+        """
+        comments = getattr(
+            model, RANKED_COMMENTS[self.include_page.order.value]
+        )
+        rank = comments.property.info["rank"]
+        return selectinload(
+            comments.and_(rank <= self.include_page.limit + 1)
+        )
+
+    def comments_page(
+        self, model: type, foreign_key: str, column: str = "id"
+    ) -> Select:
+        """
+        Returns query of provided `column` of comments of `model` which are
+        loaded by `load_comments`, correlated to `model` of enclosing query.
+        It reads only that page from the index of comments of `model`, so
+        version of included comments does not depend on all of them.
+        """
+        comment = aliased(Comment)
+        newest = self.include_page.order == IncludeOrderFilter.NEWEST
+        order = desc if newest else asc
+        return (
+            select(getattr(comment, column))
+            .where(getattr(comment, foreign_key) == model.id)
+            .order_by(order(comment.created_at), order(comment.id))
+            .limit(self.include_page.limit + 1)
+            # correlated through version subquery it is nested in
+            .correlate(model)
+        )
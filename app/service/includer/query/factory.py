@@ -1,11 +1,18 @@
 from abc import ABC, abstractmethod
 from collections.abc import Iterable
 from enum import Enum
+from typing import Optional
 
-from app.service.includer.query.base import QueryIncluderInterface
+from sqlalchemy.sql import ColumnElement
+
+from app.filter import IncludePage
+from app.service.includer.query.base import (
+    QueryIncluderInterface, PagedQueryIncluder
+)
 from app.service.includer.query.post import (
     UserToPostQueryIncluder, CommentsToPostQueryIncluder,
-    TagsToPostQueryIncluder
+    TagsToPostQueryIncluder, CommentsUserToPostQueryIncluder,
+    CommentCountToPostQueryIncluder, TagSlugsToPostQueryIncluder
 )
 from app.service.includer.query.user import (
     PostsToUserQueryIncluder, CommentsToUserQueryIncluder
@@ -19,15 +26,52 @@ class AbstractQueryIncluderFactory(ABC):
     for each include value provided from query_includer_map abstract method.
     """
 
-    def __init__(self, include: list[Enum]) -> None:
+    def __init__(
+        self, include: list[Enum], include_page: IncludePage = IncludePage()
+    ) -> None:
         self.include = include
+        self.include_page = include_page
 
     def __iter__(self) -> Iterable[QueryIncluderInterface]:
         """
         Yields correct QueryIncluder object for each include value provided.
+        Includers of bounded collections are provided with include page.
         """
         for value in self.include:
-            yield self.query_includer_map[value.value]()
+            query_includer = self.query_includer_map[value.value]
+            if issubclass(query_includer, PagedQueryIncluder):
+                yield query_includer(include_page=self.include_page)
+            else:
+                yield query_includer()
+
+    def versions(self) -> list[ColumnElement]:
+        """
+        Returns version expressions of includers, each labeled by its include
+        value, so they can be told apart by name no matter in which order
+        include values are provided.
+        """
+        return [
+            query_includer.version().label(f"{value.value}_version")
+            for value, query_includer in zip(self.include, self)
+        ]
+
+    @property
+    def key(self) -> tuple[frozenset[type], Optional[IncludePage]]:
+        """
+        Key of includers of include values, along with include page if any
+        of them is bounded by it, equal for all factories which apply the
+        same includers, no matter in which order they are requested.
+        Includers are keyed by their classes rather than include values, so
+        factories mapping the same value to different includers, e.g. to
+        compare loading strategies, do not share statements.
+        """
+        includers = frozenset(
+            self.query_includer_map[value.value] for value in self.include
+        )
+        paged = any(
+            issubclass(includer, PagedQueryIncluder) for includer in includers
+        )
+        return includers, self.include_page if paged else None
 
     @property
     @abstractmethod
@@ -45,7 +89,10 @@ class PostQueryIncluderFactory(AbstractQueryIncluderFactory):
     query_includer_map = {
         "USER": UserToPostQueryIncluder,
         "COMMENTS": CommentsToPostQueryIncluder,
-        "TAGS": TagsToPostQueryIncluder
+        "TAGS": TagsToPostQueryIncluder,
+        "COMMENTS.USER": CommentsUserToPostQueryIncluder,
+        "COMMENT_COUNT": CommentCountToPostQueryIncluder,
+        "TAG_SLUGS": TagSlugsToPostQueryIncluder
     }
 
 
@@ -1,38 +1,117 @@
-from sqlalchemy.orm.query import Query
-from sqlalchemy.orm import subqueryload
+from sqlalchemy import and_, func, literal_column
+from sqlalchemy.sql import ColumnElement, Select
+from sqlalchemy.orm import joinedload, selectinload, undefer
 
-from app.db import Post
-from app.service.includer.query.base import QueryIncluderInterface
+from app.db import Post, User, Comment, Tag
+from app.db.tag import post_tags
+from app.utils.db import version_of
+from app.service.includer.query.base import (
+    QueryIncluderInterface, PagedQueryIncluder
+)
 
 
 class UserToPostQueryIncluder(QueryIncluderInterface):
 
-    def apply(self, query: Query) -> Query:
+    def apply(self, query: Select) -> Select:
         """Joins user details to post from provided query."""
+        # many-to-one, so it is joined to the same query without multiplying
+        # rows, and inner join is used since every post has its user
         return query.options(
-            subqueryload(
-                Post.user
+            joinedload(
+                Post.user, innerjoin=True
             )
         )
 
+    def version(self) -> ColumnElement:
+        """Version of user details joined to post."""
+        return version_of(User, User.id == Post.user_id)
 
-class CommentsToPostQueryIncluder(QueryIncluderInterface):
 
-    def apply(self, query: Query) -> Query:
-        """Joins all comments that are related to post from provided query."""
-        return query.options(
-            subqueryload(
-                Post.comments
-            )
+class CommentsToPostQueryIncluder(PagedQueryIncluder):
+
+    def apply(self, query: Select) -> Select:
+        """
+        Joins single page of comments that are related to post from provided
+        query.
+        """
+        # collections are loaded by single IN query per relation, instead of
+        # joining them and multiplying rows of the page
+        return query.options(self.load_comments(Post))
+
+    def version(self) -> ColumnElement:
+        """Version of the page of comments joined to post."""
+        return version_of(
+            Comment, Comment.id.in_(self.comments_page(Post, "post_id"))
         )
 
 
 class TagsToPostQueryIncluder(QueryIncluderInterface):
 
-    def apply(self, query: Query) -> Query:
+    def apply(self, query: Select) -> Select:
         """Joins all tags that are related to post from provided query."""
         return query.options(
-            subqueryload(
+            selectinload(
                 Post.tags
             )
         )
+
+    def version(self) -> ColumnElement:
+        """Version of all tags joined to post."""
+        return version_of(Tag, and_(
+            post_tags.c.post_id == Post.id,
+            post_tags.c.tag_slug == Tag.slug
+        ))
+
+
+class CommentsUserToPostQueryIncluder(CommentsToPostQueryIncluder):
+    """
+    Joins comments the same way as `CommentsToPostQueryIncluder`, their users
+    are loaded afterwards, see `CommentsUserIncluder`.
+    """
+
+    def version(self) -> ColumnElement:
+        """Version of the page of comments joined to post and their users."""
+        return func.concat(
+            super().version(),
+            literal_column("'/'"),
+            version_of(User, User.id.in_(
+                self.comments_page(Post, "post_id", column="user_id")
+            ))
+        )
+
+
+class CommentCountToPostQueryIncluder(QueryIncluderInterface):
+    """
+    Loads number of comments of post, which is kept in `posts` table, so no
+    comment has to be loaded for it.
+    """
+
+    def apply(self, query: Select) -> Select:
+        """Loads comment count along with posts from provided query."""
+        # column is deferred by `load_only` of sparse fieldsets
+        return query.options(undefer(Post.comment_count))
+
+    def version(self) -> ColumnElement:
+        """
+        Comment count itself, since triggers maintaining it do not change
+        modification time of post.
+        """
+        return Post.comment_count
+
+
+class TagSlugsToPostQueryIncluder(QueryIncluderInterface):
+    """
+    Loads slugs of tags of post, which are kept in `posts` table, so no tag
+    has to be loaded for them.
+    """
+
+    def apply(self, query: Select) -> Select:
+        """Loads tag slugs along with posts from provided query."""
+        return query.options(undefer(Post.tag_slugs))
+
+    def version(self) -> ColumnElement:
+        """
+        Tag slugs themselves, since triggers maintaining them do not change
+        modification time of post.
+        """
+        return Post.tag_slugs
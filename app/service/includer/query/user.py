@@ -1,27 +1,39 @@
-from sqlalchemy.orm.query import Query
-from sqlalchemy.orm import subqueryload
+from sqlalchemy.sql import ColumnElement, Select
+from sqlalchemy.orm import selectinload
 
-from app.db import User
-from app.service.includer.query.base import QueryIncluderInterface
+from app.db import User, Post, Comment
+from app.utils.db import version_of
+from app.service.includer.query.base import (
+    QueryIncluderInterface, PagedQueryIncluder
+)
 
 
 class PostsToUserQueryIncluder(QueryIncluderInterface):
 
-    def apply(self, query: Query) -> Query:
+    def apply(self, query: Select) -> Select:
         """Joins all posts that are related to user from provided query."""
         return query.options(
-            subqueryload(
+            selectinload(
                 User.posts
             )
         )
 
+    def version(self) -> ColumnElement:
+        """Version of all posts joined to user."""
+        return version_of(Post, Post.user_id == User.id)
 
-class CommentsToUserQueryIncluder(QueryIncluderInterface):
 
-    def apply(self, query: Query) -> Query:
-        """Joins all comments that are related to user from provided query."""
-        return query.options(
-            subqueryload(
-                User.comments
-            )
+class CommentsToUserQueryIncluder(PagedQueryIncluder):
+
+    def apply(self, query: Select) -> Select:
+        """
+        Joins single page of comments that are related to user from provided
+        query.
+        """
+        return query.options(self.load_comments(User))
+
+    def version(self) -> ColumnElement:
+        """Version of the page of comments joined to user."""
+        return version_of(
+            Comment, Comment.id.in_(self.comments_page(User, "user_id"))
         )
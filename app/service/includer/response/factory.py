@@ -1,10 +1,20 @@
+import asyncio
 from enum import Enum
-from collections.abc import Iterable
+from functools import partial
+from collections.abc import Callable, Iterable
+from typing import Any, Optional
 
 from app.service.includer.response.includer import (
     AbstractResponseIncluder, CommentsIncluder, UserIncluder,
-    TagsIncluder, PostsIncluder
+    TagsIncluder, PostsIncluder, CommentsUserIncluder, CommentCountIncluder,
+    TagSlugsIncluder, PagedResponseIncluder
 )
+from app.filter import IncludePage
+from app.utils.context import timed
+from app.utils.loader import LoaderRegistry
+
+# serializer of single entity or row into dict of response model shape
+Serializer = Callable[[Any], dict]
 
 
 class ResponseIncluderFactory:
@@ -12,17 +22,106 @@ class ResponseIncluderFactory:
     ResponseIncluder factory that accepts include values through
     initialization and behaves like Iterable, producing ResponseIncluder
     objects for each include value provided using includer_map attribute.
+    Include values can also be compiled into serializer of whole response,
+    which is then applied to every entity of the response, once includers
+    prefetched what they need for all of them.
     """
     response_includer_map: dict[str, AbstractResponseIncluder] = {
-        "POSTS": PostsIncluder,
-        "COMMENTS": CommentsIncluder,
-        "USER": UserIncluder,
-        "TAGS": TagsIncluder,
+        "POSTS": PostsIncluder(),
+        "COMMENTS": CommentsIncluder(),
+        "USER": UserIncluder(),
+        "TAGS": TagsIncluder(),
+        "COMMENTS.USER": CommentsUserIncluder(),
+        "COMMENT_COUNT": CommentCountIncluder(),
+        "TAG_SLUGS": TagSlugsIncluder(),
     }
+    # serializers compiled so far, by response model, its fields, set of
+    # include values and include page of bounded includes, which are all
+    # limited by filters to few combinations
+    _serializers: dict[tuple, Serializer] = {}
 
-    def __init__(self, include: Iterable[Enum]) -> None:
+    def __init__(
+        self,
+        include: Iterable[Enum],
+        include_page: IncludePage = IncludePage()
+    ) -> None:
         self._include = include
+        self._include_page = include_page
 
-    def __iter__(self) -> Iterable[type[AbstractResponseIncluder]]:
+    def __iter__(self) -> Iterable[AbstractResponseIncluder]:
         for incl in self._include:
-            yield self.response_includer_map[incl.value]
+            yield self._includer(incl.value)
+
+    async def prefetch(self, loaders: LoaderRegistry, data: list) -> None:
+        """
+        Lets all includers prefetch relationships of provided entities, see
+        `AbstractResponseIncluder.prefetch`. Includers prefetch concurrently,
+        so loaders coalesce lookups of the same type between them.
+        """
+        if data:
+            with timed("attach"):
+                await asyncio.gather(
+                    *(includer.prefetch(loaders, data) for includer in self)
+                )
+
+    def serializer(
+        self, schema: type, fields: Optional[tuple[str, ...]] = None
+    ) -> Serializer:
+        """
+        Returns serializer which turns entity into dict of `schema` shape,
+        calling `schema.serialize` with `fields` if provided, and attaches
+        all included relationships. Serializer is compiled once per
+        combination of arguments, include values and include page, and
+        reused afterwards.
+        """
+        include = frozenset(incl.value for incl in self._include)
+        paged = any(
+            isinstance(
+                self.response_includer_map[value], PagedResponseIncluder
+            )
+            for value in include
+        )
+        key = (schema, fields, include, self._include_page if paged else None)
+        serializer = self._serializers.get(key)
+        if serializer is None:
+            serializer = self._compile(schema, fields, include)
+            self._serializers[key] = serializer
+        return serializer
+
+    def _compile(
+        self,
+        schema: type,
+        fields: Optional[tuple[str, ...]],
+        include: frozenset[str]
+    ) -> Serializer:
+        serialize = schema.serialize
+        if fields is not None:
+            serialize = partial(serialize, fields=fields)
+        # includes are attached in order of schema declaration, so response
+        # does not depend on the order in which they are requested, and
+        # nested includes are attached after their parents
+        declared = list(schema.model_fields)
+        include = sorted(include, key=lambda value: (
+            declared.index(value.split(".")[0].lower()), value.count(".")
+        ))
+        attach = tuple(self._includer(value).attach for value in include)
+        if not attach:
+            return serialize
+
+        def serializer(data) -> dict:
+            serialized = serialize(data)
+            for attach_relationship in attach:
+                attach_relationship(serialized, data)
+            return serialized
+
+        return serializer
+
+    def _includer(self, value: str) -> AbstractResponseIncluder:
+        """
+        Returns includer of provided include value, created for include page
+        of this factory if it is bounded by it.
+        """
+        includer = self.response_includer_map[value]
+        if isinstance(includer, PagedResponseIncluder):
+            includer = type(includer)(include_page=self._include_page)
+        return includer
@@ -1,30 +1,38 @@
 from abc import ABC, abstractmethod
 
-from pydantic import BaseModel
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.db.comment import RANKED_COMMENTS
+from app.filter import IncludePage
 from app.schema import UserResponse, PostResponse, CommentResponse, TagResponse
+from app.service.includer.response.loader import UserLoader
+from app.utils.loader import LoaderRegistry
 
 
 class AbstractResponseIncluder(ABC):
     """
-    Abstract class that forces the implementation of objects that should follow
-    decorator pattern, where schema object is accepted through object
-    initialization, and specific property value is populated by calling the
-    implementation of attach abstract method.
+    Abstract class that forces the implementation of objects that populate
+    specific property of serialized schema by calling the implementation of
+    attach abstract method. Includers hold no state, so single instance of
+    each is shared by all compiled serializers.
     """
 
-    def __init__(self, schema: BaseModel) -> None:
+    async def prefetch(self, loaders: LoaderRegistry, data: list) -> None:
         """
-        :param schema: Instance of one of the pydantic response models to which
-        needs to be decorated with additional data.
+        Loads relationship values which are not loaded by query includers,
+        usually nested ones, for all provided entities at once, before any of
+        them is attached. Nothing is loaded by default.
+        :param loaders: Loaders of the request.
+        :param data: sqlalchemy models which are going to be attached.
         """
-        self._schema = schema
 
     @abstractmethod
-    def attach(self, data) -> None:
+    def attach(self, schema: dict, data) -> None:
         """
         Attaches specific relationship property values from given data to
-        schema provided through initialization.
+        provided schema.
+        :param schema: One of the response models serialized into dict, which
+        needs to be decorated with additional data.
         :param data: sqlalchemy model which holds data that needs to be
         attached to provided schema.
         """
@@ -33,34 +41,99 @@ class AbstractResponseIncluder(ABC):
 class PostsIncluder(AbstractResponseIncluder):
     """Responsible for attaching posts from given data to given schema."""
 
-    def attach(self, data) -> None:
-        self._schema.posts = [
-            PostResponse.create(post=post)
+    def attach(self, schema: dict, data) -> None:
+        schema["posts"] = [
+            PostResponse.serialize(post=post)
             for post in data.posts
         ]
 
 
-class CommentsIncluder(AbstractResponseIncluder):
-    """Responsible for attaching comments from given data to given schema."""
+class PagedResponseIncluder(AbstractResponseIncluder, ABC):
+    """
+    Abstract class of includers of bounded collections, which attach single
+    page of collection as requested by provided `include_page`. Factory
+    creates them for each include page, instead of sharing single instance.
+    """
+
+    def __init__(self, include_page: IncludePage = IncludePage()) -> None:
+        self.include_page = include_page
+
 
-    def attach(self, data) -> None:
-        self._schema.comments = [
-            CommentResponse.create(comment=comment)
-            for comment in data.comments
+class CommentsIncluder(PagedResponseIncluder):
+    """
+    Responsible for attaching single page of comments from given data to
+    given schema, along with marker whether there are more of them.
+    """
+
+    def __init__(self, include_page: IncludePage = IncludePage()) -> None:
+        super().__init__(include_page=include_page)
+        self._attribute = RANKED_COMMENTS[include_page.order.value]
+
+    def comments(self, data) -> list:
+        """Returns page of comments of given data."""
+        # query includer loads one comment more than requested
+        return getattr(data, self._attribute)[:self.include_page.limit]
+
+    def attach(self, schema: dict, data) -> None:
+        schema["comments"] = [
+            CommentResponse.serialize(comment=comment)
+            for comment in self.comments(data)
         ]
+        schema["comments_has_more"] = (
+            len(getattr(data, self._attribute)) > self.include_page.limit
+        )
 
 
 class TagsIncluder(AbstractResponseIncluder):
     """Responsible for attaching tags from given data to given schema."""
 
-    def attach(self, data) -> None:
-        self._schema.tags = [
-            TagResponse.create(tag=tag) for tag in data.tags
+    def attach(self, schema: dict, data) -> None:
+        schema["tags"] = [
+            TagResponse.serialize(tag=tag) for tag in data.tags
         ]
 
 
 class UserIncluder(AbstractResponseIncluder):
     """Responsible for attaching user from given data to given schema."""
 
-    def attach(self, data) -> None:
-        self._schema.user = UserResponse.create(user=data.user)
+    def attach(self, schema: dict, data) -> None:
+        schema["user"] = UserResponse.serialize(user=data.user)
+
+
+class CommentCountIncluder(AbstractResponseIncluder):
+    """Responsible for attaching comment count from given data to schema."""
+
+    def attach(self, schema: dict, data) -> None:
+        schema["comment_count"] = data.comment_count
+
+
+class TagSlugsIncluder(AbstractResponseIncluder):
+    """Responsible for attaching tag slugs from given data to schema."""
+
+    def attach(self, schema: dict, data) -> None:
+        schema["tag_slugs"] = data.tag_slugs
+
+
+class CommentsUserIncluder(CommentsIncluder):
+    """
+    Responsible for attaching comments from given data to given schema, each
+    with its user. Users of all comments are loaded by single query, since
+    comments are loaded by query includer without them.
+    """
+
+    async def prefetch(self, loaders: LoaderRegistry, data: list) -> None:
+        comments = [
+            comment for item in data for comment in self.comments(item)
+        ]
+        users = await loaders.get(UserLoader).load_many(
+            comment.user_id for comment in comments
+        )
+        for comment, user in zip(comments, users):
+            set_committed_value(comment, "user", user)
+
+    def attach(self, schema: dict, data) -> None:
+        if "comments" not in schema:
+            super().attach(schema, data)
+        comments = self.comments(data)
+        for comment_schema, comment in zip(schema["comments"], comments):
+            comment_schema["user"] = UserResponse.serialize(user=comment.user)
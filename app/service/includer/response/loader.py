@@ -0,0 +1,18 @@
+from uuid import UUID
+
+from app.db import User
+from app.service.includer.query import UserQueryIncluderFactory
+from app.utils.db import DBSession
+from app.utils.loader import Loader
+
+
+class UserLoader(Loader):
+    """Loads users by their IDs."""
+
+    async def fetch(self, db: DBSession, keys: list[UUID]) -> dict[UUID, User]:
+        users = await User.get_many(
+            db=db,
+            user_ids=[str(key) for key in keys],
+            query_includer_factory=UserQueryIncluderFactory(include=[])
+        )
+        return {user.id: user for user in users}
@@ -1,14 +1,21 @@
 import logging
 from typing import Optional
+from collections.abc import AsyncIterator
 
-from sqlalchemy.orm.session import Session
+import orjson
 
 from app import errors
 from app.db import Post, PostStatusType
+from app.filter import Cursor, IncludePage
 from app.schema import PostResponse
 from app.service.includer.query import PostQueryIncluderFactory
 from app.service.includer.response import ResponseIncluderFactory
-from app.enum import PostIncludeFilter
+from app.enum import PostIncludeFilter, PostFieldsFilter
+from app.utils.db import DBSession
+from app.utils.cache import ResponseCache
+from app.utils.context import timed
+from app.utils.loader import LoaderRegistry
+from app.utils.response import encode_default, make_etag
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +23,78 @@ logger = logging.getLogger(__name__)
 class PostService:
     """Class holds all post related operations."""
 
-    def __init__(self, db: Session) -> None:
+    def __init__(
+        self,
+        db: DBSession,
+        cache: Optional[ResponseCache] = None,
+        loaders: Optional[LoaderRegistry] = None
+    ) -> None:
         self.db = db
+        self.cache = cache
+        self.loaders = loaders if loaders is not None else LoaderRegistry(db)
 
-    def get_post(
-        self, post_id: str, include: list[PostIncludeFilter]
-    ) -> PostResponse:
+    async def get_post_etag(
+        self,
+        post_id: str,
+        include: list[PostIncludeFilter],
+        include_page: IncludePage = IncludePage()
+    ) -> str:
+        """
+        Method will create entity tag of post with provided `post_id`, as it
+        would be returned by `get_post`, from versions of the post and of its
+        relationships requested through `include`, without loading them.
+        """
+        query_includer_factory = PostQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        version = await Post.version(
+            db=self.db,
+            post_id=post_id,
+            query_includer_factory=query_includer_factory
+        )
+        if version is None:
+            raise errors.PostNotFound()
+
+        include = sorted(incl.value for incl in include)
+        return make_etag(
+            "post", post_id, include, tuple(include_page),
+            sorted(version._mapping.items())
+        )
+
+    async def get_post(
+        self,
+        post_id: str,
+        include: list[PostIncludeFilter],
+        include_page: IncludePage = IncludePage(),
+        etag: Optional[str] = None
+    ) -> dict:
         """
         Method will fetch post with provided `post_id`, with all relationships
-        joined that are requested through `include`.
+        joined that are requested through `include`, serialized into shape of
+        `PostResponse`. Included collections, like comments, are bounded by
+        `include_page`. Post is read through the cache, if it is provided
+        along with `etag` created by `get_post_etag`. Entries are keyed by
+        it, so entry of previous version is never returned under current
+        entity tag, even if its invalidation was missed or raced with read.
         """
-        query_includer_factory = PostQueryIncluderFactory(include=include)
-        post = Post.get(
+        cache = self.cache if etag is not None else None
+        cache_key = ResponseCache.key(
+            "post",
+            post_id,
+            include,
+            include_page.limit,
+            include_page.order.value,
+            etag
+        )
+        if cache is not None:
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                return orjson.loads(cached)
+
+        query_includer_factory = PostQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        post = await Post.get(
             db=self.db,
             post_id=post_id,
             query_includer_factory=query_includer_factory
@@ -35,33 +102,201 @@ class PostService:
         if post is None:
             raise errors.PostNotFound()
 
-        post_schema = PostResponse.create(post=post)
-        for incl in ResponseIncluderFactory(include=include):
-            incl(schema=post_schema).attach(data=post)
+        response_includer_factory = ResponseIncluderFactory(
+            include=include, include_page=include_page
+        )
+        await response_includer_factory.prefetch(self.loaders, [post])
+        serialize = response_includer_factory.serializer(schema=PostResponse)
+        with timed("serialize"):
+            post_schema = serialize(post)
 
+        if cache is not None:
+            tags = {f"post:{post.id}", f"user:{post.user_id}"}
+            if PostIncludeFilter.TAGS in include:
+                tags.update(f"tag:{tag.slug}" for tag in post.tags)
+            if PostIncludeFilter.TAG_SLUGS in include:
+                tags.update(f"tag:{slug}" for slug in post.tag_slugs)
+            if PostIncludeFilter.COMMENTS_USER in include:
+                tags.update(
+                    f"user:{comment['user_id']}"
+                    for comment in post_schema["comments"]
+                )
+            await cache.set(
+                cache_key,
+                orjson.dumps(post_schema, default=encode_default),
+                tags=tags
+            )
         return post_schema
 
-    def list_posts(
+    async def get_posts(
+        self,
+        post_ids: list[str],
+        include: list[PostIncludeFilter],
+        include_page: IncludePage = IncludePage()
+    ) -> tuple[list[dict], list[str]]:
+        """
+        Method will fetch posts with provided `post_ids` in single query, with
+        all relationships joined that are requested through `include`, the
+        same way as `get_post` does. Posts are returned in order of provided
+        IDs, along with IDs of posts which do not exist.
+        """
+        query_includer_factory = PostQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        posts = await Post.get_many(
+            db=self.db,
+            post_ids=post_ids,
+            query_includer_factory=query_includer_factory
+        )
+        response_includer_factory = ResponseIncluderFactory(
+            include=include, include_page=include_page
+        )
+        await response_includer_factory.prefetch(self.loaders, posts)
+        serialize = response_includer_factory.serializer(schema=PostResponse)
+        posts = {str(post.id): post for post in posts}
+        posts_schema, missing = [], []
+        with timed("serialize"):
+            for post_id in post_ids:
+                post = posts.get(post_id)
+                if post is None:
+                    missing.append(post_id)
+                else:
+                    posts_schema.append(serialize(post))
+        return posts_schema, missing
+
+    async def list_posts_etag(
         self,
         include: list[PostIncludeFilter],
-        status: Optional[PostStatusType] = None
-    ) -> list[PostResponse]:
+        limit: int,
+        include_page: IncludePage = IncludePage(),
+        status: Optional[PostStatusType] = None,
+        cursor: Optional[Cursor] = None,
+        fields: Optional[list[PostFieldsFilter]] = None
+    ) -> str:
         """
-        Method will fetch all posts, with all relationships joined that are
-        requested through `include`. If `status` is provided, only posts with
-        given status will be returned.
+        Method will create entity tag of single page of posts, as it would be
+        returned by `list_posts`, from versions of posts and of their
+        relationships requested through `include`, without loading them.
         """
-        query_incl_factory = PostQueryIncluderFactory(include=include)
-        posts = Post.list(
+        query_incl_factory = PostQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        # versions of the post from the next page are included as well, since
+        # it decides whether next cursor is returned
+        versions = await Post.list_version(
             db=self.db,
             status=status,
+            cursor=cursor,
+            limit=limit + 1,
             query_includer_factory=query_incl_factory
         )
-        posts_schema = []
-        for post in posts:
-            post_schema = PostResponse.create(post=post)
-            for incl in ResponseIncluderFactory(include=include):
-                incl(schema=post_schema).attach(data=post)
-            posts_schema.append(post_schema)
+        include = sorted(incl.value for incl in include)
+        return make_etag(
+            "posts",
+            include,
+            tuple(include_page),
+            self._field_names(fields),
+            limit,
+            [sorted(version._mapping.items()) for version in versions]
+        )
 
-        return posts_schema
+    async def list_posts(
+        self,
+        include: list[PostIncludeFilter],
+        limit: int,
+        include_page: IncludePage = IncludePage(),
+        status: Optional[PostStatusType] = None,
+        cursor: Optional[Cursor] = None,
+        fields: Optional[list[PostFieldsFilter]] = None
+    ) -> tuple[list[dict], Optional[Cursor]]:
+        """
+        Method will fetch single page of posts, with all relationships joined
+        that are requested through `include` and bounded by `include_page`,
+        serialized into shape of `PostResponse` without creating the models.
+        If `status` is provided, only posts with given status will be
+        returned. If `fields` are provided, only those fields are loaded and
+        returned. Along with the page, cursor of the next page is returned,
+        or None if this is the last page.
+        """
+        field_names = self._field_names(fields)
+        query_incl_factory = PostQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        # one post more than requested is fetched, only to find out if there
+        # is a next page
+        posts = await Post.list(
+            db=self.db,
+            status=status,
+            cursor=cursor,
+            limit=limit + 1,
+            fields=field_names,
+            query_includer_factory=query_incl_factory
+        )
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = Cursor.from_entity(posts[-1])
+
+        response_includer_factory = ResponseIncluderFactory(
+            include=include, include_page=include_page
+        )
+        await response_includer_factory.prefetch(self.loaders, posts)
+        serialize = response_includer_factory.serializer(
+            schema=PostResponse, fields=field_names
+        )
+        with timed("serialize"):
+            posts_schema = [serialize(post) for post in posts]
+        return posts_schema, next_cursor
+
+    async def stream_posts(
+        self,
+        include: list[PostIncludeFilter],
+        chunk_size: int,
+        include_page: IncludePage = IncludePage(),
+        status: Optional[PostStatusType] = None,
+        cursor: Optional[Cursor] = None,
+        fields: Optional[list[PostFieldsFilter]] = None
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Method will lazily produce all posts after provided `cursor`, with all
+        relationships joined that are requested through `include`. Posts are
+        loaded from DB and produced in chunks of `chunk_size`, so response can
+        be streamed without holding whole result set in memory.
+        """
+        field_names = self._field_names(fields)
+        query_incl_factory = PostQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        response_includer_factory = ResponseIncluderFactory(
+            include=include, include_page=include_page
+        )
+        serialize = response_includer_factory.serializer(
+            schema=PostResponse, fields=field_names
+        )
+        async for posts in Post.stream(
+            db=self.db,
+            status=status,
+            cursor=cursor,
+            chunk_size=chunk_size,
+            fields=field_names,
+            query_includer_factory=query_incl_factory
+        ):
+            await response_includer_factory.prefetch(self.loaders, posts)
+            with timed("serialize"):
+                posts_schema = [serialize(post) for post in posts]
+            yield posts_schema
+            # chunks rarely share related entities, so memo of loaders would
+            # grow with the whole result set
+            self.loaders.clear()
+
+    @staticmethod
+    def _field_names(
+        fields: Optional[list[PostFieldsFilter]]
+    ) -> tuple[str, ...]:
+        """
+        Converts requested fields into names of post columns and response
+        fields, which are all of them if no fields are requested.
+        """
+        if fields is None:
+            return PostResponse.FIELDS
+        return tuple(sorted(field.value.lower() for field in fields))
@@ -1,6 +1,7 @@
 import logging
+from typing import Optional
 
-from sqlalchemy.orm.session import Session
+import orjson
 
 from app import errors
 from app.db import User
@@ -8,6 +9,12 @@ from app.schema import UserResponse
 from app.service.includer.query import UserQueryIncluderFactory
 from app.service.includer.response import ResponseIncluderFactory
 from app.enum import UserIncludeFilter
+from app.filter import IncludePage
+from app.utils.db import DBSession
+from app.utils.cache import ResponseCache
+from app.utils.context import timed
+from app.utils.loader import LoaderRegistry
+from app.utils.response import encode_default, make_etag
 
 logger = logging.getLogger(__name__)
 
@@ -15,26 +22,135 @@ logger = logging.getLogger(__name__)
 class UserService:
     """Class holds all user related operations."""
 
-    def __init__(self, db: Session) -> None:
+    def __init__(
+        self,
+        db: DBSession,
+        cache: Optional[ResponseCache] = None,
+        loaders: Optional[LoaderRegistry] = None
+    ) -> None:
         self.db = db
+        self.cache = cache
+        self.loaders = loaders if loaders is not None else LoaderRegistry(db)
 
-    def get_user(
-        self, user_id: str, include: list[UserIncludeFilter]
-    ) -> UserResponse:
+    async def get_user_etag(
+        self,
+        user_id: str,
+        include: list[UserIncludeFilter],
+        include_page: IncludePage = IncludePage()
+    ) -> str:
+        """
+        Method will create entity tag of user with provided `user_id`, as it
+        would be returned by `get_user`, from versions of the user and of its
+        relationships requested through `include`, without loading them.
+        """
+        query_incl_factory = UserQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        version = await User.version(
+            db=self.db,
+            user_id=user_id,
+            query_includer_factory=query_incl_factory
+        )
+        if version is None:
+            raise errors.UserNotFound()
+
+        include = sorted(incl.value for incl in include)
+        return make_etag(
+            "user", user_id, include, tuple(include_page),
+            sorted(version._mapping.items())
+        )
+
+    async def get_user(
+        self,
+        user_id: str,
+        include: list[UserIncludeFilter],
+        include_page: IncludePage = IncludePage(),
+        etag: Optional[str] = None
+    ) -> dict:
         """
         Method will fetch user with provided `user_id`, with all relationships
-        joined that are requested through `include`.
+        joined that are requested through `include`, serialized into shape of
+        `UserResponse`. Included comments are bounded by `include_page`. User
+        is read through the cache, if it is provided along with `etag`
+        created by `get_user_etag`, by which entries are keyed, see
+        `PostService.get_post`.
         """
-        query_incl_factory = UserQueryIncluderFactory(include=include)
-        user = User.get(
+        cache = self.cache if etag is not None else None
+        cache_key = ResponseCache.key(
+            "user",
+            user_id,
+            include,
+            include_page.limit,
+            include_page.order.value,
+            etag
+        )
+        if cache is not None:
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                return orjson.loads(cached)
+
+        query_incl_factory = UserQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        user = await User.get(
             db=self.db,
             user_id=user_id,
+            fields=UserResponse.FIELDS,
             query_includer_factory=query_incl_factory
         )
         if user is None:
             raise errors.UserNotFound()
 
-        user_schema = UserResponse.create(user=user)
-        for includer in ResponseIncluderFactory(include=include):
-            includer(schema=user_schema).attach(data=user)
+        response_incl_factory = ResponseIncluderFactory(
+            include=include, include_page=include_page
+        )
+        await response_incl_factory.prefetch(self.loaders, [user])
+        serialize = response_incl_factory.serializer(schema=UserResponse)
+        with timed("serialize"):
+            user_schema = serialize(user)
+
+        if cache is not None:
+            # posts and comments of the user invalidate user tag on write
+            await cache.set(
+                cache_key,
+                orjson.dumps(user_schema, default=encode_default),
+                tags={f"user:{user.id}"}
+            )
         return user_schema
+
+    async def get_users(
+        self,
+        user_ids: list[str],
+        include: list[UserIncludeFilter],
+        include_page: IncludePage = IncludePage()
+    ) -> tuple[list[dict], list[str]]:
+        """
+        Method will fetch users with provided `user_ids` in single query, with
+        all relationships joined that are requested through `include`, the
+        same way as `get_user` does. Users are returned in order of provided
+        IDs, along with IDs of users which do not exist.
+        """
+        query_incl_factory = UserQueryIncluderFactory(
+            include=include, include_page=include_page
+        )
+        users = await User.get_many(
+            db=self.db,
+            user_ids=user_ids,
+            fields=UserResponse.FIELDS,
+            query_includer_factory=query_incl_factory
+        )
+        response_incl_factory = ResponseIncluderFactory(
+            include=include, include_page=include_page
+        )
+        await response_incl_factory.prefetch(self.loaders, users)
+        serialize = response_incl_factory.serializer(schema=UserResponse)
+        users = {str(user.id): user for user in users}
+        users_schema, missing = [], []
+        with timed("serialize"):
+            for user_id in user_ids:
+                user = users.get(user_id)
+                if user is None:
+                    missing.append(user_id)
+                else:
+                    users_schema.append(serialize(user))
+        return users_schema, missing
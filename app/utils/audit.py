@@ -1,13 +1,33 @@
-import json
+import os
+import queue
 import logging
+import threading
+import time
 from datetime import datetime
+from typing import Optional
 
+import orjson
 from fastapi import Request
+from starlette.concurrency import run_in_threadpool
 
 from app.event import Event
+from app.utils.config import Config
+from app.utils.context import current_request
+from app.utils.metrics import REGISTRY, Counter, Gauge
 
 logger = logging.getLogger(__name__)
 
+AUDIT_RECORDS = Counter(
+    "audit_records_total",
+    "Audit records by what happened to them: queued, dropped or spilled when "
+    "queue was full, written to audit log or failed to be written.",
+    labelnames=("outcome",),
+)
+AUDIT_QUEUE_DEPTH = Gauge(
+    "audit_queue_depth",
+    "Number of audit records waiting in the queue to be written.",
+)
+
 
 class AuditRecordCreator:
     """
@@ -16,7 +36,9 @@ class AuditRecordCreator:
     audit record instances that have been made during request.
     """
 
-    def __init__(self, request: Request, application: str) -> None:
+    def __init__(
+        self, request: Request, application: str, writer: "AuditWriter"
+    ) -> None:
         """
         Initializing audit record creator instance. Saves request which will be
         used in all audit records during request. Creates new audit record list
@@ -24,11 +46,12 @@ class AuditRecordCreator:
 
         :param request: instance of request object. It will be used for getting
         information about current request in audit record.
-
+        :param application: name of application.
+        :param writer: writer which writes audit records to audit log.
         """
         self.app = application
         self.request = request
-        self.audit_logger = logging.getLogger("audit")
+        self.writer = writer
         self._audit_record = None
 
     def __call__(self, event: Event) -> None:
@@ -52,16 +75,19 @@ class AuditRecordCreator:
         """Returns information if audit record exists."""
         return bool(self._audit_record)
 
-    def log_record(self, response_status: int = 200) -> None:
+    async def log_record(self, response_status: int = 200) -> None:
         """
-        Goes through all audit record instances and log event into audit log.
+        Formats audit record, if there is one, and hands it over to writer,
+        which writes it to audit log in background.
 
         :param response_status: status code of response of request
         """
+        if self._audit_record is None:
+            return
         try:
-            self.audit_logger.info(json.dumps(
+            await self.writer.put(
                 self._audit_record.format(response_code=response_status)
-            ))
+            )
         except Exception as e:
             logger.error(f"Audit logger error {str(e)}", exc_info=True)
 
@@ -104,6 +130,7 @@ class AuditRecord:
         ip = self.request.client.host
         user_agent = self.request.headers.get("user-agent", "")
         url = str(self.request.url)
+        context = current_request()
 
         if self._event is not None:
             # self.event is a tuple with event ID at index 0 and
@@ -121,6 +148,7 @@ class AuditRecord:
             "time": datetime.utcnow().isoformat() + "Z",
             "event": event,
             "request": {
+                "id": context.request_id if context is not None else None,
                 "ip": ip,
                 "user_agent": user_agent,
                 "url": url,
@@ -128,3 +156,271 @@ class AuditRecord:
                 "response": response_code,
             }
         }
+
+
+class AuditWriter:
+    """
+    Writes audit records to `audit` logger from background thread, so slow
+    audit log target does not hold up requests. Records are put on bounded
+    queue, from which they are taken in batches of at most `batch_size`
+    records, or whatever arrived within `flush_interval` seconds, serialized
+    and written, after which handlers of audit logger are flushed.
+
+    When queue is full, records are handled by `overflow` policy:
+    - `drop` drops the record,
+    - `block` waits for free space in the queue, off the event loop,
+    - `spill` hands the record to spill thread, which appends it to spill
+      file of the process, `spill_path` suffixed by its PID, from where it
+      is written to audit log once the queue is drained.
+    """
+    OVERFLOW_POLICIES = ("drop", "block", "spill")
+    # put on the queues to stop the threads once all records before it are
+    # handled
+    _STOP = object()
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        overflow: str = "drop",
+        spill_path: Optional[str] = None
+    ) -> None:
+        """
+        :param queue_size: maximum number of records waiting to be written
+        :param batch_size: maximum number of records written at once
+        :param flush_interval: maximum number of seconds record waits for
+        its batch to fill up
+        :param overflow: policy for records which do not fit into the queue
+        :param spill_path: path of files where records are spilled by
+        `spill` policy, each process spills to the one suffixed by its PID
+        """
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+        if overflow == "spill" and not spill_path:
+            raise ValueError("Audit spill path is required to spill records")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.audit_logger = logging.getLogger("audit")
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        # records which did not fit into the queue, waiting to be spilled
+        self._spilled: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._spill_thread: Optional[threading.Thread] = None
+        # guards starting of the threads and the spill file, which is
+        # appended to by spill thread and replayed by writer thread
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Config) -> "AuditWriter":
+        """Creates writer from `audit` section of config."""
+        return cls(
+            queue_size=config.get("audit.queue_size", 10000),
+            batch_size=config.get("audit.batch_size", 100),
+            flush_interval=config.get("audit.flush_interval", 1.0),
+            overflow=config.get("audit.overflow", "drop"),
+            spill_path=config.get("audit.spill_path", None),
+        )
+
+    @property
+    def depth(self) -> int:
+        """Number of records waiting in the queue."""
+        return self._queue.qsize()
+
+    @property
+    def spill_file(self) -> str:
+        """
+        Spill file of current process, so worker processes never replay or
+        remove files of each other.
+        """
+        return f"{self.spill_path}.{os.getpid()}"
+
+    @property
+    def running(self) -> bool:
+        """Tells whether all threads needed by overflow policy are alive."""
+        threads = [self._thread]
+        if self.overflow == "spill":
+            threads.append(self._spill_thread)
+        return all(
+            thread is not None and thread.is_alive() for thread in threads
+        )
+
+    def start(self) -> None:
+        """
+        Starts the writer thread, and spill thread if records are spilled,
+        unless they are already running. Threads are started in the process
+        which writes, so they are started after workers are forked.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-writer", daemon=True
+                )
+                self._thread.start()
+            if self.overflow == "spill" and (
+                self._spill_thread is None
+                or not self._spill_thread.is_alive()
+            ):
+                self._spill_thread = threading.Thread(
+                    target=self._run_spill, name="audit-spill", daemon=True
+                )
+                self._spill_thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stops the threads once all queued records are written, waiting at
+        most `timeout` seconds for each of them. Spill thread is stopped
+        first, so records it spilled are written before writer stops.
+        """
+        spill_thread = self._spill_thread
+        if spill_thread is not None and spill_thread.is_alive():
+            self._spilled.put(self._STOP)
+            spill_thread.join(timeout)
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Audit writer did not drain queue before stop")
+            return
+        thread.join(timeout)
+
+    async def put(self, record: dict) -> None:
+        """
+        Puts formatted audit record on the queue, or handles it by overflow
+        policy if the queue is full. Writer is started if it is not running,
+        also if its thread died.
+
+        :param record: audit record formatted by `AuditRecord.format`
+        """
+        if not self.running:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == "block":
+                await run_in_threadpool(self._queue.put, record)
+            elif self.overflow == "spill":
+                # file is written by spill thread, so event loop never waits
+                # for disk
+                self._spilled.put(record)
+                AUDIT_RECORDS.inc(outcome="spilled")
+                return
+            else:
+                AUDIT_RECORDS.inc(outcome="dropped")
+                return
+        AUDIT_RECORDS.inc(outcome="queued")
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._next_batch()
+            # failure of single iteration does not stop the writer
+            try:
+                if batch:
+                    self._write(batch)
+                if self.overflow == "spill" and (stop or not batch):
+                    # queue is drained, so spilled records are written now
+                    self._replay_spilled()
+            except Exception as e:
+                logger.error(f"Audit writer error {str(e)}", exc_info=True)
+            if stop:
+                return
+
+    def _next_batch(self) -> tuple[list[dict], bool]:
+        """
+        Takes records from the queue until there is `batch_size` of them or
+        `flush_interval` passes since the first one, and tells whether the
+        writer should stop after writing them.
+        """
+        batch: list[dict] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is self._STOP:
+                return batch, True
+            batch.append(record)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch, False
+
+    def _write(self, batch: list[dict]) -> None:
+        try:
+            for record in batch:
+                self.audit_logger.info(orjson.dumps(record).decode())
+            for handler in self.audit_logger.handlers:
+                handler.flush()
+        except Exception as e:
+            AUDIT_RECORDS.inc(len(batch), outcome="failed")
+            logger.error(f"Audit logger error {str(e)}", exc_info=True)
+        else:
+            AUDIT_RECORDS.inc(len(batch), outcome="written")
+
+    def _run_spill(self) -> None:
+        stop = False
+        while not stop:
+            # records spilled meanwhile are appended along with the first one
+            records = [self._spilled.get()]
+            while True:
+                try:
+                    records.append(self._spilled.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(record is self._STOP for record in records)
+            records = [
+                record for record in records if record is not self._STOP
+            ]
+            try:
+                self._spill(records)
+            except Exception as e:
+                AUDIT_RECORDS.inc(len(records), outcome="failed")
+                logger.error(f"Audit spill error {str(e)}", exc_info=True)
+
+    def _spill(self, records: list[dict]) -> None:
+        if not records:
+            return
+        lines = b"".join(orjson.dumps(record) + b"\n" for record in records)
+        with self._lock, open(self.spill_file, "ab") as spill:
+            spill.write(lines)
+
+    def _replay_spilled(self) -> None:
+        # spill file is moved aside, so records spilled meanwhile are kept
+        # for the next replay, unless previous replay was not finished
+        replay_path = f"{self.spill_file}.replay"
+        with self._lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_file):
+                    return
+                os.replace(self.spill_file, replay_path)
+        with open(replay_path, "rb") as replay:
+            batch = []
+            for line in replay:
+                try:
+                    batch.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    AUDIT_RECORDS.inc(outcome="failed")
+                    logger.error(f"Skipping corrupt spilled record {line!r}")
+                    continue
+                if len(batch) == self.batch_size:
+                    self._write(batch)
+                    batch = []
+            if batch:
+                self._write(batch)
+        os.remove(replay_path)
+
+
+def register_queue_metrics(writer: AuditWriter) -> None:
+    """Makes queue depth gauge report provided writer."""
+    REGISTRY.add_collector(
+        "audit_queue", lambda: AUDIT_QUEUE_DEPTH.set(writer.depth)
+    )
@@ -0,0 +1,3 @@
+from app.utils.cache.backend import CacheBackend, MemoryBackend, RedisBackend
+from app.utils.cache.cache import ResponseCache
+from app.utils.cache.invalidation import register_invalidation
@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """
+    Storage of cached values. Each value is stored with its time to live and
+    set of tags, so all values related to some entity can be invalidated at
+    once by tagging them with that entity.
+    """
+    # whether backend performs blocking I/O, in which case it should not be
+    # called directly from event loop
+    blocking: bool = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns value stored under `key` or None if there is no such."""
+
+    @abstractmethod
+    def set(
+        self, key: str, value: bytes, ttl: int, tags: Iterable[str]
+    ) -> None:
+        """Stores `value` under `key` for `ttl` seconds, tagged by `tags`."""
+
+    @abstractmethod
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """Removes all values tagged by any of provided `tags`."""
+
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process backend which keeps at most `max_size` values, evicting least
+    recently used ones. Note that values are not shared between worker
+    processes, so write made through one worker is invalidated only within
+    that worker and others keep stale value until its `ttl` expires, unless
+    its key changes along with written entity.
+    """
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self.max_size = max_size
+        # key: (expires at, value, tags)
+        self._entries: OrderedDict[str, tuple[float, bytes, frozenset]] = (
+            OrderedDict()
+        )
+        self._tags: dict[str, set[str]] = {}
+        # invalidation is triggered from session events, which may happen in
+        # thread pool as well as in event loop
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(
+        self, key: str, value: bytes, ttl: int, tags: Iterable[str]
+    ) -> None:
+        tags = frozenset(tags)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend which keeps values in Redis, so they are shared by all worker
+    processes and instances. Any client speaking Redis protocol with the
+    interface of `redis.Redis` can be provided. Keys of values with the same
+    tag are kept in Redis set which expires together with the latest value.
+    """
+    blocking = True
+
+    def __init__(
+        self, client: redis.Redis, prefix: str = "app:cache:"
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisBackend":
+        return cls(client=redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(
+        self, key: str, value: bytes, ttl: int, tags: Iterable[str]
+    ) -> None:
+        key = self.prefix + key
+        pipeline = self.client.pipeline()
+        pipeline.set(key, value, ex=ttl)
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            pipeline.sadd(tag_key, key)
+            pipeline.expire(tag_key, ttl)
+        pipeline.execute()
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            keys = self.client.smembers(tag_key)
+            self.client.delete(tag_key, *keys)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from enum import Enum
+from collections.abc import Iterable
+from typing import Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.config import Config
+from app.utils.cache.backend import CacheBackend, MemoryBackend, RedisBackend
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Read-through cache of serialized entity responses. Entries are keyed by
+    entity, its id, requested includes and entity tag of its version, and
+    tagged with all entities they were built from, so any write to one of
+    those entities invalidates them. Invalidation only frees entries early,
+    since entry of previous version is not looked up under the new key.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int = 30) -> None:
+        """
+        :param backend: storage of cached values
+        :param ttl: number of seconds after which entry expires
+        """
+        self.backend = backend
+        self.ttl = ttl
+        # invalidations running in threadpool, which reads wait for
+        self._pending: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional["ResponseCache"]:
+        """
+        Creates cache from `cache` section of config, or returns None if
+        caching is disabled.
+        """
+        backend = config.get("cache.backend", "none")
+        if backend == "memory":
+            backend = MemoryBackend(
+                max_size=config.get("cache.max_size", 10000)
+            )
+        elif backend == "redis":
+            backend = RedisBackend.from_url(config.get("cache.url"))
+        elif backend == "none":
+            return None
+        else:
+            raise ValueError(f"Unknown cache backend: {backend}")
+        return cls(backend=backend, ttl=config.get("cache.ttl", 30))
+
+    @staticmethod
+    def key(
+        entity: str, entity_id: str, include: Iterable[Enum], *parts: Any
+    ) -> str:
+        """
+        Creates key of entity response, which does not depend on the order
+        in which includes are requested. Any other `parts` which shape the
+        response, like include page, are appended to the key.
+        """
+        include = ",".join(sorted({incl.value for incl in include}))
+        return ":".join(map(str, (entity, entity_id, include, *parts)))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if self._pending:
+            await asyncio.wait(set(self._pending))
+        if self.backend.blocking:
+            return await run_in_threadpool(self.backend.get, key)
+        return self.backend.get(key)
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str]) -> None:
+        if self.backend.blocking:
+            await run_in_threadpool(
+                self.backend.set, key, value, self.ttl, tags
+            )
+        else:
+            self.backend.set(key, value, self.ttl, tags)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """
+        Invalidates entries tagged with any of provided `tags`. It is called
+        on commit, which for async sessions runs on event loop, where
+        blocking backend is not called directly, but in threadpool. Reads
+        wait for such invalidations, so this process never returns entry
+        whose invalidation was already requested.
+        """
+        if not tags:
+            return
+        logger.debug(f"Invalidating cache tags: {', '.join(tags)}")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or not self.backend.blocking:
+            self.backend.invalidate(tags)
+            return
+        task = loop.create_task(
+            run_in_threadpool(self.backend.invalidate, tags)
+        )
+        self._pending.add(task)
+        task.add_done_callback(self._invalidated)
+
+    def _invalidated(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Unable to invalidate cache", exc_info=task.exception()
+            )
@@ -0,0 +1,71 @@
+import logging
+from functools import partial
+from itertools import chain
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.db import Post, Comment, Tag, User
+from app.utils.cache.cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Cache tags affected by write of each entity, as pairs of entity attribute
+# and tag prefix. Tag is created from both current and previous attribute
+# value, so moving comment to other post invalidates both posts.
+INVALIDATION_TAGS = {
+    Post: (("id", "post"), ("user_id", "user")),
+    Comment: (("post_id", "post"), ("user_id", "user")),
+    Tag: (("slug", "tag"),),
+    User: (("id", "user"),),
+}
+
+# key within `Session.info` where tags of flushed entities are collected
+SESSION_INFO_KEY = "cache_invalidation_tags"
+
+
+def entity_tags(entity: object) -> set[str]:
+    """Returns cache tags affected by write of provided `entity`."""
+    state = inspect(entity)
+    tags = set()
+    for attribute, prefix in INVALIDATION_TAGS.get(type(entity), ()):
+        history = state.attrs[attribute].history
+        for value in chain(history.added, history.unchanged, history.deleted):
+            if value is not None:
+                tags.add(f"{prefix}:{value}")
+    if isinstance(entity, Tag):
+        # post tag assignments may be changed from tag side only
+        # history of collection which was never loaded is blank
+        history = state.attrs.posts.history
+        for post in chain(history.added or (), history.deleted or ()):
+            tags.add(f"post:{post.id}")
+    return tags
+
+
+def _collect(session: Session, flush_context) -> None:
+    tags = session.info.setdefault(SESSION_INFO_KEY, set())
+    for entity in chain(session.new, session.dirty, session.deleted):
+        tags.update(entity_tags(entity))
+
+
+def _invalidate(cache: ResponseCache, session: Session) -> None:
+    tags = session.info.pop(SESSION_INFO_KEY, None)
+    if tags:
+        cache.invalidate(tags)
+
+
+def _discard(session: Session) -> None:
+    session.info.pop(SESSION_INFO_KEY, None)
+
+
+def register_invalidation(cache: ResponseCache) -> None:
+    """
+    Invalidates cache entries of all entities written within a session,
+    once that session is committed. Tags are collected on each flush and
+    dropped on rollback, so entries are never invalidated for writes which
+    did not happen. Listeners are registered on `Session` class, so they
+    apply to sync sessions as well as to ones proxied by async sessions.
+    """
+    event.listen(Session, "after_flush", _collect)
+    event.listen(Session, "after_commit", partial(_invalidate, cache))
+    event.listen(Session, "after_rollback", _discard)
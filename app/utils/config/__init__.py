@@ -1 +1,2 @@
 from app.utils.config.config import Config
+from app.utils.config.defaults import SERVER_DEFAULTS
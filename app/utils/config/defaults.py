@@ -0,0 +1,12 @@
+# Production defaults of uvicorn options that can be overridden in `server`
+# section of config, shared by the entry point which runs the server and by
+# the app which reports them.
+SERVER_DEFAULTS = {
+    "loop": "uvloop",
+    "http": "httptools",
+    "backlog": 2048,
+    "limit_concurrency": None,
+    "timeout_keep_alive": 5,
+    "timeout_graceful_shutdown": 30,
+    "h11_max_incomplete_event_size": None,
+}
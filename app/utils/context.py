@@ -0,0 +1,137 @@
+import time
+from uuid import uuid4
+from typing import Optional
+from contextvars import ContextVar
+from contextlib import contextmanager
+from collections.abc import Iterator
+
+from starlette.types import Scope
+
+# longest request ID accepted from client or proxy, longer ones are replaced
+MAX_REQUEST_ID_LENGTH = 128
+# route of requests which did not match any route, e.g. in metric labels
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestContext:
+    """
+    State of request being handled, available to any code running on its
+    behalf through `current_request`, including threadpool and DB event
+    listeners. Values derived from it, such as route or latency, are
+    computed only when they are read, e.g. when log record is formatted.
+    """
+
+    __slots__ = (
+        "request_id", "scope", "started", "db_queries", "db_seconds",
+        "timings", "_phase", "_phase_started"
+    )
+
+    def __init__(self, scope: Scope, request_id: Optional[str] = None) -> None:
+        """
+        :param scope: ASGI scope of the request, which router updates with
+            matched route
+        :param request_id: ID of the request, new one is generated if it is
+            not provided
+        """
+        self.request_id = request_id or uuid4().hex
+        self.scope = scope
+        # wall clock, so latency can be computed from log record creation
+        self.started = time.time()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        # seconds spent in each phase of the request, like its middlewares
+        self.timings: dict[str, float] = {}
+        self._phase: Optional[str] = None
+        self._phase_started = 0.0
+
+    @classmethod
+    def from_scope(cls, scope: Scope) -> "RequestContext":
+        """
+        Creates context of request with provided scope, which keeps ID from
+        `X-Request-ID` header if request has one.
+        """
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                if len(value) <= MAX_REQUEST_ID_LENGTH:
+                    request_id = value.decode("latin-1")
+                break
+        return cls(scope=scope, request_id=request_id)
+
+    @property
+    def method(self) -> str:
+        return self.scope["method"]
+
+    @property
+    def route(self) -> Optional[str]:
+        """Path template of matched route, None until request is routed."""
+        route = self.scope.get("route")
+        return getattr(route, "path", None)
+
+    def observe_query(self, seconds: float) -> None:
+        """Records DB query executed on behalf of the request."""
+        self.db_queries += 1
+        self.db_seconds += seconds
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """Adds provided seconds to time spent in provided phase."""
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def switch(self, phase: Optional[str]) -> Optional[str]:
+        """
+        Ends current exclusive phase, adding time since it started to it,
+        and starts provided one. Returns ended phase, so caller can switch
+        back to it once provided phase is done. Exclusive phases, like
+        middlewares and handler, do not overlap, so each of them is timed
+        without the phases it calls into.
+        """
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.observe(self._phase, now - self._phase_started)
+        previous, self._phase, self._phase_started = self._phase, phase, now
+        return previous
+
+    def server_timing(self) -> str:
+        """
+        Renders timings of the request so far as `Server-Timing` header,
+        along with DB time and total time, all in milliseconds.
+        """
+        # current phase is timed so far and goes on
+        self.switch(self.switch(None))
+        metrics = [
+            f"{phase};dur={seconds * 1e3:.3f}"
+            for phase, seconds in self.timings.items()
+        ]
+        metrics.append(
+            f'db;dur={self.db_seconds * 1e3:.3f};desc="{self.db_queries} '
+            f'queries"'
+        )
+        metrics.append(f"total;dur={(time.time() - self.started) * 1e3:.3f}")
+        return ", ".join(metrics)
+
+
+REQUEST_CONTEXT: ContextVar[Optional[RequestContext]] = ContextVar(
+    "request_context", default=None
+)
+
+
+def current_request() -> Optional[RequestContext]:
+    """Returns context of request being handled, None outside of requests."""
+    return REQUEST_CONTEXT.get()
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+    Adds time spent within the block to provided phase of current request,
+    if there is one. Such phases overlap the exclusive ones they run in.
+    """
+    request = current_request()
+    if request is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request.observe(phase, time.perf_counter() - start)
@@ -1,25 +1,101 @@
+import os
+import re
+import time
+import hashlib
+import inspect
 import logging
+from typing import Any, Callable, Optional, TypeVar, Union
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Hashable
 
 from fastapi import HTTPException
+from sqlalchemy.engine import Engine, Result
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy import event, func, literal_column, select
+from sqlalchemy.sql import ColumnElement, Executable
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app.utils.config import Config
+from app.utils.context import UNMATCHED_ROUTE, current_request
+from app.utils.metrics import REGISTRY, Gauge, Histogram
 
 logger = logging.getLogger(__name__)
 
+SYNC_DRIVER = "postgresql+psycopg2"
+ASYNC_DRIVER = "postgresql+asyncpg"
+
+DBSession = Union[Session, AsyncSession]
+T = TypeVar("T")
+
+# pyformat placeholders of psycopg2 statements, along with cast to array type
+# which psycopg2 dialect renders for array parameters, and escaped percent
+# signs
+PYFORMAT_PLACEHOLDER = re.compile(
+    r"%\(([^)]+)\)s(::[^:%]*?(?:\[\])+)?|%%"
+)
+# key within connection info where names of prepared statements are kept
+PREPARED_STATEMENTS_KEY = "prepared_statements"
+# key within connection info where start times of running queries are kept
+QUERY_STARTS_KEY = "query_starts"
+
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for connection checkout from DB pool, including "
+    "opening new connection when pool is not full.",
+)
+POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Number of connections DB pool keeps open.",
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Number of connections checked out from DB pool.",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Number of connections opened over DB pool size, which is negative "
+    "while pool is not full yet, as reported by QueuePool.",
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Time spent executing single DB query on behalf of request, by route "
+    "template of the request.",
+    labelnames=("route",),
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that measures how long each connection checkout waits."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """Async variant of TimedQueuePool, used by async engine."""
+
 
 def make_connection_string(config: Config) -> str:
     """
     :param config: Configuration object
     :return:
         Connection string suitable for usage in sqlalchemy based on values
-        from provided configuration.
+        from provided configuration. Async driver is used if `database.async`
+        is enabled.
     """
-    params = {"driver": "postgresql+psycopg2"}
+    is_async = config.get("database.async", False)
+    params = {"driver": ASYNC_DRIVER if is_async else SYNC_DRIVER}
     params.update(config.get("database"))
     if params.get("ssl", False):
-        params["ssl"] = "?sslmode=require"
+        params["ssl"] = "?ssl=require" if is_async else "?sslmode=require"
     else:
         params["ssl"] = ""
     conn_str_template = (
@@ -29,15 +105,349 @@ def make_connection_string(config: Config) -> str:
     return conn_str_template.format(**params)
 
 
-def do_commit(session: Session) -> None:
+def make_pool_options(config: Config) -> dict:
+    """
+    :param config: Configuration object
+    :return:
+        Pool related engine options based on values from `database` section
+        of provided configuration.
+    """
+    return {
+        "pool_size": config.get("database.pool_size", 5),
+        "max_overflow": config.get("database.max_overflow", 10),
+        "pool_timeout": config.get("database.pool_timeout", 30),
+        "pool_recycle": config.get("database.pool_recycle", 300),
+        "pool_pre_ping": config.get("database.pool_pre_ping", False),
+        "pool_use_lifo": config.get("database.pool_use_lifo", False),
+    }
+
+
+async def prewarm_pool(engine: Union[Engine, AsyncEngine], size: int) -> None:
+    """
+    Opens `size` connections at once and returns them to the pool, so the
+    first requests don't pay for connection setup.
+    """
+    if size <= 0:
+        return
+    if isinstance(engine, AsyncEngine):
+        connections = [await engine.connect() for _ in range(size)]
+        for connection in connections:
+            await connection.close()
+    else:
+        def connect() -> None:
+            connections = [engine.connect() for _ in range(size)]
+            for connection in connections:
+                connection.close()
+        await run_in_threadpool(connect)
+    logger.info(f"Pre-warmed DB pool with {size} connections.")
+
+
+def dispose_after_fork(engine: Union[Engine, AsyncEngine]) -> None:
+    """
+    Makes processes forked from current one, e.g. by process manager with
+    preloaded app, drop pooled connections inherited from the parent without
+    closing them, so every process opens and owns its own connections.
+    """
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def track_queries(engine: Union[Engine, AsyncEngine]) -> None:
+    """
+    Makes `engine` record number of queries and time spent executing them
+    into context of the request on whose behalf they are executed, and
+    observe time of each query by route of the request. Queries executed
+    outside of requests are not recorded.
+    """
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(connection, *_) -> None:
+        connection.info.setdefault(QUERY_STARTS_KEY, []).append(
+            time.perf_counter()
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(connection, *_) -> None:
+        elapsed = time.perf_counter() - connection.info[QUERY_STARTS_KEY].pop()
+        request = current_request()
+        if request is not None:
+            request.observe_query(elapsed)
+            DB_QUERY_SECONDS.observe(
+                elapsed, route=request.route or UNMATCHED_ROUTE
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def fail_query(context) -> None:
+        # failed query is not ended, so its start is dropped here
+        if context.connection is not None:
+            starts = context.connection.info.get(QUERY_STARTS_KEY)
+            if starts:
+                starts.pop()
+
+
+def register_pool_metrics(engine: Union[Engine, AsyncEngine]) -> None:
+    """
+    Makes pool gauges report pool of provided `engine` whenever metrics
+    are collected. Pool is looked up each time, since it is replaced when
+    engine is disposed.
+    """
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+
+    def collect() -> None:
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            POOL_SIZE.set(pool.size())
+            POOL_CHECKED_OUT.set(pool.checkedout())
+            POOL_OVERFLOW.set(pool.overflow())
+
+    REGISTRY.add_collector("db_pool", collect)
+
+
+def prepare_statements(engine: Engine, max_size: int = 100) -> None:
+    """
+    Makes `engine`, which has to use psycopg2 driver, run SELECT statements
+    as server side prepared statements. Each statement is prepared on its
+    first execution within a connection and executed by name afterwards, so
+    Postgres parses and plans it once per connection instead of on every
+    call. At most `max_size` statements are kept per connection, and least
+    recently used ones are deallocated. Names of prepared statements are
+    kept in connection info, which pool clears whenever it replaces the
+    connection, e.g. after `pool_recycle` or invalidation, so statements
+    are prepared again on the new connection. Statements executed through
+    named cursors, used by `stream`, are not prepared.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def execute_prepared(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        # named cursors, used for streaming, can only be declared for plain
+        # SELECT, so they are left as they are
+        if (
+            executemany
+            or cursor.name is not None
+            or not isinstance(parameters, dict)
+            or statement.lstrip()[:6].upper() != "SELECT"
+        ):
+            return statement, parameters
+
+        # statement: (name of prepared statement, statement executing it)
+        prepared = connection.info.setdefault(
+            PREPARED_STATEMENTS_KEY, OrderedDict()
+        )
+        entry = prepared.get(statement)
+        if entry is None:
+            entry = prepared[statement] = _prepare(cursor, statement)
+            if len(prepared) > max_size:
+                _, (evicted, _) = prepared.popitem(last=False)
+                cursor.execute(f"DEALLOCATE {evicted}")
+        else:
+            prepared.move_to_end(statement)
+        return entry[1], parameters
+
+
+def _prepare(cursor: Any, statement: str) -> tuple[str, str]:
+    """
+    Prepares provided psycopg2 statement using provided cursor, and returns
+    name of prepared statement along with the statement which executes it
+    with the same parameters as the original one. Casts of parameters are
+    kept on the arguments as well, since array literals, which psycopg2
+    renders lists as, are not assigned to parameters of other array types
+    without them.
+    """
+    name = "app_" + hashlib.md5(statement.encode()).hexdigest()
+    placeholders = []
+
+    def to_positional(match: re.Match) -> str:
+        if match.group(1) is None:
+            # statement is prepared without parameters, so percent signs
+            # are not escaped in it
+            return "%"
+        placeholder = match.group(0)
+        if placeholder not in placeholders:
+            placeholders.append(placeholder)
+        cast = match.group(2) or ""
+        return f"${placeholders.index(placeholder) + 1}{cast}"
+
+    cursor.execute(
+        f"PREPARE {name} AS "
+        + PYFORMAT_PLACEHOLDER.sub(to_positional, statement)
+    )
+    if placeholders:
+        return name, f"EXECUTE {name} ({', '.join(placeholders)})"
+    return name, f"EXECUTE {name}"
+
+
+class StatementCache:
+    """
+    Cache of statements built once per shape, like combination of includes
+    and filters, and reused for all requests of that shape. Values which
+    differ between requests should be left to bound parameters, provided on
+    execution. Reusing the same statement object skips its construction and
+    the generation of its cache key, which is memoized on the statement, and
+    SQLAlchemy then finds already compiled SQL of it in the compiled cache.
+    Shapes are chosen by clients, so at most `max_size` statements are kept,
+    and least recently used ones are evicted.
+    """
+    # maximum number of statements kept by caches created without their own,
+    # see `configure`
+    max_size = 500
+
+    def __init__(self, name: str, max_size: Optional[int] = None) -> None:
+        self.name = name
+        if max_size is not None:
+            self.max_size = max_size
+        self._statements: OrderedDict[Hashable, Executable] = OrderedDict()
+        # counters are not locked, so they may be slightly off under threads
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def configure(cls, max_size: int) -> None:
+        """
+        Sets maximum number of statements kept by caches created without
+        their own, including those created already.
+        """
+        cls.max_size = max_size
+
+    def get(
+        self, key: Hashable, build: Callable[[], Executable]
+    ) -> Executable:
+        """
+        Returns statement cached under `key`, or builds and caches it using
+        `build` if there is no such.
+        """
+        statement = self._statements.get(key)
+        if statement is None:
+            self.misses += 1
+            statement = self._statements[key] = build()
+            if len(self._statements) > self.max_size:
+                self._statements.popitem(last=False)
+            outcome = "miss"
+        else:
+            self.hits += 1
+            self._statements.move_to_end(key)
+            outcome = "hit"
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Statement cache {self.name} {outcome} for {key}, "
+                f"hit rate {self.hit_rate:.1%} of {self.hits + self.misses}"
+            )
+        return statement
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def version_of(entity: Any, criterion: ColumnElement) -> ColumnElement:
+    """
+    Builds scalar subquery producing fingerprint of all `entity` rows
+    matching `criterion`, which changes whenever any of those rows is
+    created, modified or deleted. Criterion is usually correlated to the
+    entity of enclosing query, so version of its relations is fetched
+    without loading them.
+    """
+    # separators are rendered inline, since server can not infer type of
+    # parameters passed to variadic functions like `concat`
+    modified_at = func.coalesce(entity.modified_at, entity.created_at)
+    row_version = func.concat(entity.id, literal_column("'@'"), modified_at)
+    return select(
+        func.md5(func.string_agg(
+            row_version, aggregate_order_by(literal_column("','"), entity.id)
+        ))
+    ).where(criterion).scalar_subquery()
+
+
+async def maybe_await(value: Any) -> Any:
+    """
+    Awaits provided value if it is awaitable, which is the case for results of
+    AsyncSession methods, and returns it as is otherwise.
+    """
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+async def execute(
+    db: DBSession,
+    statement: Executable,
+    consume: Callable[[Result], T],
+    params: Optional[dict[str, Any]] = None
+) -> T:
+    """
+    Executes statement with provided bound `params` using either sync or async
+    session and returns the value produced by `consume` from statement result.
+    For sync session both execution and consumption, which can issue eager
+    load queries, are done in threadpool so event loop is never blocked.
+    """
+    if isinstance(db, AsyncSession):
+        return consume(await db.execute(statement, params))
+    return await run_in_threadpool(
+        lambda: consume(db.execute(statement, params))
+    )
+
+
+async def stream(
+    db: DBSession,
+    statement: Executable,
+    chunk_size: int,
+    scalars: bool = True,
+    params: Optional[dict[str, Any]] = None
+) -> AsyncIterator[list]:
+    """
+    Executes statement with provided bound `params` using server side cursor
+    and yields resulting entities, or whole rows if `scalars` is false, in
+    lists of `chunk_size` length, using either sync or async session.
+    """
+    # provided on execution, so the statement itself is not copied
+    options = {"yield_per": chunk_size}
+    if isinstance(db, AsyncSession):
+        result = await db.stream(statement, params, execution_options=options)
+        if scalars:
+            result = result.scalars()
+        async for partition in result.partitions():
+            yield partition
+    else:
+        result = await run_in_threadpool(
+            db.execute, statement, params, execution_options=options
+        )
+        if scalars:
+            result = result.scalars()
+        partitions = result.partitions()
+        while partition := await run_in_threadpool(next, partitions, None):
+            yield partition
+
+
+async def run_session_method(session: DBSession, name: str) -> Any:
+    """
+    Calls method of provided session with given `name`, like commit or close.
+    Method of async session is awaited, while method of sync session, which
+    does blocking I/O, is called in threadpool so event loop is not blocked.
+    """
+    method = getattr(session, name)
+    if isinstance(session, AsyncSession):
+        return await method()
+    return await run_in_threadpool(method)
+
+
+async def do_commit(session: DBSession) -> None:
     """
     Commits provided session and handles exceptions. Always closes session.
     """
     try:
-        session.commit()
+        await run_session_method(session, "commit")
     except IntegrityError:
         logger.warning("Database integrity error on commit", exc_info=True)
-        session.rollback()
+        await run_session_method(session, "rollback")
         raise HTTPException(
             status_code=422,
             detail=(
@@ -48,7 +458,7 @@ def do_commit(session: Session) -> None:
         pass
     except Exception:
         logger.warning("Unable to commit DB transaction", exc_info=True)
-        session.rollback()
+        await run_session_method(session, "rollback")
         raise
     finally:
-        session.close()
+        await run_session_method(session, "close")
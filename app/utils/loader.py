@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Hashable, Iterable
+from typing import Any, TypeVar
+
+from app.utils.db import DBSession
+
+logger = logging.getLogger(__name__)
+
+L = TypeVar("L", bound="Loader")
+
+
+class Loader(ABC):
+    """
+    Loader of single type of entities by their keys, in the manner of
+    DataLoader. All keys requested within the same iteration of event loop
+    are coalesced into single `fetch`, and loaded values are memoized, so
+    each value is fetched at most once per request.
+    """
+
+    def __init__(self, registry: "LoaderRegistry") -> None:
+        self.registry = registry
+        self._futures: dict[Hashable, asyncio.Future] = {}
+        self._pending: list[Hashable] = []
+        # running dispatches, referenced so they are not garbage collected
+        self._dispatches: set[asyncio.Task] = set()
+
+    def load(self, key: Hashable) -> asyncio.Future:
+        """
+        Returns future of value with provided `key`, which is None if there is
+        no such. Value is fetched along with all other keys requested before
+        control returns to event loop, unless it was already requested.
+        """
+        future = self._futures.get(key)
+        # future is cancelled along with the request which awaited it
+        if future is None or future.cancelled():
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._pending.append(key)
+            if len(self._pending) == 1:
+                loop.call_soon(self._schedule_dispatch)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list[Any]:
+        """Loads values with provided `keys`, in the same order."""
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def clear(self) -> None:
+        """
+        Forgets memoized values, so they are fetched again when requested.
+        Values which are still being fetched are kept.
+        """
+        self._futures = {
+            key: future
+            for key, future in self._futures.items()
+            if not future.done()
+        }
+
+    @abstractmethod
+    async def fetch(
+        self, db: DBSession, keys: list[Hashable]
+    ) -> dict[Hashable, Any]:
+        """
+        Fetches values with provided `keys` in single query and returns them
+        by their keys. Keys without value can be left out.
+        """
+
+    def _schedule_dispatch(self) -> None:
+        task = asyncio.ensure_future(self._dispatch())
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self) -> None:
+        keys, self._pending = self._pending, []
+        try:
+            # session can not be used concurrently, so loaders dispatched
+            # in the same iteration wait for each other
+            async with self.registry.lock:
+                values = await self.fetch(self.registry.db, keys)
+        except Exception as e:
+            # failures are not memoized, so keys can be requested again
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+        logger.debug(f"{type(self).__name__} fetched {len(keys)} keys")
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(values.get(key))
+
+
+class LoaderRegistry:
+    """
+    Request scoped registry of loaders, holding single instance of each
+    loader type, so all lookups of the same type within a request are
+    coalesced and memoized by the same loader.
+    """
+
+    def __init__(self, db: DBSession) -> None:
+        """
+        :param db: DB session of the request, used by all loaders
+        """
+        self.db = db
+        self.lock = asyncio.Lock()
+        self._loaders: dict[type[Loader], Loader] = {}
+
+    def get(self, loader: type[L]) -> L:
+        """Returns instance of provided loader type bound to this registry."""
+        instance = self._loaders.get(loader)
+        if instance is None:
+            instance = self._loaders[loader] = loader(registry=self)
+        return instance
+
+    def clear(self) -> None:
+        """
+        Forgets values memoized by all loaders, to bound memory of requests
+        which load values in batches, like streamed ones.
+        """
+        for instance in self._loaders.values():
+            instance.clear()
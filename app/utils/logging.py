@@ -1,14 +1,26 @@
+import os
+import time
+import queue
+import atexit
 import logging
 import logging.config
-import time
 from sys import platform
 from typing import Optional
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
+from app.utils.context import current_request
 
 logger = logging.getLogger(__name__)
 
 PRODUCTION_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
+    # handlers of configured loggers are called from single listener thread,
+    # so logging threads only put records on a queue
+    "queue": True,
     "syslog": {
         "connection_type": "port",
         "host": None,
@@ -35,6 +47,11 @@ PRODUCTION_CONFIG = {
         "syslog_audit": {
             "format": "{}-audit:   %(message)s",
             "datefmt": "%Y.%m.%d %H:%M:%S"
+        },
+        # audit messages are JSON already, so audit handler keeps its format
+        "json": {
+            "()": "app.utils.logging.JSONFormatter",
+            "prefix": "{}: "
         }
     },
     "handlers": {
@@ -103,6 +120,9 @@ DEBUG_CONFIG = {
         "syslog_audit": {
             "format": "{}-audit:   %(message)s",
             "datefmt": "%Y.%m.%d %H:%M:%S"
+        },
+        "json": {
+            "()": "app.utils.logging.JSONFormatter"
         }
     },
     "handlers": {
@@ -129,11 +149,16 @@ class LoggerConnectionType:
 
 def _merge_log_configs(config, new):
     # Merge top level keys
+    if "queue" in new:
+        config["queue"] = new["queue"]
     if "syslog" in new:
         if "syslog" not in config:
             config["syslog"] = {}
         for item, data in new["syslog"].items():
             config["syslog"][item] = data
+    # Merge handler options, e.g. their formatter
+    for handler, data in new.get("handlers", {}).items():
+        config["handlers"].setdefault(handler, {}).update(data)
     return config
 
 
@@ -153,7 +178,8 @@ def configure_develop_logging(application: str) -> None:
 def configure_production_logging(application: str, config: dict) -> None:
     """
     Configure application logging for production. This includes setting up
-    all logging to go to syslog.
+    all logging to go to syslog, through a queue and a listener thread
+    unless `queue` is disabled.
     :param application: name of the application
     :param config: additional configuration for logging
         It must include following configuration:
@@ -163,8 +189,11 @@ def configure_production_logging(application: str, config: dict) -> None:
                         "connection_type": "socket|port",
                         "host": "host for syslog address e.g. 127.0.0.1",
                         "port": "port for syslog address e.g. 514"
-                    }
+                    },
+            "queue": true|false  # optional, true by default
          ```
+        Options of handlers, e.g. `"handlers": {"syslog": {"formatter":
+        "json"}}`, can be overridden as well.
     """
     _configure_logging(
         application,
@@ -197,6 +226,10 @@ def _configure_logging(
         logging configuration file and logging directory are.
     """
 
+    # Records queued for previous handlers are handled before they are
+    # closed by reconfiguration
+    _stop_listener()
+
     # Load default configuration and populate application fields
 
     template = config["formatters"]["syslog"]["format"]
@@ -205,6 +238,9 @@ def _configure_logging(
     template = config["formatters"]["syslog_audit"]["format"]
     config["formatters"]["syslog_audit"]["format"] = template.format(
         application.lower())
+    template = config["formatters"]["json"].get("prefix", "")
+    config["formatters"]["json"]["prefix"] = template.format(
+        application.lower())
 
     # Merge override if exists
     if override is not None:
@@ -227,9 +263,166 @@ def _configure_logging(
         config["handlers"]["syslog_audit"]["address"] = syslog_address
 
     logging.Formatter.converter = time.gmtime
+    _install_record_factory()
     # Configure logging
     logging.config.dictConfig(config)
+    if config.get("queue", False):
+        _start_listener(
+            loggers=[logging.getLogger()] + [
+                logging.getLogger(name) for name in config.get("loggers", {})
+            ]
+        )
     logger.info(
         "Configuring logging for "
         f"{'production' if production else 'development'} completed."
     )
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatter rendering each record as single line JSON object, encoded by
+    orjson, so log pipeline does not have to parse text lines. Records
+    logged while handling request carry its `RequestContext`, from which
+    request ID, route, latency and DB stats are rendered only here, once
+    record is actually emitted.
+    """
+
+    def __init__(self, prefix: str = "") -> None:
+        """
+        :param prefix: text preceding JSON object, e.g. syslog tag
+        """
+        super().__init__()
+        self.prefix = prefix
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        request = getattr(record, "request_context", None)
+        if request is not None:
+            data["request_id"] = request.request_id
+            data["method"] = request.method
+            data["route"] = request.route
+            data["latency_ms"] = round(
+                (record.created - request.started) * 1e3, 3
+            )
+            data["db_queries"] = record.db_queries
+            data["db_ms"] = round(record.db_seconds * 1e3, 3)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return self.prefix + orjson.dumps(data).decode()
+
+
+def _install_record_factory() -> None:
+    """
+    Makes records logged while handling request carry its context. Counters
+    of the context keep changing, so only they are captured right away,
+    while everything else is left to formatters.
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "request_context", False):
+        return
+
+    def create(*args, **kwargs) -> logging.LogRecord:
+        record = factory(*args, **kwargs)
+        request = current_request()
+        if request is not None:
+            record.request_context = request
+            record.db_queries = request.db_queries
+            record.db_seconds = request.db_seconds
+        return record
+
+    create.request_context = True
+    logging.setLogRecordFactory(create)
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Handler which puts records on the queue of `QueuedListener`, along with
+    handlers they are meant for, so handlers of all loggers share single
+    listener thread. Records are formatted by those handlers in listener
+    thread, so logging thread only merges message with its arguments.
+    """
+
+    def __init__(
+        self, queue_: queue.SimpleQueue, handlers: list[logging.Handler]
+    ) -> None:
+        super().__init__(queue_)
+        self.handlers = handlers
+        # records none of the handlers would emit are not queued at all
+        self.setLevel(min(
+            (handler.level for handler in handlers), default=logging.NOTSET
+        ))
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # arguments may be changed by the time record is handled, record is
+        # not copied, since it replaces all handlers of its logger
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put_nowait((self.handlers, record))
+
+
+class QueuedListener(QueueListener):
+    """Listener handling records of `QueuedHandler` by their handlers."""
+
+    def handle(
+        self, item: tuple[list[logging.Handler], logging.LogRecord]
+    ) -> None:
+        handlers, record = item
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+_listener: Optional[QueuedListener] = None
+
+
+def _start_listener(loggers: list[logging.Logger]) -> None:
+    """
+    Replaces handlers of provided loggers with `QueuedHandler` putting
+    records on single queue, and starts the listener thread handling them.
+    """
+    global _listener
+    queue_ = queue.SimpleQueue()
+    for logger_ in loggers:
+        if not logger_.handlers:
+            continue
+        handlers = logger_.handlers[:]
+        for handler in handlers:
+            logger_.removeHandler(handler)
+        logger_.addHandler(QueuedHandler(queue_, handlers))
+    _listener = QueuedListener(queue_)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    """Stops the listener thread once all queued records are handled."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener() -> None:
+    # forked process has only the thread which forked it, so records would
+    # stay in its copy of the queue
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+# registered after `logging.shutdown`, so it runs first and queued records
+# are handled before handlers are flushed and closed
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_listener)
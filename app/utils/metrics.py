@@ -0,0 +1,419 @@
+import os
+import math
+import glob
+import bisect
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+from collections.abc import Callable, Iterable, Iterator
+
+import orjson
+
+from app.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# media type of text exposition format understood by Prometheus
+EXPOSITION_MEDIA_TYPE = "text/plain; version=0.0.4"
+# environment variable through which worker processes get directory where
+# they share their metrics, set by parent process which starts them
+METRICS_DIR_ENV = "APP_METRICS_DIR"
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)
+
+
+class Registry:
+    """
+    Holds all metrics created within the process, so they can be collected
+    from single place.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, "Metric"] = {}
+        self._collectors: dict[str, Callable[[], None]] = {}
+
+    def register(self, metric: "Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, name: str, collector: Callable[[], None]) -> None:
+        """
+        Adds callback which updates gauges from state they report, right
+        before metrics are collected. Callback added under the same name
+        replaces previous one.
+        """
+        self._collectors[name] = collector
+
+    def collect(self) -> dict[str, dict]:
+        """
+        Returns snapshot of all metrics as plain data, which can be merged
+        with snapshots of other processes by `merge` and rendered in text
+        exposition format by `render`.
+        """
+        for name, collector in list(self._collectors.items()):
+            try:
+                collector()
+            except Exception:
+                logger.exception(f"Metrics collector {name} failed")
+        return {
+            metric.name: {
+                "type": metric.type,
+                "documentation": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [
+                    [list(key), value] for key, value in metric.samples()
+                ],
+            }
+            for metric in self
+        }
+
+    def __iter__(self) -> Iterator["Metric"]:
+        return iter(list(self._metrics.values()))
+
+
+REGISTRY = Registry()
+
+
+class Metric(ABC):
+    """
+    Base class for all metrics. Each metric holds its values per combination
+    of label values, which are provided as keyword arguments. Metrics are
+    updated from event loop as well as from background threads, like audit
+    writer, so values are updated and copied under lock of the metric.
+    """
+    type: str
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Registry = REGISTRY
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> list[tuple[tuple, Any]]:
+        """Returns copy of values of the metric by label values."""
+
+
+class Histogram(Metric):
+    """
+    Metric that counts observed values into cumulative buckets, keeping total
+    sum and count of observations as well.
+    """
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry = REGISTRY
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = buckets
+        # per labels: count per bucket (last one is +Inf), sum of values
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [
+                    [0] * (len(self.buckets) + 1), 0.0
+                ]
+            values[0][bucket] += 1
+            values[1] += value
+
+    def values(self) -> Iterator[tuple[tuple, list[int], float]]:
+        """
+        Yields label values, cumulative bucket counts and sum of observations
+        for each labels combination observed so far.
+        """
+        for key, (counts, total) in self.samples():
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            yield key, cumulative, total
+
+    def samples(self) -> list[tuple[tuple, list]]:
+        with self._lock:
+            return [
+                (key, [counts[:], total])
+                for key, (counts, total) in self._values.items()
+            ]
+
+
+class Counter(Metric):
+    """Metric that only grows, counting occurrences of something."""
+    type = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Registry = REGISTRY
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Iterator[tuple[tuple, float]]:
+        """Yields label values and count for each labels combination."""
+        yield from self.samples()
+
+    def samples(self) -> list[tuple[tuple, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(Metric):
+    """
+    Metric that goes up and down, reporting current state of something,
+    either tracked as it changes or set by collector right before metrics
+    are collected.
+    """
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Registry = REGISTRY
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> list[tuple[tuple, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+def merge(snapshots: Iterable[dict[str, dict]]) -> dict[str, dict]:
+    """
+    Merges snapshots of metrics, e.g. of several processes, into one, in
+    which values with the same labels are summed up.
+    """
+    merged: dict[str, dict] = {}
+    values: dict[str, dict[tuple, Any]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if name not in merged:
+                merged[name] = dict(metric, samples=[])
+                values[name] = {}
+            metric_values = values[name]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = metric_values.get(key)
+                if current is None:
+                    metric_values[key] = (
+                        [value[0][:], value[1]]
+                        if metric["type"] == "histogram" else value
+                    )
+                elif metric["type"] == "histogram":
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                else:
+                    metric_values[key] = current + value
+    for name, metric in merged.items():
+        metric["samples"] = [
+            [list(key), value] for key, value in values[name].items()
+        ]
+    return merged
+
+
+def render(snapshot: dict[str, dict]) -> str:
+    """Renders snapshot of metrics in Prometheus text exposition format."""
+    lines = []
+    for name, metric in snapshot.items():
+        lines.append(f"# HELP {name} {_escape(metric['documentation'])}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labels, value in metric["samples"]:
+            pairs = list(zip(labelnames, labels))
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                continue
+            counts, total = value
+            running = 0
+            bounds = [*metric["buckets"], math.inf]
+            for bound, count in zip(bounds, counts):
+                running += count
+                le = pairs + [("le", _number(bound))]
+                lines.append(f"{name}_bucket{_labels(le)} {running}")
+            lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(pairs)} {running}")
+    return "\n".join(lines) + "\n"
+
+
+def _labels(pairs: list[tuple[str, Any]]) -> str:
+    if not pairs:
+        return ""
+    rendered = ",".join(
+        f'{name}="{_escape(value, quote=True)}"' for name, value in pairs
+    )
+    return f"{{{rendered}}}"
+
+
+def _escape(value: Any, quote: bool = False) -> str:
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quote else value
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+class MultiProcessMetrics:
+    """
+    Shares metrics between worker processes through directory, in which
+    each worker keeps snapshot of its metrics in file named by its PID.
+    Snapshot is written every `interval` seconds by background thread, and
+    whenever metrics are collected. Metrics of all workers are collected by
+    merging their snapshots, so metrics of other workers can be up to
+    `interval` seconds old. Snapshots of workers which exited are kept, so
+    counters and histograms do not go down, but their gauges are left out.
+    Within each worker, metrics are updated and copied into snapshot under
+    their own locks, so snapshot written by background thread is consistent
+    with updates made by event loop.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        interval: float = 5.0,
+        registry: Registry = REGISTRY
+    ) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.registry = registry
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional["MultiProcessMetrics"]:
+        """
+        Creates shared metrics in directory provided by parent process in
+        `APP_METRICS_DIR` environment variable, or returns None if it is not
+        provided, as in single process mode.
+        """
+        directory = os.environ.get(METRICS_DIR_ENV)
+        if not directory:
+            return None
+        return cls(
+            directory=directory,
+            interval=config.get("metrics.flush_interval", 5.0),
+        )
+
+    @staticmethod
+    def prepare(directory: str) -> None:
+        """
+        Creates directory for worker processes which are about to be started,
+        removing snapshots of previous run from it.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
+
+    def start(self) -> None:
+        """Starts the thread which writes snapshot of this process."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="metrics-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the thread, writing final snapshot of this process."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def write(self) -> None:
+        """Writes current snapshot of metrics of this process."""
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        # snapshot is replaced at once, so it is never read half written
+        with open(f"{path}.tmp", "wb") as snapshot:
+            snapshot.write(orjson.dumps(self.registry.collect()))
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self) -> dict[str, dict]:
+        """Returns snapshot of metrics of all workers merged together."""
+        self.write()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path, "rb") as snapshot:
+                    metrics = orjson.loads(snapshot.read())
+            except (OSError, orjson.JSONDecodeError):
+                logger.warning(f"Skipping unreadable metrics snapshot {path}")
+                continue
+            pid = int(os.path.basename(path).split(".")[0])
+            if not _is_running(pid):
+                metrics = {
+                    name: metric for name, metric in metrics.items()
+                    if metric["type"] != "gauge"
+                }
+            snapshots.append(metrics)
+        return merge(snapshots)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write()
+            except Exception:
+                logger.exception("Writing metrics snapshot failed")
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -1,73 +1,258 @@
+import time
 import inject
 import logging
 from typing import Optional
+from collections.abc import Iterable
 
-from fastapi import FastAPI
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app.utils.audit import AuditRecordCreator
-from app.utils.db import do_commit
+from app.utils.audit import AuditRecordCreator, AuditWriter
+from app.utils.context import (
+    REQUEST_CONTEXT, UNMATCHED_ROUTE, RequestContext, current_request
+)
+from app.utils.db import do_commit, maybe_await, run_session_method
+from app.utils.loader import LoaderRegistry
+from app.utils.metrics import Gauge, Histogram
 from app.event import Event
 
 logger = logging.getLogger(__name__)
 
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from start of request until it is finished, by route template, "
+    "method and response status.",
+    labelnames=("route", "method", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Number of requests being handled.",
+)
+REQUEST_PHASE_SECONDS = Histogram(
+    "http_request_phase_seconds",
+    "Time spent in each phase of request, like its middlewares, handler, "
+    "DB queries and serialization, by route template.",
+    labelnames=("route", "phase"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of DB queries executed by request, by route template.",
+    labelnames=("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
 
-class DBMiddleware(BaseHTTPMiddleware):
+
+class RequestContextMiddleware:
+    """
+    Middleware that makes `RequestContext` of each request current while it
+    is handled, so logging and DB instrumentation can attribute their work
+    to it. ID of the request is returned in `X-Request-ID` header. Once
+    request is finished, its latency and timings are observed by route
+    template, and timings can be returned in `Server-Timing` header as
+    well, as they are when response is started.
+    """
+    def __init__(self, app: ASGIApp, server_timing: bool = False) -> None:
+        """
+        :param app: ASGI app that is wrapped
+        :param server_timing: return timings in `Server-Timing` header
+        """
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = RequestContext.from_scope(scope)
+        request_id = context.request_id.encode("latin-1")
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = message.setdefault("headers", [])
+                headers.append((b"x-request-id", request_id))
+                if self.server_timing:
+                    headers.append(
+                        (b"server-timing", context.server_timing().encode())
+                    )
+            await send(message)
+
+        token = REQUEST_CONTEXT.set(context)
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_CONTEXT.reset(token)
+            observe_request(context, status_code)
+
+
+def observe_request(context: RequestContext, status_code: int) -> None:
+    """
+    Observes latency and timings of finished request into per route
+    histograms.
+    """
+    context.switch(None)
+    route = context.route or UNMATCHED_ROUTE
+    REQUEST_SECONDS.observe(
+        time.time() - context.started,
+        route=route,
+        method=context.method,
+        status=status_code
+    )
+    for phase, seconds in context.timings.items():
+        REQUEST_PHASE_SECONDS.observe(seconds, route=route, phase=phase)
+    REQUEST_PHASE_SECONDS.observe(context.db_seconds, route=route, phase="db")
+    REQUEST_DB_QUERIES.observe(context.db_queries, route=route)
+
+
+class TimedMiddleware:
+    """
+    Middleware that times wrapped app, or provided middleware created around
+    it, as exclusive phase of request. Time spent in middlewares and app it
+    calls into, including through `send`, is not added to the phase, so each
+    middleware is timed by itself, and app innermost of them by itself.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        phase: str,
+        middleware: Optional[type] = None,
+        **options
+    ) -> None:
+        """
+        :param app: ASGI app that is wrapped
+        :param phase: name of the phase
+        :param middleware: middleware class that is timed, created around
+            `app` with provided `options`
+        """
+        self.app = app if middleware is None else middleware(app, **options)
+        self.phase = phase
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        context = current_request()
+        if context is None:
+            await self.app(scope, receive, send)
+            return
+
+        outer = context.switch(self.phase)
+
+        async def send_wrapper(message: Message) -> None:
+            inner = context.switch(outer)
+            try:
+                await send(message)
+            finally:
+                context.switch(inner)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            context.switch(outer)
+
+
+class DBMiddleware:
+    """
+    Middleware that provides new DB session for each request through request
+    state, along with registry of loaders using that session. Session is
+    committed right before response is started, so failed commit can still be
+    turned into error response, and closed only after response body is
+    completely sent, so streamed responses can keep using it.
+    """
     def __init__(
         self,
-        app: FastAPI,
-        only_success_commit: Optional[bool] = False
+        app: ASGIApp,
+        only_success_commit: Optional[bool] = False,
+        excluded_paths: Iterable[str] = ()
     ) -> None:
-        """"""
+        """
+        :param app: ASGI app that is wrapped
+        :param only_success_commit: commit session only for 2xx responses
+        :param excluded_paths: paths of requests which get no session, since
+            their handlers do not use DB
+        """
+        self.app = app
         self.only_success_commit = only_success_commit
-        super().__init__(app=app)
+        self.excluded_paths = frozenset(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request, call_next):
-        """Process request and response"""
+        request = Request(scope)
         try:
-            request.state.db = inject.instance("db")
+            db = request.state.db = inject.instance("db")
         except inject.InjectorException:
             logger.error("Using DBMiddleware without injected db constant.")
             raise Exception(
                 "No 'db' in inject. It should provide creator for sessions."
             )
+        request.state.loaders = LoaderRegistry(db=db)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_ok = 200 <= message["status"] <= 299
+                if (not self.only_success_commit) or response_ok:
+                    await do_commit(session=db)
+                else:
+                    await run_session_method(db, "close")
+            await send(message)
 
         # Perform request
-        response = await call_next(request)
-        response_ok = 200 <= response.status_code <= 299
-        if (not self.only_success_commit) or response_ok:
-            do_commit(session=request.state.db)
-        else:
-            request.state.db.close()
-        registry = inject.instance("db_registry")
-        registry.remove()
-        return response
-
-
-class AuditMiddleware(BaseHTTPMiddleware):
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await run_session_method(db, "close")
+            registry = inject.instance("db_registry")
+            await maybe_await(registry.remove())
+
+
+class AuditMiddleware:
     """
     Middleware that creates new audit record for each starlette request and
-    attaches it to thread local. When request is finished it formats audit
-    record and writes it to audit log file.
+    attaches it to request state. When request is finished it formats audit
+    record and hands it over to `AuditWriter`, which writes it to audit log
+    in background.
     """
-    def __init__(self, app: FastAPI, application: str) -> None:
+    def __init__(
+        self,
+        app: ASGIApp,
+        application: str,
+        excluded_paths: Iterable[str] = ()
+    ) -> None:
         """
-        :param app: App object
+        :param app: ASGI app that is wrapped
         :param application: application name
+        :param excluded_paths: paths of requests which are not audited
         """
+        self.app = app
         self.application = application
-        super().__init__(app=app)
+        self.excluded_paths = frozenset(excluded_paths)
+        self.writer = inject.instance(AuditWriter)
 
-    async def dispatch(self, request, call_next):
-        """Process request and response"""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
 
         # Process request
+        request = Request(scope)
         request.state.audit = AuditRecordCreator(
-            request, self.application
+            request, self.application, self.writer
         )
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
         # Perform request
-        response = await call_next(request)
+        await self.app(scope, receive, send_wrapper)
         # Process response
         # Should not be logged if audit is not set (should not happen since
         # we set in in process_request) or if event on audit record is not
@@ -79,14 +264,11 @@ class AuditMiddleware(BaseHTTPMiddleware):
             # special error event should be inserted in audit log.
             if (
                 not request.state.audit.has_record
-                and response.status_code >= 400
+                and status_code >= 400
             ):
                 request.state.audit(event=Event.from_error(
-                    response=response,
+                    status_code=status_code,
                     request=request,
                 ))
 
-            request.state.audit.log_record(
-                response_status=response.status_code
-            )
-        return response
+            await request.state.audit.log_record(response_status=status_code)
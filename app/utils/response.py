@@ -0,0 +1,79 @@
+import hashlib
+from uuid import UUID
+from typing import Any
+from collections.abc import AsyncIterable, AsyncIterator
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from app.utils.context import timed
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse which adds time of encoding its content to request, and
+    encodes values orjson does not serialize natively by `encode_default`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with timed("encode"):
+            return orjson.dumps(
+                content,
+                default=encode_default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            )
+
+
+def encode_default(value: Any) -> Any:
+    """
+    Encodes values which orjson does not serialize natively. UUIDs loaded by
+    asyncpg are of its own subclass of `UUID`, while orjson serializes only
+    exact `UUID` instances, so they are encoded as strings here.
+    """
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value)}")
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Creates strong entity tag from provided parts, which should together
+    identify single representation, like entity ID, requested includes and
+    versions of the entity and of its included relations.
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+async def encode_stream(
+    chunks: AsyncIterable[list[dict]], media_type: str
+) -> AsyncIterator[bytes]:
+    """
+    Serializes provided chunks of serialized response models into chunks of
+    bytes suitable for `StreamingResponse`. Each chunk is written at once, so
+    the amount of writes stays low while memory stays flat.
+    :param chunks: chunks of response models serialized into dicts, usually
+    lazily loaded from DB.
+    :param media_type: NDJSON media type produces one JSON object per line,
+    any other produces single JSON array.
+    """
+    ndjson = media_type == NDJSON_MEDIA_TYPE
+    first = True
+    if not ndjson:
+        yield b"["
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        with timed("encode"):
+            encoded = [
+                orjson.dumps(item, default=encode_default) for item in chunk
+            ]
+        if ndjson:
+            yield b"\n".join(encoded) + b"\n"
+        else:
+            yield (b"" if first else b",") + b",".join(encoded)
+        first = False
+    if not ndjson:
+        yield b"]"
@@ -0,0 +1,154 @@
+"""
+Benchmark of relationship loading strategies used by post query includers.
+
+Lists pages of posts with `?include=user,comments,tags` and compares previous
+`subqueryload` of every relation, `selectinload` of every relation and
+current includers, which join many-to-one user and select-in collections.
+Reports number of executed queries and latency per page. Schema is created in
+provided database and filled with generated data, so it should be a scratch
+database. It has to be Postgres, since models use its column types. Run with:
+
+    python -m benchmarks.includes <postgres url> [pages] [status]
+"""
+import sys
+import time
+import asyncio
+import logging
+from uuid import uuid4
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, subqueryload, selectinload
+from sqlalchemy.sql import Select
+
+from app.db import Base, Post, PostStatusType, User, Comment, Tag
+from app.enum import PostIncludeFilter
+from app.service.includer.query import PostQueryIncluderFactory
+
+INCLUDE = [
+    PostIncludeFilter.USER, PostIncludeFilter.COMMENTS, PostIncludeFilter.TAGS
+]
+USERS = 100
+POSTS = 5000
+COMMENTS_PER_POST = 5
+TAGS = 50
+TAGS_PER_POST = 3
+PAGE_SIZE = 50
+
+
+def loader_factory(loader) -> type[PostQueryIncluderFactory]:
+    """Creates includer factory loading every relation with `loader`."""
+
+    def includer(relationship) -> type:
+        class Includer:
+            def apply(self, query: Select) -> Select:
+                return query.options(loader(relationship))
+        return Includer
+
+    class Factory(PostQueryIncluderFactory):
+        query_includer_map = {
+            "USER": includer(Post.user),
+            "COMMENTS": includer(Post.comments),
+            "TAGS": includer(Post.tags),
+        }
+    return Factory
+
+
+def seed(session: Session) -> None:
+    """Fills empty database with users, posts, comments and tags."""
+    tags = [Tag(slug=f"tag-{i}") for i in range(TAGS)]
+    users = [
+        User(
+            id=uuid4(), first_name="first", last_name="last",
+            email=f"user{i}@example.com"
+        )
+        for i in range(USERS)
+    ]
+    session.add_all(tags + users)
+    statuses = list(PostStatusType)
+    start = datetime.utcnow() - timedelta(days=1)
+    for i in range(POSTS):
+        post = Post(
+            id=uuid4(),
+            user_id=users[i % USERS].id,
+            title=f"post {i}",
+            content="content " * 20,
+            status=statuses[i % len(statuses)],
+            created_at=start + timedelta(seconds=i),
+        )
+        post.tags.extend(
+            tags[(i + j) % TAGS] for j in range(TAGS_PER_POST)
+        )
+        session.add(post)
+        session.add_all(
+            Comment(
+                post_id=post.id,
+                user_id=users[(i + j) % USERS].id,
+                content="comment " * 10
+            )
+            for j in range(COMMENTS_PER_POST)
+        )
+    session.commit()
+
+
+async def run(
+    session: Session,
+    factory: type[PostQueryIncluderFactory],
+    pages: int,
+    status: PostStatusType
+) -> float:
+    """Lists given number of pages and returns seconds spent."""
+    elapsed = 0.0
+    for page in range(pages):
+        session.expunge_all()
+        start = time.perf_counter()
+        posts = await Post.list(
+            db=session,
+            status=status,
+            limit=PAGE_SIZE,
+            query_includer_factory=factory(include=INCLUDE)
+        )
+        elapsed += time.perf_counter() - start
+        assert len(posts) == PAGE_SIZE
+    return elapsed
+
+
+def main(args: list[str]) -> None:
+    url = args[0]
+    pages = int(args[1]) if len(args) > 1 else 100
+    status = PostStatusType[args[2].upper()] if len(args) > 2 else (
+        PostStatusType.ACTIVE
+    )
+    logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    queries = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_) -> None:
+        nonlocal queries
+        queries += 1
+
+    with Session(bind=engine) as session:
+        if session.query(Post).first() is None:
+            seed(session)
+
+        strategies = (
+            ("subqueryload", loader_factory(subqueryload)),
+            ("selectinload", loader_factory(selectinload)),
+            ("current", PostQueryIncluderFactory),
+        )
+        for name, factory in strategies:
+            # warm up, so statements are compiled and cached
+            asyncio.run(run(session, factory, 5, status))
+            queries = 0
+            elapsed = asyncio.run(run(session, factory, pages, status))
+            print(
+                f"{name:>14}: {queries / pages:4.1f} queries/page, "
+                f"{elapsed / pages * 1e3:8.2f} ms/page"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,152 @@
+"""
+Benchmark of per-request overhead of DB and audit middlewares.
+
+Compares previous `BaseHTTPMiddleware` based implementation with current pure
+ASGI one, on a trivial route and with no-op DB session, so only the cost of
+middleware layers themselves is measured. Run with:
+
+    python -m benchmarks.middleware [requests]
+"""
+import sys
+import time
+import asyncio
+import logging
+
+import inject
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.event import Event
+from app.utils.audit import AuditRecordCreator, AuditWriter
+from app.utils.middleware import DBMiddleware, AuditMiddleware
+
+PING = Event("Ping", "Trivial benchmark route")
+
+
+class NoopSession:
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class NoopRegistry:
+    def remove(self) -> None:
+        pass
+
+
+class LegacyDBMiddleware(BaseHTTPMiddleware):
+    """DBMiddleware as it was implemented on top of BaseHTTPMiddleware."""
+
+    async def dispatch(self, request, call_next):
+        request.state.db = inject.instance("db")
+        response = await call_next(request)
+        if 200 <= response.status_code <= 299:
+            request.state.db.commit()
+        request.state.db.close()
+        inject.instance("db_registry").remove()
+        return response
+
+
+class LegacyAuditMiddleware(BaseHTTPMiddleware):
+    """AuditMiddleware as it was implemented on top of BaseHTTPMiddleware."""
+
+    async def dispatch(self, request, call_next):
+        request.state.audit = AuditRecordCreator(
+            request, "app", inject.instance(AuditWriter)
+        )
+        response = await call_next(request)
+        await request.state.audit.log_record(
+            response_status=response.status_code
+        )
+        return response
+
+
+def create_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping(request: Request) -> dict:
+        request.state.audit(event=PING)
+        return {}
+
+    if legacy:
+        app.add_middleware(LegacyDBMiddleware)
+        app.add_middleware(LegacyAuditMiddleware)
+    else:
+        app.add_middleware(DBMiddleware, only_success_commit=True)
+        app.add_middleware(AuditMiddleware, application="app")
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    """Sends given number of requests to app and returns seconds spent."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 9898),
+    }
+
+    disconnected = asyncio.Event()
+
+    def request_receive():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive() -> dict:
+            if messages:
+                return messages.pop()
+            # client stays connected until response is sent
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+        return receive
+
+    async def send(_: dict) -> None:
+        pass
+
+    # warm up, so middleware stack and routes are built
+    for _ in range(100):
+        await app(dict(scope), request_receive(), send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), request_receive(), send)
+    return time.perf_counter() - start
+
+
+def main(args: list[str]) -> None:
+    requests = int(args[0]) if args else 10000
+    logging.getLogger("audit").disabled = True
+    inject.clear_and_configure(
+        lambda binder: (
+            binder.bind_to_provider("db", NoopSession),
+            binder.bind("db_registry", NoopRegistry()),
+        )
+    )
+
+    results = {}
+    for name, legacy in (("BaseHTTPMiddleware", True), ("pure ASGI", False)):
+        elapsed = asyncio.run(run(create_app(legacy=legacy), requests))
+        results[name] = elapsed
+        print(
+            f"{name:>20}: {elapsed / requests * 1e6:8.1f} us/request "
+            f"({requests / elapsed:8.0f} requests/s)"
+        )
+    saved = results["BaseHTTPMiddleware"] - results["pure ASGI"]
+    print(f"{'saved':>20}: {saved / requests * 1e6:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,114 @@
+"""
+Benchmark of server side prepared statements for hot read queries.
+
+Runs post by ID, page of posts by status and user by ID, each with all their
+includes, through engine executing statements as they are and through engine
+with `prepare_statements`, and reports p50 and p99 latency of each. Schema is
+created in provided PostgreSQL database and filled with generated data, so it
+should be a scratch database. Run with:
+
+    python -m benchmarks.prepared <database url> [iterations]
+"""
+import sys
+import time
+import random
+import asyncio
+import logging
+import statistics
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.db import Base, Post, PostStatusType, User
+from app.enum import PostIncludeFilter, UserIncludeFilter
+from app.service.includer.query import (
+    PostQueryIncluderFactory, UserQueryIncluderFactory
+)
+from app.utils.db import prepare_statements
+from benchmarks.includes import PAGE_SIZE, seed
+
+POST_INCLUDE = [
+    PostIncludeFilter.USER, PostIncludeFilter.COMMENTS, PostIncludeFilter.TAGS
+]
+USER_INCLUDE = [UserIncludeFilter.POSTS, UserIncludeFilter.COMMENTS]
+
+
+def queries(
+    session: Session, post_ids: list, user_ids: list
+) -> dict[str, Callable[[], Awaitable]]:
+    """Creates hot read queries, each reading random entity on every call."""
+    return {
+        "post by id": lambda: Post.get(
+            db=session,
+            post_id=str(random.choice(post_ids)),
+            query_includer_factory=PostQueryIncluderFactory(
+                include=POST_INCLUDE
+            )
+        ),
+        "posts by status": lambda: Post.list(
+            db=session,
+            status=random.choice(list(PostStatusType)),
+            limit=PAGE_SIZE,
+            query_includer_factory=PostQueryIncluderFactory(
+                include=POST_INCLUDE
+            )
+        ),
+        "user by id": lambda: User.get(
+            db=session,
+            user_id=str(random.choice(user_ids)),
+            query_includer_factory=UserQueryIncluderFactory(
+                include=USER_INCLUDE
+            )
+        ),
+    }
+
+
+async def run(
+    session: Session, query: Callable[[], Awaitable], iterations: int
+) -> list[float]:
+    """Runs query given number of times and returns seconds of each run."""
+    timings = []
+    for _ in range(iterations):
+        session.expunge_all()
+        start = time.perf_counter()
+        await query()
+        timings.append(time.perf_counter() - start)
+        # each query runs in its own transaction, as it does in requests
+        session.rollback()
+    return timings
+
+
+def main(args: list[str]) -> None:
+    url = args[0]
+    iterations = int(args[1]) if len(args) > 1 else 1000
+    logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+
+    plain = create_engine(url)
+    prepared = create_engine(url)
+    prepare_statements(prepared)
+    Base.metadata.create_all(plain)
+    with Session(bind=plain) as session:
+        if session.query(Post).first() is None:
+            seed(session)
+        post_ids = session.scalars(select(Post.id)).all()
+        user_ids = session.scalars(select(User.id)).all()
+
+    for engine_name, engine in (("plain", plain), ("prepared", prepared)):
+        with Session(bind=engine) as session:
+            for name, query in queries(session, post_ids, user_ids).items():
+                # warm up, so statements are compiled and prepared
+                asyncio.run(run(session, query, 50))
+                timings = sorted(
+                    asyncio.run(run(session, query, iterations))
+                )
+                p50 = statistics.median(timings)
+                p99 = timings[int(len(timings) * 0.99) - 1]
+                print(
+                    f"{engine_name:>8} {name:>16}: "
+                    f"p50 {p50 * 1e3:7.2f} ms, p99 {p99 * 1e3:7.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,90 @@
+"""
+Benchmark of time request threads spend in logging calls.
+
+Configures production logging to local UDP syslog, once with handlers called
+directly by logging threads, as they were previously, and once through queue
+handled by listener thread. Several threads log records concurrently, as
+requests in thread pool do, and per call p50 and p99 latency and total time
+spent in logging calls are reported. Records are received by local socket, so
+no syslog daemon is needed. Run with:
+
+    python -m benchmarks.queue_logging [records] [threads]
+"""
+import sys
+import time
+import socket
+import logging
+import statistics
+import threading
+
+from app.utils import logging as app_logging
+
+logger = logging.getLogger("benchmark")
+
+
+def receive(sock: socket.socket) -> None:
+    """Drains records sent to syslog, so socket buffer does not fill up."""
+    while True:
+        try:
+            sock.recv(65536)
+        except OSError:
+            return
+
+
+def run(records: int, threads: int) -> list[float]:
+    """Logs given number of records from each thread, returns call timings."""
+    timings: list[list[float]] = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def log(thread_timings: list[float]) -> None:
+        barrier.wait()
+        for i in range(records):
+            start = time.perf_counter()
+            logger.info("Handled request %d of %s", i, "benchmark")
+            thread_timings.append(time.perf_counter() - start)
+
+    workers = [
+        threading.Thread(target=log, args=(thread_timings,))
+        for thread_timings in timings
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sorted(timing for thread in timings for timing in thread)
+
+
+def main(args: list[str]) -> None:
+    records = int(args[0]) if args else 20000
+    threads = int(args[1]) if len(args) > 1 else 4
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    threading.Thread(target=receive, args=(sock,), daemon=True).start()
+    syslog = {
+        "connection_type": "port",
+        "host": "127.0.0.1",
+        "port": sock.getsockname()[1],
+    }
+
+    for name, queued in (("direct", False), ("queued", True)):
+        app_logging.configure_production_logging(
+            "app", {"syslog": syslog, "queue": queued}
+        )
+        # warm up, so sockets are connected and formats are cached
+        run(100, threads)
+        timings = run(records, threads)
+        p50 = statistics.median(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        print(
+            f"{name:>8}: p50 {p50 * 1e6:7.2f} us, p99 {p99 * 1e6:7.2f} us, "
+            f"total {sum(timings) * 1e3:8.1f} ms per "
+            f"{records * threads} records"
+        )
+    # queued records are handled before the socket is closed
+    app_logging._stop_listener()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,140 @@
+"""
+Benchmark of building and serializing list of posts response.
+
+Compares previous path, where each response model was created through
+validating constructor and FastAPI validated the result once more against
+route `response_model`, with current one, where entities are serialized into
+dicts of response model shape by serializer compiled once per include set
+and encoded by `ORJSONResponse` directly. Posts are plain objects with
+`?include=user,comments,tags` relations, so no DB is involved. Run with:
+
+    python -m benchmarks.serialization [posts] [rounds]
+"""
+import gc
+import sys
+import time
+import asyncio
+from uuid import uuid4
+from types import SimpleNamespace
+
+from fastapi.routing import serialize_response
+from fastapi.responses import ORJSONResponse
+from fastapi.utils import create_response_field
+
+from app.db import PostStatusType
+from app.enum import PostIncludeFilter
+from app.schema import PostResponse, UserResponse, CommentResponse, TagResponse
+from app.service.includer.response import ResponseIncluderFactory
+
+INCLUDE = [
+    PostIncludeFilter.USER, PostIncludeFilter.COMMENTS, PostIncludeFilter.TAGS
+]
+
+
+def make_posts(count: int) -> list[SimpleNamespace]:
+    users = [
+        SimpleNamespace(
+            id=uuid4(), first_name="first", last_name="last",
+            email=f"user{i}@example.com"
+        )
+        for i in range(100)
+    ]
+    tags = [SimpleNamespace(id=uuid4(), slug=f"tag-{i}") for i in range(50)]
+    posts = []
+    for i in range(count):
+        post_id = uuid4()
+        user = users[i % len(users)]
+        posts.append(SimpleNamespace(
+            id=post_id,
+            title=f"post {i}",
+            content="content " * 20,
+            status=PostStatusType.ACTIVE,
+            user=user,
+            newest_comments=[
+                SimpleNamespace(
+                    id=uuid4(), post_id=post_id, user_id=user.id,
+                    content="comment " * 10
+                )
+                for _ in range(3)
+            ],
+            tags=tags[i % len(tags):i % len(tags) + 2],
+        ))
+    return posts
+
+
+async def legacy(posts: list[SimpleNamespace]) -> bytes:
+    """Validating constructors followed by `response_model` validation."""
+    posts_schema = []
+    for post in posts:
+        post_schema = PostResponse(
+            id=post.id,
+            title=post.title,
+            content=post.content,
+            status=post.status.value
+        )
+        post_schema.user = UserResponse(
+            id=post.user.id,
+            first_name=post.user.first_name,
+            last_name=post.user.last_name,
+            email=post.user.email,
+        )
+        post_schema.comments = [
+            CommentResponse(
+                id=comment.id,
+                content=comment.content,
+                user_id=comment.user_id,
+                post_id=comment.post_id
+            )
+            for comment in post.newest_comments
+        ]
+        post_schema.comments_has_more = False
+        post_schema.tags = [
+            TagResponse(id=tag.id, slug=tag.slug) for tag in post.tags
+        ]
+        posts_schema.append(post_schema)
+
+    content = await serialize_response(
+        field=RESPONSE_FIELD,
+        response_content=posts_schema,
+        exclude_none=True,
+        is_coroutine=True,
+    )
+    return ORJSONResponse(content=content).body
+
+
+async def current(posts: list[SimpleNamespace]) -> bytes:
+    """Serialized dicts encoded directly as JSON response."""
+    serialize = ResponseIncluderFactory(include=INCLUDE).serializer(
+        schema=PostResponse
+    )
+    return ORJSONResponse(content=[serialize(post) for post in posts]).body
+
+
+RESPONSE_FIELD = create_response_field(
+    name="Response_list_posts", type_=list[PostResponse]
+)
+
+
+def main(args: list[str]) -> None:
+    count = int(args[0]) if args else 10000
+    rounds = int(args[1]) if len(args) > 1 else 5
+    posts = make_posts(count)
+    assert asyncio.run(legacy(posts)) == asyncio.run(current(posts))
+
+    results = {}
+    for name, build in (("legacy", legacy), ("current", current)):
+        # best of rounds, each started with clean heap, is least affected by
+        # garbage collection of previous rounds
+        timings = []
+        for _ in range(rounds):
+            gc.collect()
+            start = time.perf_counter()
+            asyncio.run(build(posts))
+            timings.append(time.perf_counter() - start)
+        elapsed = results[name] = min(timings)
+        print(f"{name:>8}: {elapsed * 1e3:8.1f} ms per {count} posts")
+    print(f"{'speedup':>8}: {results['legacy'] / results['current']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
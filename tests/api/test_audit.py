@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+
+import orjson
+import pytest
+
+from app.utils.audit import AuditWriter
+
+
+class BlockingHandler(logging.Handler):
+    """
+    Handler collecting audit records, which blocks on the first one until
+    it is released, so queue of the writer can be filled meanwhile.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.entered.set()
+        self.released.wait(5)
+        self.records.append(orjson.loads(record.getMessage()))
+
+
+def make_writer(overflow: str, spill_path: str = None):
+    """
+    Creates writer with queue of single record, which writes records one by
+    one to `BlockingHandler`, returned along with it.
+    """
+    writer = AuditWriter(
+        queue_size=1,
+        batch_size=1,
+        flush_interval=0.01,
+        overflow=overflow,
+        spill_path=spill_path
+    )
+    handler = BlockingHandler()
+    writer.audit_logger = logging.getLogger(f"test-audit-{overflow}")
+    writer.audit_logger.setLevel(logging.INFO)
+    writer.audit_logger.propagate = False
+    writer.audit_logger.handlers = [handler]
+    return writer, handler
+
+
+async def fill(writer: AuditWriter, handler: BlockingHandler) -> None:
+    """Makes writer block on the first record and fills its queue."""
+    await writer.put({"id": 1})
+    assert handler.entered.wait(5)
+    await writer.put({"id": 2})
+
+
+def test_audit_writer_drops_overflow():
+    """
+    Test audit writer with drop overflow policy.
+
+    Test scenario:
+    1. Block writer on the first record and fill its queue
+    2. Put one more record and release the writer
+    3. Verify that records which fit into the queue are written
+    """
+    writer, handler = make_writer(overflow="drop")
+
+    async def scenario():
+        await fill(writer, handler)
+        await writer.put({"id": 3})
+
+    asyncio.run(scenario())
+    handler.released.set()
+    writer.stop()
+
+    assert handler.records == [{"id": 1}, {"id": 2}]
+
+
+def test_audit_writer_blocks_on_overflow():
+    """
+    Test audit writer with block overflow policy.
+
+    Test scenario:
+    1. Block writer on the first record and fill its queue
+    2. Put one more record, which waits for free space in the queue
+    3. Release the writer and verify that all records are written
+    """
+    writer, handler = make_writer(overflow="block")
+
+    async def scenario():
+        await fill(writer, handler)
+        put = asyncio.ensure_future(writer.put({"id": 3}))
+        await asyncio.sleep(0.05)
+        assert not put.done()
+        handler.released.set()
+        await asyncio.wait_for(put, 5)
+
+    asyncio.run(scenario())
+    writer.stop()
+
+    assert handler.records == [{"id": 1}, {"id": 2}, {"id": 3}]
+
+
+def test_audit_writer_spills_overflow(tmp_path):
+    """
+    Test audit writer with spill overflow policy.
+
+    Test scenario:
+    1. Block writer on the first record and fill its queue
+    2. Put one more record and verify that it is spilled to file of process
+    3. Release the writer and verify that spilled record is written once
+       the queue is drained, and spill file is removed
+    """
+    spill_path = str(tmp_path / "audit.spill")
+    writer, handler = make_writer(overflow="spill", spill_path=spill_path)
+
+    async def scenario():
+        await fill(writer, handler)
+        await writer.put({"id": 3})
+
+    asyncio.run(scenario())
+    assert writer.spill_file == f"{spill_path}.{os.getpid()}"
+    # file is appended to by spill thread
+    for _ in range(500):
+        if os.path.exists(writer.spill_file):
+            break
+        time.sleep(0.01)
+    with open(writer.spill_file, "rb") as spill:
+        assert orjson.loads(spill.read()) == {"id": 3}
+    handler.released.set()
+    writer.stop()
+
+    assert handler.records == [{"id": 1}, {"id": 2}, {"id": 3}]
+    assert os.listdir(tmp_path) == []
+
+
+def test_audit_writer_replays_corrupt_spill(tmp_path):
+    """
+    Test audit writer replaying spill file with corrupt record.
+
+    Test scenario:
+    1. Create spill file with valid records around corrupt one
+    2. Start the writer and put record
+    3. Verify that valid records are replayed and writer keeps writing
+    """
+    writer, handler = make_writer(
+        overflow="spill", spill_path=str(tmp_path / "audit.spill")
+    )
+    handler.released.set()
+    with open(writer.spill_file, "wb") as spill:
+        spill.write(b'{"id": 1}\n{"id": \n{"id": 2}\n')
+
+    asyncio.run(writer.put({"id": 3}))
+    writer.stop()
+
+    assert sorted(record["id"] for record in handler.records) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("overflow", ["drop", "spill"])
+def test_audit_writer_restarted(tmp_path, overflow: str):
+    """
+    Test audit writer whose threads are not running anymore.
+
+    Test scenario:
+    1. Put record and stop the writer
+    2. Put other record
+    3. Verify that writer is started again and both records are written
+    """
+    writer, handler = make_writer(
+        overflow=overflow, spill_path=str(tmp_path / "audit.spill")
+    )
+    handler.released.set()
+
+    asyncio.run(writer.put({"id": 1}))
+    writer.stop()
+    assert not writer.running
+    asyncio.run(writer.put({"id": 2}))
+    writer.stop()
+
+    assert handler.records == [{"id": 1}, {"id": 2}]
@@ -0,0 +1,55 @@
+from sqlalchemy import select
+
+from app.db import Post
+from app.enum import PostIncludeFilter
+from app.service.includer.query import PostQueryIncluderFactory
+from app.utils.db import StatementCache
+
+
+def test_statement_cache_evicts_least_recently_used():
+    """
+    Test statement cache bounded by its size.
+
+    Test scenario:
+    1. Cache statements up to the size of cache and look up the first one
+    2. Cache one more statement
+    3. Verify that least recently used statement is evicted and built again
+    """
+    cache = StatementCache("test", max_size=2)
+    built = []
+
+    def build(key: str):
+        built.append(key)
+        return select(Post.id).where(Post.title == key)
+
+    first = cache.get("first", lambda: build("first"))
+    cache.get("second", lambda: build("second"))
+    assert cache.get("first", lambda: build("first")) is first
+
+    cache.get("third", lambda: build("third"))
+
+    assert len(cache) == 2
+    assert cache.get("first", lambda: build("first")) is first
+    cache.get("second", lambda: build("second"))
+    assert built == ["first", "second", "third", "second"]
+
+
+def test_statement_key_of_different_includers():
+    """
+    Test statement key of factories mapping include value to different
+    includers.
+
+    Test scenario:
+    1. Create factory which maps user include to other includer
+    2. Verify that its key differs from key of post factory
+    """
+    class Factory(PostQueryIncluderFactory):
+        query_includer_map = dict(
+            PostQueryIncluderFactory.query_includer_map, USER=object
+        )
+
+    include = [PostIncludeFilter.USER]
+
+    assert Factory(include=include).key != PostQueryIncluderFactory(
+        include=include
+    ).key
@@ -0,0 +1,61 @@
+import asyncio
+from collections.abc import Hashable
+from typing import Any
+
+from app.utils.loader import Loader, LoaderRegistry
+
+
+class CountingLoader(Loader):
+    """Loader of keys doubled, which records keys of each fetch."""
+
+    def __init__(self, registry: LoaderRegistry) -> None:
+        super().__init__(registry)
+        self.fetched: list[list[Hashable]] = []
+
+    async def fetch(self, db, keys: list[Hashable]) -> dict[Hashable, Any]:
+        self.fetched.append(keys)
+        return {key: key * 2 for key in keys}
+
+
+def test_loader_memoizes_until_cleared():
+    """
+    Test loader memo cleared between batches.
+
+    Test scenario:
+    1. Load keys twice and verify that they are fetched once
+    2. Clear registry and load keys again
+    3. Verify that keys are fetched again
+    """
+    registry = LoaderRegistry(db=None)
+    loader = registry.get(CountingLoader)
+
+    async def scenario():
+        assert await loader.load_many([1, 2]) == [2, 4]
+        assert await loader.load_many([2, 1]) == [4, 2]
+        registry.clear()
+        assert await loader.load_many([1]) == [2]
+
+    asyncio.run(scenario())
+
+    assert loader.fetched == [[1, 2], [1]]
+
+
+def test_loader_clear_keeps_pending():
+    """
+    Test loader memo cleared while keys are being fetched.
+
+    Test scenario:
+    1. Load key and clear registry before it is fetched
+    2. Load the same key
+    3. Verify that both loads share single fetch
+    """
+    registry = LoaderRegistry(db=None)
+    loader = registry.get(CountingLoader)
+
+    async def scenario():
+        first = loader.load(1)
+        registry.clear()
+        return await asyncio.gather(first, loader.load(1))
+
+    assert asyncio.run(scenario()) == [2, 2]
+    assert loader.fetched == [[1]]
@@ -0,0 +1,138 @@
+import sys
+import queue
+import logging
+import threading
+
+import orjson
+import pytest
+
+from app.utils.logging import (
+    JSONFormatter, QueuedHandler, _start_listener, _stop_listener
+)
+
+
+class ListHandler(logging.Handler):
+    """Handler collecting messages along with threads which emitted them."""
+
+    def __init__(self, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.emitted = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.emitted.append(
+            (threading.current_thread().name, record.getMessage())
+        )
+
+
+@pytest.fixture
+def queued_logger():
+    """
+    Returns logger with handlers of INFO and DEBUG level, which are replaced
+    by queued handler, and the replaced handlers.
+    """
+    logger = logging.getLogger("test-queued")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    info, debug = ListHandler(logging.INFO), ListHandler(logging.DEBUG)
+    logger.handlers = [info, debug]
+    _start_listener(loggers=[logger])
+    yield logger, info, debug
+    _stop_listener()
+    logger.handlers = []
+
+
+def test_queued_logging_handled_by_listener(queued_logger):
+    """
+    Test records handled by original handlers from listener thread.
+
+    Test scenario:
+    1. Log records of DEBUG and INFO level and stop the listener
+    2. Verify that all records are handled once the listener is stopped
+    3. Verify that records are emitted by handlers of their level, not from
+       logging thread
+    """
+    logger, info, debug = queued_logger
+    assert [type(handler) for handler in logger.handlers] == [QueuedHandler]
+
+    logger.debug("debug")
+    logger.info("info")
+    _stop_listener()
+
+    thread = threading.current_thread().name
+    assert [message for _, message in debug.emitted] == ["debug", "info"]
+    assert [message for _, message in info.emitted] == ["info"]
+    assert all(name != thread for name, _ in debug.emitted + info.emitted)
+
+
+def test_queued_logging_merges_arguments(queued_logger):
+    """
+    Test arguments of record changed after it is logged.
+
+    Test scenario:
+    1. Log record with mutable argument and change it
+    2. Verify that handled message has argument as it was when logged
+    """
+    logger, info, _ = queued_logger
+    value = ["logged"]
+
+    logger.info("value %s", value)
+    value.append("changed")
+    _stop_listener()
+
+    assert [message for _, message in info.emitted] == ["value ['logged']"]
+
+
+def test_queued_handler_skips_records_below_handlers_level():
+    """
+    Test queued handler of handlers with level.
+
+    Test scenario:
+    1. Create queued handler of handlers with INFO and WARNING level
+    2. Log DEBUG and INFO records
+    3. Verify that only INFO record is queued, along with the handlers
+    """
+    queue_ = queue.SimpleQueue()
+    handlers = [ListHandler(logging.WARNING), ListHandler(logging.INFO)]
+    handler = QueuedHandler(queue_, handlers)
+    logger = logging.getLogger("test-queued-level")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.handlers = [handler]
+
+    logger.debug("debug")
+    logger.info("info")
+    logger.handlers = []
+
+    queued_handlers, record = queue_.get_nowait()
+    assert queued_handlers is handlers
+    assert record.levelno == logging.INFO
+    assert queue_.empty()
+
+
+def test_json_formatter():
+    """
+    Test JSON formatter of record with exception.
+
+    Test scenario:
+    1. Format record with arguments and exception, with prefix
+    2. Verify that prefix is followed by JSON object of the record
+    """
+    logger = logging.getLogger("test-json")
+    try:
+        raise ValueError("failed")
+    except ValueError:
+        record = logger.makeRecord(
+            logger.name, logging.ERROR, __file__, 10, "value %s", (1,),
+            exc_info=sys.exc_info()
+        )
+
+    formatted = JSONFormatter(prefix="app: ").format(record)
+
+    assert formatted.startswith("app: ")
+    data = orjson.loads(formatted[len("app: "):])
+    assert data["level"] == "ERROR"
+    assert data["logger"] == "test-json"
+    assert data["line"] == 10
+    assert data["message"] == "value 1"
+    assert "ValueError: failed" in data["exception"]
+    assert "request_id" not in data
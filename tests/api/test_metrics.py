@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.utils import middleware
+from tests.testing import AppPrecondition, AppVerificator
+
+
+def test_metrics_successfully(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test metrics in text exposition format.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request of the post and of metrics
+    3. Verify that latency of the request is reported by route template
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    resp = client.get(url=f"/api/posts/{str(post.id)}")
+    verify.http.ok(resp)
+
+    resp = client.get(url="/metrics")
+
+    verify.http.ok(resp)
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = resp.text.splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    assert any(
+        line.startswith(
+            "http_request_duration_seconds_count{"
+            'route="/api/posts/{post_id:uuid}",method="GET",status="200"}'
+        )
+        for line in lines
+    )
+    # request of metrics itself is in flight
+    assert "http_requests_in_flight 1" in lines
+
+
+def test_metrics_without_session_and_audit(
+    verify: AppVerificator,
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """
+    Test metrics requested without DB session and audit record.
+
+    Test scenario:
+    1. Make DB and audit middlewares fail if they handle the request
+    2. Create request of metrics
+    3. Verify that metrics are returned
+    """
+    def unexpected(*args, **kwargs):
+        raise AssertionError("Metrics request should not be handled")
+
+    monkeypatch.setattr(middleware, "LoaderRegistry", unexpected)
+    monkeypatch.setattr(middleware, "AuditRecordCreator", unexpected)
+
+    resp = client.get(url="/metrics")
+
+    verify.http.ok(resp)
@@ -0,0 +1,128 @@
+from uuid import uuid4
+
+import inject
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.db import User
+from app.utils.db import run_session_method
+from app.utils.middleware import DBMiddleware
+
+
+async def add_user(request: Request) -> str:
+    """Adds user within session of the request and flushes it."""
+    db = request.state.db
+    user_id = uuid4()
+    db.add(User(
+        id=user_id, first_name="first", last_name="last", email="e@mail.com"
+    ))
+    await run_session_method(db, "flush")
+    return str(user_id)
+
+
+def user_exists(user_id: str) -> bool:
+    with inject.instance("db_engine").connect() as connection:
+        return connection.execute(
+            select(User.id).where(User.id == user_id)
+        ).first() is not None
+
+
+@pytest.fixture
+def added() -> list[str]:
+    """Returns IDs of users added by routes of `db_client`, in order."""
+    return []
+
+
+@pytest.fixture
+def db_client(env, database: str, added: list[str]):
+    """
+    Returns client of app wrapped only in DB middleware, whose routes add
+    users, using parametrized DB stack.
+    """
+    app = FastAPI()
+    app.add_middleware(DBMiddleware, only_success_commit=True)
+
+    @app.post("/ok")
+    async def ok(request: Request):
+        added.append(await add_user(request))
+
+    @app.post("/not-found", status_code=404)
+    async def not_found(request: Request):
+        added.append(await add_user(request))
+
+    @app.post("/fail")
+    async def fail(request: Request):
+        added.append(await add_user(request))
+        raise RuntimeError("failed")
+
+    @app.post("/fail-streaming")
+    async def fail_streaming(request: Request):
+        added.append(await add_user(request))
+
+        async def content():
+            yield b"started"
+            added.append(await add_user(request))
+            raise RuntimeError("failed")
+
+        return StreamingResponse(content=content())
+
+    yield TestClient(app=app, raise_server_exceptions=False)
+
+
+def test_db_middleware_commits_success(
+    db_client: TestClient, added: list[str]
+):
+    """
+    Test DB session of request with successful response.
+
+    Test scenario:
+    1. Create request which adds user
+    2. Verify that user is committed
+    """
+    resp = db_client.post(url="/ok")
+
+    assert resp.status_code == 200
+    assert user_exists(added[0])
+
+
+@pytest.mark.parametrize("url, status_code", [
+    ("/not-found", 404),
+    ("/fail", 500),
+])
+def test_db_middleware_rolls_back_error(
+    db_client: TestClient, added: list[str], url: str, status_code: int
+):
+    """
+    Test DB session of request with error response or exception.
+
+    Test scenario:
+    1. Create request which adds user and fails
+    2. Verify that user is rolled back
+    """
+    resp = db_client.post(url=url)
+
+    assert resp.status_code == status_code
+    assert len(added) == 1
+    assert not user_exists(added[0])
+
+
+def test_db_middleware_rolls_back_after_response_start(
+    db_client: TestClient, added: list[str]
+):
+    """
+    Test DB session of request which fails after its response is started.
+
+    Test scenario:
+    1. Create request which adds user, starts streaming response, adds
+       other user and fails
+    2. Verify that the first user is committed when response is started
+    3. Verify that the other user is rolled back
+    """
+    db_client.post(url="/fail-streaming")
+
+    assert len(added) == 2
+    assert user_exists(added[0])
+    assert not user_exists(added[1])
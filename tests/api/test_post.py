@@ -1,10 +1,20 @@
+import json
 import faker
+import asyncio
 from uuid import uuid4
+from datetime import datetime, timedelta
 
+import inject
 import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
 from fastapi.testclient import TestClient
 
-from app.db.post import PostStatusType
+from app.db.post import Post, PostStatusType
+from app.enum import PostIncludeFilter
+from app.utils.cache import ResponseCache
+from app.utils.db import prepare_statements
+from app.utils.middleware import REQUEST_PHASE_SECONDS
 from tests.testing import AppPrecondition, AppVerificator
 from app.service.includer.query import PostQueryIncluderFactory
 
@@ -53,6 +63,70 @@ def test_get_post_not_found(
     verify.http.not_found(resp)
 
 
+def test_get_post_request_id(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test request ID returned along with post.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request without and with request ID
+    3. Verify that ID is generated for the first and kept for the second
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+
+    resp = client.get(url=f"/api/posts/{str(post.id)}")
+    verify.http.ok(resp)
+    assert len(resp.headers["x-request-id"]) == 32
+
+    resp = client.get(
+        url=f"/api/posts/{str(post.id)}", headers={"X-Request-ID": "abc"}
+    )
+    verify.http.ok(resp)
+    assert resp.headers["x-request-id"] == "abc"
+
+
+def test_get_post_timings(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test timings of get post observed by route template.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request with includes
+    3. Verify that each phase of request is observed once more for route
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    route = "/api/posts/{post_id:uuid}"
+    phases = (
+        "gzip-middleware", "audit-middleware", "db-middleware", "handler",
+        "attach", "serialize", "encode", "db"
+    )
+
+    def observed() -> dict[str, int]:
+        counts = {
+            key[1]: cumulative[-1]
+            for key, cumulative, _ in REQUEST_PHASE_SECONDS.values()
+            if key[0] == route
+        }
+        return {phase: counts.get(phase, 0) for phase in phases}
+
+    before = observed()
+    resp = client.get(
+        url=f"/api/posts/{str(post.id)}", params={"include": "user"}
+    )
+    verify.http.ok(resp)
+    assert observed() == {phase: count + 1 for phase, count in before.items()}
+
+
 def test_list_posts_successfully(
     given: AppPrecondition,
     verify: AppVerificator,
@@ -236,3 +310,674 @@ def test_get_posts_with_includes_and_status(
         response_data=resp_data[0]["user"],
         mocked_data=user
     )
+
+
+def test_list_posts_paginated(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient
+):
+    """
+    Test list posts page by page using cursor from previous page.
+
+    Test scenario:
+    1. Mock user and posts for mocked user
+    2. Create request for the first page
+    3. Verify response and next cursor
+    4. Create request for the next page using provided cursor
+    5. Verify response and that there is no next cursor
+    """
+    user = given.user.exists()
+    post1 = given.post.exists(user_id=user.id)
+    post2 = given.post.exists(user_id=user.id)
+    post3 = given.post.exists(user_id=user.id)
+
+    resp = client.get(url="/api/posts?limit=2")
+
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert [post["id"] for post in resp_data] == [
+        str(post1.id), str(post2.id)
+    ]
+    next_cursor = resp.headers["X-Next-Cursor"]
+
+    resp = client.get(url=f"/api/posts?limit=2&cursor={next_cursor}")
+
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert len(resp_data) == 1
+    verify.post.check_post_info(response_data=resp_data[0], mocked_data=post3)
+    assert "X-Next-Cursor" not in resp.headers
+
+
+@pytest.mark.parametrize("query", ["cursor=invalid", "limit=0"])
+def test_list_posts_invalid_pagination(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    query: str
+):
+    """
+    Test list posts with invalid pagination parameters.
+
+    Test scenario:
+    1. Create request with invalid pagination parameters
+    2. Verify response
+    """
+    resp = client.get(url=f"/api/posts?{query}")
+    verify.http.validation_error(resp)
+
+
+@pytest.mark.parametrize(
+    "query, headers",
+    [
+        ("stream=true", {}),
+        ("", {"Accept": "application/x-ndjson"}),
+    ]
+)
+def test_list_posts_streamed(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    query: str,
+    headers: dict
+):
+    """
+    Test list posts in streaming mode, as JSON array and as NDJSON.
+
+    Test scenario:
+    1. Mock user and posts for mocked user
+    2. Create streaming request
+    3. Verify that all posts are streamed
+    """
+    user = given.user.exists()
+    posts = [given.post.exists(user_id=user.id) for _ in range(3)]
+
+    resp = client.get(
+        url=f"/api/posts?include=user&limit=1&{query}", headers=headers
+    )
+
+    verify.http.ok(resp)
+    if headers:
+        resp_data = [json.loads(line) for line in resp.text.splitlines()]
+    else:
+        resp_data = resp.json()
+    assert len(resp_data) == 3
+    verify.post.check_posts_info(response_data=resp_data, mocked_data=posts)
+
+
+def test_get_post_cached(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    cache: ResponseCache
+):
+    """
+    Test get post read through cache, which is invalidated on write.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request and change post title bypassing session and version
+    3. Verify that cached post is returned
+    4. Mock comment of the post and verify that post is fetched again
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    url = f"/api/posts/{str(post.id)}?include=comments"
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    with inject.instance("db_engine").begin() as connection:
+        connection.execute(
+            Post.__table__.update()
+            .where(Post.id == post.id)
+            .values(title="changed", modified_at=Post.modified_at)
+        )
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    assert resp.json()["title"] == post.title
+    assert resp.json()["comments"] == []
+
+    comment = given.comment.exists(user_id=user.id, post_id=post.id)
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert resp_data["title"] == "changed"
+    assert len(resp_data["comments"]) == 1
+    verify.comment.check_comments_info(
+        response_data=resp_data["comments"], mocked_data=[comment]
+    )
+
+
+def test_get_post_cached_updated(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    cache: ResponseCache
+):
+    """
+    Test get post read through cache, after post is updated without
+    invalidating the cache, as by other worker process.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request, so post is cached
+    3. Change post title bypassing session
+    4. Verify that changed post is returned with new entity tag, also when
+       previous entity tag is provided
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    url = f"/api/posts/{str(post.id)}"
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    etag = resp.headers["ETag"]
+    with inject.instance("db_engine").begin() as connection:
+        connection.execute(
+            Post.__table__.update()
+            .where(Post.id == post.id)
+            .values(title="changed")
+        )
+
+    resp = client.get(url=url, headers={"If-None-Match": etag})
+
+    verify.http.ok(resp)
+    assert resp.json()["title"] == "changed"
+    assert resp.headers["ETag"] != etag
+
+
+def test_get_post_cached_tag_created(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    cache: ResponseCache
+):
+    """
+    Test get post read through cache, which is invalidated once tag, whose
+    posts were never loaded, is created and assigned to the post.
+
+    Test scenario:
+    1. Mock user and post with a tag for mocked user
+    2. Create request, so post with its tags is cached
+    3. Mock other tag, without loading its posts, and assign it to the post
+    4. Verify that post is fetched again with both tags
+    """
+    user = given.user.exists()
+    tag = given.tag.exists()
+    post = given.post.exists(user_id=user.id, tags=[tag])
+    url = f"/api/posts/{str(post.id)}?include=tags"
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+
+    other_tag = given.tag.exists()
+    post.tags.append(other_tag)
+    inject.instance("thread_db").commit()
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert len(resp_data["tags"]) == 2
+    verify.tag.check_tags_info(
+        response_data=resp_data["tags"], mocked_data=[tag, other_tag]
+    )
+
+
+def test_get_post_not_modified(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test get post with entity tag of current and of changed post.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request with entity tag from previous response
+    3. Verify that post is not modified
+    4. Mock comment of the post and verify that post is modified
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    url = f"/api/posts/{str(post.id)}?include=comments"
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    etag = resp.headers["ETag"]
+
+    resp = client.get(url=url, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+    assert resp.content == b""
+
+    given.comment.exists(user_id=user.id, post_id=post.id)
+
+    resp = client.get(url=url, headers={"If-None-Match": etag})
+    verify.http.ok(resp)
+    assert resp.headers["ETag"] != etag
+    assert len(resp.json()["comments"]) == 1
+
+
+def test_list_posts_not_modified(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test list posts with entity tag of current and of changed page.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request with entity tag from previous response
+    3. Verify that page is not modified
+    4. Mock another post and verify that page is modified
+    """
+    user = given.user.exists()
+    given.post.exists(user_id=user.id)
+
+    resp = client.get(url="/api/posts")
+    verify.http.ok(resp)
+    etag = resp.headers["ETag"]
+
+    resp = client.get(url="/api/posts", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    given.post.exists(user_id=user.id)
+
+    resp = client.get(url="/api/posts", headers={"If-None-Match": etag})
+    verify.http.ok(resp)
+    assert len(resp.json()) == 2
+
+
+@pytest.mark.parametrize(
+    "fields, include", [("title", ""), ("title,status", "user")]
+)
+def test_list_posts_with_fields(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    fields: str,
+    include: str
+):
+    """
+    Test list posts with sparse fieldset.
+
+    Test scenario:
+    1. Mock user and post for mocked user
+    2. Create request with fields query parameter
+    3. Verify that only requested fields are returned
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+
+    params = {"fields": fields}
+    if include:
+        params["include"] = include
+    resp = client.get(url="/api/posts", params=params)
+
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert len(resp_data) == 1
+    expected = {"id", *fields.split(",")} | ({"user"} if include else set())
+    assert set(resp_data[0]) == expected
+    assert resp_data[0]["title"] == post.title
+
+
+def test_list_posts_with_invalid_fields(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test list posts with invalid fields values.
+
+    Test scenario:
+    1. Create request with invalid fields query parameter
+    2. Verify response
+    """
+    resp = client.get(url="/api/posts?fields=title,tests")
+    verify.http.validation_error(resp)
+
+
+def test_get_post_prepared(
+    given: AppPrecondition,
+    db_engine,
+):
+    """
+    Test get post through engine which prepares statements.
+
+    Test scenario:
+    1. Mock user, post and comment of the post
+    2. Fetch post with includes twice through engine preparing statements
+    3. Verify fetched post and that statements are prepared on connection
+    4. Invalidate connection and verify that post is fetched again
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    given.comment.exists(user_id=user.id, post_id=post.id)
+    engine = create_engine(db_engine.url, pool_size=1, max_overflow=0)
+    prepare_statements(engine)
+    include = [PostIncludeFilter.USER, PostIncludeFilter.COMMENTS]
+
+    def fetch(session: Session) -> Post:
+        fetched = asyncio.run(Post.get(
+            db=session,
+            post_id=str(post.id),
+            query_includer_factory=PostQueryIncluderFactory(include=include)
+        ))
+        session.expunge_all()
+        return fetched
+
+    with Session(bind=engine) as session:
+        for _ in range(2):
+            fetched = fetch(session)
+            assert fetched.title == post.title
+            assert fetched.user.id == user.id
+            assert len(fetched.newest_comments) == 1
+        prepared = session.execute(text(
+            "SELECT count(*) FROM pg_prepared_statements"
+        )).scalar()
+        # post with its user, comments and this statement itself
+        assert prepared == 3
+
+        session.connection().invalidate()
+        session.rollback()
+        assert fetch(session).title == post.title
+    engine.dispose()
+
+
+def test_get_many_posts_prepared(
+    given: AppPrecondition,
+    db_engine,
+):
+    """
+    Test get multiple posts through engine which prepares statements.
+
+    Test scenario:
+    1. Mock user and posts for mocked user
+    2. Fetch posts by different number of IDs through engine preparing
+       statements
+    3. Verify fetched posts and that single statement is prepared for all
+       numbers of IDs
+    """
+    user = given.user.exists()
+    posts = [given.post.exists(user_id=user.id) for _ in range(3)]
+    engine = create_engine(db_engine.url, pool_size=1, max_overflow=0)
+    prepare_statements(engine)
+
+    with Session(bind=engine) as session:
+        for count in range(1, len(posts) + 1):
+            fetched = asyncio.run(Post.get_many(
+                db=session,
+                post_ids=[str(post.id) for post in posts[:count]],
+                query_includer_factory=PostQueryIncluderFactory(include=[])
+            ))
+            session.expunge_all()
+            assert {post.id for post in fetched} == {
+                post.id for post in posts[:count]
+            }
+        prepared = session.execute(text(
+            "SELECT count(*) FROM pg_prepared_statements"
+        )).scalar()
+        # posts by any number of IDs and this statement itself
+        assert prepared == 2
+    engine.dispose()
+
+
+@pytest.mark.parametrize("method", ["GET", "POST"])
+def test_batch_get_posts(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    method: str
+):
+    """
+    Test get multiple posts by their IDs.
+
+    Test scenario:
+    1. Mock user, posts and comment of one of them
+    2. Create request with IDs of posts in mixed order and unknown ID
+    3. Verify that posts are returned in requested order with includes
+    4. Verify that unknown ID is reported as missing
+    """
+    user = given.user.exists()
+    posts = [given.post.exists(user_id=user.id) for _ in range(3)]
+    comment = given.comment.exists(user_id=user.id, post_id=posts[0].id)
+    missing_id = str(uuid4())
+    ids = [str(posts[2].id), missing_id, str(posts[0].id), str(posts[1].id)]
+
+    if method == "GET":
+        resp = client.get(
+            url=f"/api/posts?ids={','.join(ids)}&include=comments"
+        )
+    else:
+        resp = client.post(
+            url="/api/posts:batchGet?include=comments", json={"ids": ids}
+        )
+
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert [post["id"] for post in resp_data] == [
+        ids[0], ids[2], ids[3]
+    ]
+    for post_data, post in zip(resp_data, [posts[2], posts[0], posts[1]]):
+        verify.post.check_post_info(response_data=post_data, mocked_data=post)
+    verify.comment.check_comments_info(
+        response_data=resp_data[1]["comments"], mocked_data=[comment]
+    )
+    assert resp_data[0]["comments"] == []
+    assert resp.headers["X-Missing-Ids"] == missing_id
+
+
+@pytest.mark.parametrize("ids", [[], ["invalid"], [""]])
+def test_batch_get_posts_with_invalid_ids(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    ids: list[str]
+):
+    """
+    Test get multiple posts with invalid IDs.
+
+    Test scenario:
+    1. Create request with invalid IDs
+    2. Verify response
+    """
+    resp = client.post(url="/api/posts:batchGet", json={"ids": ids})
+    verify.http.validation_error(resp)
+
+
+def test_list_posts_with_nested_includes(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    stack_engine
+):
+    """
+    Test list posts with users of their comments included.
+
+    Test scenario:
+    1. Mock users, posts and comments of posts by different users
+    2. Create request with nested include
+    3. Verify that each comment has its user
+    4. Verify that users of all comments are loaded by single query
+    """
+    users = [given.user.exists() for _ in range(3)]
+    posts = [given.post.exists(user_id=users[0].id) for _ in range(2)]
+    comments = [
+        given.comment.exists(user_id=user.id, post_id=post.id)
+        for post in posts for user in users
+    ]
+    statements = []
+
+    def count(connection, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    event.listen(stack_engine, "before_cursor_execute", count)
+    try:
+        resp = client.get(url="/api/posts?include=comments.user")
+    finally:
+        event.remove(stack_engine, "before_cursor_execute", count)
+
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert len(resp_data) == len(posts)
+    for post_data in resp_data:
+        assert len(post_data["comments"]) == len(users)
+        verify.comment.check_comments_info(
+            response_data=post_data["comments"], mocked_data=comments
+        )
+        for comment_data in post_data["comments"]:
+            assert comment_data["user"]["id"] == comment_data["user_id"]
+    users_statements = [
+        statement for statement in statements
+        if statement.lstrip().startswith("SELECT users.")
+    ]
+    assert len(users_statements) == 1
+
+
+def test_list_posts_with_aggregates(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test list posts with comment count and tag slugs included.
+
+    Test scenario:
+    1. Mock user, tags, post with tags and comments and post without them
+    2. Create request with aggregates included
+    3. Verify that aggregates match comments and tags of each post
+    4. Delete one of comments and verify that comment count is decreased
+    """
+    user = given.user.exists()
+    tags = [given.tag.exists() for _ in range(2)]
+    post = given.post.exists(user_id=user.id, tags=tags)
+    given.post.exists(user_id=user.id)
+    comments = [
+        given.comment.exists(user_id=user.id, post_id=post.id)
+        for _ in range(3)
+    ]
+    url = "/api/posts?include=comment_count,tag_slugs&fields=title"
+
+    resp = client.get(url=url)
+
+    verify.http.ok(resp)
+    resp_data = {data["id"]: data for data in resp.json()}
+    assert resp_data.pop(str(post.id)) == {
+        "id": str(post.id),
+        "title": post.title,
+        "comment_count": len(comments),
+        "tag_slugs": sorted(tag.slug for tag in tags),
+    }
+    [other_data] = resp_data.values()
+    assert other_data["comment_count"] == 0
+    assert other_data["tag_slugs"] == []
+
+    db = inject.instance("thread_db")
+    db.delete(comments[0])
+    db.commit()
+    resp = client.get(url=url)
+
+    verify.http.ok(resp)
+    [post_data] = [
+        data for data in resp.json() if data["id"] == str(post.id)
+    ]
+    assert post_data["comment_count"] == len(comments) - 1
+
+
+@pytest.mark.parametrize("order", ["newest", "oldest"])
+def test_list_posts_with_bounded_comments(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    order: str
+):
+    """
+    Test list posts with single page of comments of each post included.
+
+    Test scenario:
+    1. Mock user, post with many comments and post with single comment
+    2. Create request with comments limit and order
+    3. Verify that only the newest or the oldest comments are included
+    4. Verify that more comments are reported only for the first post
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    other_post = given.post.exists(user_id=user.id)
+    start = datetime(2024, 1, 1)
+    comments = [
+        given.comment.exists(
+            user_id=user.id, post_id=post.id, created_at=start + timedelta(i)
+        )
+        for i in range(5)
+    ]
+    other_comment = given.comment.exists(
+        user_id=user.id, post_id=other_post.id
+    )
+
+    resp = client.get(
+        url="/api/posts?include=comments&include_limit=2",
+        params={"include_order": order}
+    )
+
+    verify.http.ok(resp)
+    resp_data = {data["id"]: data for data in resp.json()}
+    expected = comments[::-1][:2] if order == "newest" else comments[:2]
+    post_data = resp_data[str(post.id)]
+    assert [data["id"] for data in post_data["comments"]] == [
+        str(comment.id) for comment in expected
+    ]
+    assert post_data["comments_has_more"] is True
+    other_data = resp_data[str(other_post.id)]
+    verify.comment.check_comments_info(
+        response_data=other_data["comments"], mocked_data=[other_comment]
+    )
+    assert other_data["comments_has_more"] is False
+
+
+def test_get_post_not_modified_with_bounded_comments(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test get post with entity tag of single page of its comments.
+
+    Test scenario:
+    1. Mock user and post with many comments for mocked user
+    2. Create request with comments limit and entity tag of the post
+    3. Change the oldest comment and verify that post is not modified
+    4. Change the newest comment and verify that post is modified
+    """
+    user = given.user.exists()
+    post = given.post.exists(user_id=user.id)
+    start = datetime(2024, 1, 1)
+    comments = [
+        given.comment.exists(
+            user_id=user.id, post_id=post.id, created_at=start + timedelta(i)
+        )
+        for i in range(4)
+    ]
+    url = f"/api/posts/{str(post.id)}?include=comments&include_limit=1"
+    db = inject.instance("thread_db")
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    etag = resp.headers["ETag"]
+
+    comments[0].content = "changed"
+    db.commit()
+
+    resp = client.get(url=url, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    comments[-1].content = "changed"
+    db.commit()
+
+    resp = client.get(url=url, headers={"If-None-Match": etag})
+    verify.http.ok(resp)
+    assert resp.json()["comments"][0]["content"] == "changed"
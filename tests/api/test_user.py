@@ -1,11 +1,13 @@
 import faker
 from uuid import uuid4
 
+import inject
 import pytest
 from fastapi.testclient import TestClient
 
 from tests.testing import AppPrecondition, AppVerificator
 from app.service.includer.query import UserQueryIncluderFactory
+from app.utils.cache import ResponseCache
 
 generator = faker.Factory.create()
 
@@ -119,3 +121,105 @@ def test_get_user_with_invalid_includes(
     user = given.user.exists()
     resp = client.get(url=f"/api/users/{str(user.id)}?include={include}")
     verify.http.validation_error(resp)
+
+
+def test_get_user_cached(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+    cache: ResponseCache
+):
+    """
+    Test get user read through cache, which is invalidated by write of
+    user's post.
+
+    Test scenario:
+    1. Mock user and create request with posts include
+    2. Mock post for mocked user
+    3. Verify that user is fetched again with new post
+    """
+    user = given.user.exists()
+    url = f"/api/users/{str(user.id)}?include=posts"
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    assert resp.json()["posts"] == []
+
+    post = given.post.exists(user_id=user.id)
+
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    verify.post.check_posts_info(
+        response_data=resp.json()["posts"], mocked_data=[post]
+    )
+    assert len(resp.json()["posts"]) == 1
+
+
+def test_get_user_not_modified(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test get user with entity tag of current and of changed user.
+
+    Test scenario:
+    1. Mock user and create request
+    2. Create request with entity tag from previous response
+    3. Verify that user is not modified
+    4. Change user and verify that user is modified
+    """
+    user = given.user.exists()
+    url = f"/api/users/{str(user.id)}"
+    resp = client.get(url=url)
+    verify.http.ok(resp)
+    etag = resp.headers["ETag"]
+
+    resp = client.get(url=url, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    db = inject.instance("thread_db")
+    user.first_name = "changed"
+    db.commit()
+
+    resp = client.get(url=url, headers={"If-None-Match": etag})
+    verify.http.ok(resp)
+    assert resp.json()["first_name"] == "changed"
+
+
+def test_batch_get_users(
+    given: AppPrecondition,
+    verify: AppVerificator,
+    client: TestClient,
+):
+    """
+    Test get multiple users by their IDs.
+
+    Test scenario:
+    1. Mock users and post of one of them
+    2. Create request with IDs of users and unknown ID
+    3. Verify that users are returned in requested order with includes
+    4. Verify that unknown ID is reported as missing
+    """
+    users = [given.user.exists() for _ in range(2)]
+    post = given.post.exists(user_id=users[0].id)
+    missing_id = str(uuid4())
+    ids = [missing_id, str(users[1].id), str(users[0].id)]
+
+    resp = client.get(url=f"/api/users?ids={','.join(ids)}&include=posts")
+
+    verify.http.ok(resp)
+    resp_data = resp.json()
+    assert len(resp_data) == 2
+    for user_data, user in zip(resp_data, [users[1], users[0]]):
+        verify.user.check_user_info(response_data=user_data, mocked_data=user)
+    assert resp_data[0]["posts"] == []
+    verify.post.check_posts_info(
+        response_data=resp_data[1]["posts"], mocked_data=[post]
+    )
+    assert resp.headers["X-Missing-Ids"] == missing_id
+
+    resp = client.post(url="/api/users:batchGet", json={"ids": ids[1:]})
+
+    verify.http.ok(resp)
+    assert [user["id"] for user in resp.json()] == ids[1:]
+    assert "X-Missing-Ids" not in resp.headers
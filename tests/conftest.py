@@ -6,15 +6,42 @@ import contextlib
 from fastapi import FastAPI
 from functools import partial
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import (
+    AsyncSession, async_scoped_session, create_async_engine
+)
 from fastapi.testclient import TestClient
 import testing.postgresql
 from pytest import FixtureRequest
 
 from app.db import Base
 from app.utils.config import Config
+from app.utils.db import ASYNC_DRIVER
+from app.utils.cache import (
+    ResponseCache, MemoryBackend, RedisBackend, register_invalidation
+)
+from app.utils.metrics import MultiProcessMetrics
 from app.server import Server
-from tests.testing import AppServiceMock, AppPrecondition, AppVerificator
+from tests.testing import (
+    AppServiceMock, AppPrecondition, AppVerificator, RedisClientMock
+)
+
+
+class DBStacks:
+    """
+    Session registries of sync and async DB stack, by their mode. Registry
+    of current `mode` is provided to the app as `db_registry`, and its
+    sessions as `db`.
+    """
+    def __init__(self, registries: dict):
+        self.registries = registries
+        self.mode = "sync"
+
+    @property
+    def registry(self):
+        return self.registries[self.mode]
 
 
 def configure_env(
@@ -52,11 +79,42 @@ def configure_env(
     )
     session_class = scoped_session(session_factory)
 
-    binder.bind("db_registry", async_session_class)
-    binder.bind_to_provider("db", async_session_class)
+    # async stack, as configured by `database.async`, connects through
+    # asyncpg. Its connections are bound to event loop, and test client runs
+    # each request on new one, so they are not pooled.
+    async_engine = create_async_engine(
+        make_url(db_).set(drivername=ASYNC_DRIVER),
+        isolation_level="REPEATABLE READ",
+        poolclass=NullPool,
+        echo=True
+    )
+    binder.bind("async_db_engine", async_engine)
+    async_session_factory = sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False
+    )
+    db_stacks = DBStacks({
+        "sync": async_session_class,
+        "async": async_scoped_session(
+            async_session_factory, scopefunc=current_task
+        ),
+    })
+    binder.bind(DBStacks, db_stacks)
+    binder.bind_to_provider("db_registry", lambda: db_stacks.registry)
+    binder.bind_to_provider("db", lambda: db_stacks.registry())
     binder.bind("thread_db_registry", session_class)
     binder.bind_to_provider("thread_db", session_class)
 
+    # bind response cache
+    cache = ResponseCache(backend=MemoryBackend())
+    register_invalidation(cache)
+    binder.bind(ResponseCache, cache)
+
+    # metrics of single process
+    binder.bind(MultiProcessMetrics, None)
+
     # bind server
     binder.bind_to_constructor(FastAPI, Server)
     # bind services
@@ -166,8 +224,49 @@ def session():
     db_session.close()
 
 
+@pytest.fixture(params=["memory", "redis"])
+def cache(request, env):
+    """
+    Returns response cache from environment, with its backend replaced by
+    new one of parametrized type, and restores original backend afterwards.
+    """
+    _cache = inject.instance(ResponseCache)
+    backend = _cache.backend
+    if request.param == "redis":
+        _cache.backend = RedisBackend(client=RedisClientMock())
+    else:
+        _cache.backend = MemoryBackend()
+    yield _cache
+    _cache.backend = backend
+
+
+@pytest.fixture(params=["sync", "async"])
+def database(request, env):
+    """
+    Makes the app use parametrized DB stack, psycopg2 sessions run in
+    threadpool or asyncpg sessions, as selected by `database.async`, and
+    switches back to sync one afterwards.
+    """
+    db_stacks = inject.instance(DBStacks)
+    db_stacks.mode = request.param
+    yield request.param
+    db_stacks.mode = "sync"
+
+
+@pytest.fixture
+def stack_engine(database: str):
+    """
+    Returns engine of DB stack the app uses, as sync engine, so it can be
+    listened to in the same way for both stacks.
+    """
+    if database == "async":
+        yield inject.instance("async_db_engine").sync_engine
+    else:
+        yield inject.instance("db_engine")
+
+
 @pytest.fixture
-def client(app: FastAPI):
+def client(app: FastAPI, database: str):
     yield TestClient(app=app)
 
 
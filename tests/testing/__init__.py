@@ -1,3 +1,3 @@
 from tests.testing.precondition import AppPrecondition, Precondition
-from tests.testing.mock import AppServiceMock
+from tests.testing.mock import AppServiceMock, RedisClientMock
 from tests.testing.verificator import AppVerificator, Verificator
@@ -27,3 +27,50 @@ class ConfigServiceMock:
 class AppServiceMock(ConfigServiceMock):
     def __init__(self):
         super().__init__()
+
+
+class RedisClientMock:
+    """
+    In-memory fake of `redis.Redis`, implementing only commands used by
+    cache backend. Expiration of keys is not simulated.
+    """
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._data[key] = value
+
+    def sadd(self, key, *values):
+        self._data.setdefault(key, set()).update(values)
+
+    def smembers(self, key):
+        return set(self._data.get(key, ()))
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def pipeline(self):
+        return RedisPipelineMock(client=self)
+
+
+class RedisPipelineMock:
+    def __init__(self, client: RedisClientMock):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+        return command
+
+    def execute(self):
+        for name, args, kwargs in self._commands:
+            getattr(self._client, name)(*args, **kwargs)
+        self._commands = []